@@ -1,10 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
-import wave
-import io
-from gemini_tts import GeminiTTS
-from audio_router import AudioRouter, find_virtual_cable_device
+import os
+import time
+from message_text import MESSAGE_TEMPLATE, message_values, render_message
+from metrics import get_metrics, use_trace
+from speculative import SpeculativeSynthesizer
+from wav_codec import parse_wav
+
+# Set to the launch time.time() by startup_benchmark.py; the GUI reports its
+# startup milestones relative to it on stdout and then exits
+STARTUP_PROBE_ENV = "AI_AUDIO_STARTUP_PROBE"
+
+# Longest wait for a finished message to play out before its timings are recorded
+DRAIN_TIMEOUT = 5.0
+
+# Longest wait for an in-flight speculative render before generating normally
+SPECULATION_TIMEOUT = 10.0
 
 class AIAudioGUI:
     """GUI application for AI-powered audio transmission."""
@@ -15,19 +27,23 @@ class AIAudioGUI:
         self.root.geometry("500x400")
         self.root.resizable(True, True)
         
-        # Initialize components
-        self.tts = GeminiTTS()
+        # Speech and audio backends are built in the background after the window shows
+        self.tts = None
+        self.segment_renderer = None
         self.audio_router = None
+        self.backend_ready = False
         self.is_transmitting = False
+        self._probe_start = os.environ.get(STARTUP_PROBE_ENV)
         
-        # Message template
-        self.message_template = """This message is for {full_name}, this is Jessica with COUNTY Process Serving Division.
-Your Case Number is {case_number}. Disclaimer: This message is generated by an AI system.
-"""
+        # Message template (shared with batch_generate.py so both hit the same cache keys)
+        self.message_template = MESSAGE_TEMPLATE
+        
+        # Speculative pre-rendering while the operator types
+        self.speculator = SpeculativeSynthesizer(self._render_speculative, delay=0.6)
         
         # Setup GUI
         self._setup_gui()
-        self._setup_audio_router()
+        self._start_backend()
     
     def _setup_gui(self):
         """Creates the GUI elements."""
@@ -70,7 +86,8 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
                                                          sticky=tk.W, pady=5)
         self.device_var = tk.StringVar()
         self.device_combo = ttk.Combobox(main_frame, textvariable=self.device_var,
-                                        state="readonly", width=37)
+                                        state="readonly", width=37,
+                                        postcommand=self._refresh_devices)
         self.device_combo.grid(row=3, column=1, sticky=(tk.W, tk.E), pady=5)
         
         # Buttons frame
@@ -86,6 +103,19 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
                                      state=tk.DISABLED)
         self.stop_button.grid(row=0, column=1, padx=5)
         
+        # Streaming mode: play Gemini chunks as they arrive instead of waiting for the full clip
+        self.streaming_var = tk.BooleanVar(value=True)
+        self.streaming_check = ttk.Checkbutton(button_frame, text="Low-latency streaming",
+                                              variable=self.streaming_var)
+        self.streaming_check.grid(row=1, column=0, columnspan=2, pady=(5, 0))
+        
+        # Segmented mode: splice pre-rendered fixed phrases around the name and case number
+        self.segmented_var = tk.BooleanVar(value=False)
+        self.segmented_check = ttk.Checkbutton(button_frame, text="Segmented rendering",
+                                              variable=self.segmented_var,
+                                              command=self._on_segmented_toggle)
+        self.segmented_check.grid(row=2, column=0, columnspan=2, pady=(5, 0))
+        
         # Status frame
         status_frame = ttk.LabelFrame(main_frame, text="Status", padding="5")
         status_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), 
@@ -126,42 +156,148 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
         # Configure row weights for resizing
         main_frame.rowconfigure(6, weight=1)
     
-    def _setup_audio_router(self):
-        """Initializes the audio router with available devices."""
-        # Find virtual cable device
-        virtual_device = find_virtual_cable_device()
+    def _start_backend(self):
+        """Shows the loading state and initializes the backends on a worker thread."""
+        self.generate_button.config(state=tk.DISABLED)
+        self._update_status("Loading speech and audio backends...", "blue")
+        self.progress.start()
+        
+        if self._probe_start:
+            self.root.after_idle(self._report_startup, "window_ready")
+        
+        threading.Thread(target=self._init_backend, daemon=True).start()
+    
+    def _init_backend(self):
+        """Imports the heavy modules and builds the TTS client and audio router (runs in separate thread)."""
+        try:
+            from gemini_tts import GeminiTTS
+            from request_policy import RequestPolicy
+            from tts_cache import TTSCache
+            from audio_router import AudioRouter
+            from device_registry import get_registry
+            
+            # The operator is waiting on a live call: hedge requests that run past the usual p95
+            tts = GeminiTTS(cache=TTSCache.from_env(),
+                            policy=RequestPolicy(hedge=True, name="generate_content"),
+                            stream_policy=RequestPolicy(timeout=10.0, hedge=True,
+                                                        name="generate_content_stream"))
+            # Build the client (and import the SDK) here so the first request does not pay for it
+            tts.client
+            # The TTS client's own renderer, so its fixed phrases and cache state are shared
+            segment_renderer = tts.message_renderer
+            
+            # One shared enumeration serves the device list, the cable lookup and the router
+            registry = get_registry()
+            devices = registry.output_names()
+            cable = registry.virtual_cable()
+            virtual_device = cable.name if cable else None
+            
+            audio_router = None
+            if cable:
+                audio_router = AudioRouter(cable.index, registry=registry)
+                audio_router.start()
+        except Exception as e:
+            error = str(e)
+            self.root.after(0, lambda: self._on_backend_failed(error))
+            return
+        
+        self.root.after(0, lambda: self._on_backend_ready(
+            tts, segment_renderer, audio_router, devices, virtual_device))
+    
+    def _on_backend_ready(self, tts, segment_renderer, audio_router, devices, virtual_device):
+        """Installs the initialized backends and enables the controls (runs on the Tk thread)."""
+        self.tts = tts
+        self.segment_renderer = segment_renderer
+        self.audio_router = audio_router
+        self.backend_ready = True
+        
+        self.progress.stop()
+        self.generate_button.config(state=tk.NORMAL)
+        self.device_combo['values'] = devices
         
         if virtual_device:
             self.device_var.set(virtual_device)
-            self.audio_router = AudioRouter(virtual_device)
-            self.audio_router.start()
-            self._update_status("Audio router initialized", "green")
+            self._update_status("Ready - audio router initialized", "green")
         else:
             self._update_status("No virtual audio device found!", "red")
-            messagebox.showwarning(
-                "No Virtual Audio Device",
-                "No virtual audio cable device was found.\n\n"
-                "Please install VB-CABLE (Windows), BlackHole (macOS), "
-                "or configure PulseAudio (Linux)."
-            )
-        
-        # Populate device list
-        self._populate_audio_devices()
-    
-    def _populate_audio_devices(self):
-        """Populates the audio device dropdown."""
-        import pyaudio
-        p = pyaudio.PyAudio()
-        
-        devices = []
-        for i in range(p.get_device_count()):
-            info = p.get_device_info_by_index(i)
-            if info['maxOutputChannels'] > 0:
-                devices.append(info['name'])
+            if not self._probe_start:
+                messagebox.showwarning(
+                    "No Virtual Audio Device",
+                    "No virtual audio cable device was found.\n\n"
+                    "Please install VB-CABLE (Windows), BlackHole (macOS), "
+                    "or configure PulseAudio (Linux)."
+                )
+        
+        # Warm up anything the operator enabled or typed while loading
+        if self.segmented_var.get():
+            self._on_segmented_toggle()
+        else:
+            self._schedule_speculation()
         
-        p.terminate()
+        if self._probe_start:
+            self._report_startup("backend_ready")
+            self.root.destroy()
+    
+    def _refresh_devices(self):
+        """Re-enumerates devices when the dropdown opens so newly visible ones show up."""
+        if not self.backend_ready:
+            return
+        from device_registry import get_registry
+        registry = get_registry()
+        registry.refresh()
+        self.device_combo['values'] = registry.output_names()
+    
+    def _on_backend_failed(self, error: str):
+        """Reports a backend initialization failure (runs on the Tk thread)."""
+        self.progress.stop()
+        self._update_status(f"Initialization failed: {error}", "red")
         
-        self.device_combo['values'] = devices
+        if self._probe_start:
+            self._report_startup("backend_failed")
+            self.root.destroy()
+        else:
+            messagebox.showerror("Error", f"Failed to initialize:\n{error}")
+    
+    def _report_startup(self, milestone: str):
+        """Prints a startup milestone for startup_benchmark.py."""
+        print(f"{milestone} {time.time() - float(self._probe_start):.4f}", flush=True)
+    
+    def _on_segmented_toggle(self):
+        """Pre-renders the fixed phrases in the background when segmented mode is enabled."""
+        if not self.backend_ready:
+            return
+        if self.segmented_var.get() and not self.segment_renderer.is_warm:
+            threading.Thread(target=self.segment_renderer.warm_up, daemon=True).start()
+        self._schedule_speculation()
+    
+    def _speculation_key(self):
+        """Identifies the audio the current inputs would produce (None if incomplete)."""
+        if not self.name_var.get() or not self.case_var.get():
+            return None
+        values = message_values(self.name_var.get(), self.case_var.get())
+        return (self.segmented_var.get(), values['full_name'], values['case_number'])
+    
+    def _schedule_speculation(self):
+        """Restarts the debounced speculative render for the current inputs."""
+        if not self.backend_ready:
+            return
+        key = self._speculation_key()
+        if key is None:
+            self.speculator.cancel()
+        else:
+            self.speculator.schedule(key)
+    
+    def _render_speculative(self, key):
+        """Renders the message frames for a speculation key (runs on a worker thread)."""
+        # Key values are already normalized; message_values() leaves them unchanged
+        segmented, full_name, case_number = key
+        return self._render_frames(segmented, full_name, case_number)
+    
+    def _render_frames(self, segmented: bool, full_name: str, case_number: str):
+        """Renders the complete message as frames, the same way for sends and speculation."""
+        if segmented:
+            return self.segment_renderer.render_frames(**message_values(full_name, case_number))
+        return self.tts.generate_frames(render_message(full_name, case_number, self.message_template))
     
     def _update_preview(self, *args):
         """Updates the message preview."""
@@ -175,6 +311,8 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
         
         self.preview_text.delete(1.0, tk.END)
         self.preview_text.insert(1.0, message)
+        
+        self._schedule_speculation()
     
     def _update_status(self, message: str, color: str = "black"):
         """Updates the status label."""
@@ -191,6 +329,10 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
             messagebox.showerror("Error", "Please enter a case number.")
             return
         
+        if not self.backend_ready:
+            messagebox.showerror("Error", "Still loading, please wait.")
+            return
+        
         if not self.audio_router:
             messagebox.showerror("Error", "Audio router not initialized.")
             return
@@ -200,21 +342,69 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
         self.stop_button.config(state=tk.NORMAL)
         self.progress.start()
         
-        # Start generation in separate thread
+        # Start generation in separate thread, timing every stage from this click
         self.is_transmitting = True
-        thread = threading.Thread(target=self._generate_and_send)
+        trace = get_metrics().trace("send")
+        thread = threading.Thread(target=self._generate_and_send, args=(trace,))
         thread.start()
     
-    def _generate_and_send(self):
+    def _generate_and_send(self, trace):
         """Generates and sends the audio (runs in separate thread)."""
+        try:
+            with use_trace(trace):
+                self._transmit()
+            self._finish_trace(trace)
+        finally:
+            # Re-enable button and stop progress
+            self.root.after(0, self._reset_ui)
+    
+    def _transmit(self):
+        """Runs one transmission; stage marks land on the current trace."""
         try:
             self._update_status("Generating audio...", "blue")
             
             # Format the message
-            message = self.message_template.format(
-                full_name=self.name_var.get().upper(),
-                case_number=self._format_case_number(self.case_var.get())
-            )
+            message = render_message(self.name_var.get(), self.case_var.get(), self.message_template)
+            
+            # Speculation hit: the audio was rendered while the operator typed. A render
+            # still in flight is joined rather than duplicated by a second request
+            speculative = self.speculator.take(self._speculation_key(), timeout=SPECULATION_TIMEOUT)
+            if speculative is not None:
+                self._update_status("Transmitting pre-rendered audio...", "orange")
+                self._send_frames(speculative)
+                stats = self.speculator.stats()
+                self._update_status(
+                    f"Transmission complete (pre-rendered, {stats['hits']} hits / "
+                    f"{stats['misses']} misses, {stats['saved_seconds']:.1f} s saved)", "green")
+                return
+            
+            # Segmented mode: only the variable slots are synthesized
+            if self.segmented_var.get():
+                self._update_status("Rendering name and case number...", "blue")
+                frames = self._render_frames(True, self.name_var.get(), self.case_var.get())
+                
+                if not self.is_transmitting:
+                    return
+                
+                self._update_status("Transmitting audio...", "orange")
+                self._send_frames(frames)
+                self._update_status(f"Transmission complete{self._cache_summary()}", "green")
+                return
+            
+            # Streaming mode: synthesis and playback overlap (cache hits stream instantly too)
+            if self.streaming_var.get():
+                from streaming_pipeline import StreamingTTSPipeline
+                
+                self._update_status("Streaming audio...", "orange")
+                pipeline = StreamingTTSPipeline(self.tts, self.audio_router)
+                metrics = pipeline.run(message, should_continue=lambda: self.is_transmitting)
+                
+                if metrics['time_to_first_audio'] is not None:
+                    self._update_status(
+                        f"Transmission complete (first audio after "
+                        f"{metrics['time_to_first_audio'] * 1000:.0f} ms)"
+                        f"{self._cache_summary()}", "green")
+                return
             
             # Generate audio
             audio_data = self.tts.generate_speech(message)
@@ -224,42 +414,52 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
             
             self._update_status("Transmitting audio...", "orange")
             
-            # Send audio through router
-            # Split audio into chunks for real-time playback
-            chunk_size = 4096
-            audio_stream = io.BytesIO(audio_data)
-            
-            # Skip WAV header if present
-            if audio_data[:4] == b"RIFF":
-                audio_stream.seek(44)  # Standard WAV header size
-            
-            while self.is_transmitting:
-                chunk = audio_stream.read(chunk_size)
-                if not chunk:
+            # Send the WAV payload in its declared format; the router converts it once
+            audio_format, pcm = parse_wav(audio_data)
+            step = self.audio_router.chunk_size * audio_format.block_align
+            for start in range(0, len(pcm), step):
+                if not self.is_transmitting:
                     break
-                
-                self.audio_router.send_audio(chunk)
+                self.audio_router.send_audio(pcm[start:start + step], fmt=audio_format)
             
-            self._update_status("Transmission complete", "green")
+            self._update_status(f"Transmission complete{self._cache_summary()}", "green")
             
         except Exception as e:
             self._update_status(f"Error: {str(e)}", "red")
             messagebox.showerror("Error", f"Failed to generate/send audio:\n{str(e)}")
-        
-        finally:
-            # Re-enable button and stop progress
-            self.root.after(0, self._reset_ui)
     
-    def _format_case_number(self, case_number: str) -> str:
-        """Formats case number for speech (e.g., '582193' → '58...21...93')."""
-        # Remove any non-numeric characters
-        digits = ''.join(filter(str.isdigit, case_number))
-        
-        # Group digits for clearer speech
-        if len(digits) >= 6:
-            return f"{digits[:2]}...{digits[2:4]}...{digits[4:6]}"
-        else:
-            return case_number
+    def _finish_trace(self, trace):
+        """Waits for the message to play out, then records its stage timings and exports metrics."""
+        try:
+            if self.is_transmitting and self.audio_router is not None:
+                self.audio_router.drain(timeout=DRAIN_TIMEOUT)
+            trace.finish()
+            print(f"Stage timings: {trace.summary()}")
+            get_metrics().flush()
+        except Exception as e:
+            print(f"Warning: could not record stage timings: {e}")
+    
+    def _send_frames(self, frames):
+        """Sends float32 frames to the router in stream-sized chunks."""
+        chunk_frames = self.audio_router.chunk_size
+        for start in range(0, len(frames), chunk_frames):
+            if not self.is_transmitting:
+                break
+            self.audio_router.send_frames(frames[start:start + chunk_frames])
+    
+    def _cache_summary(self) -> str:
+        """Formats the TTS cache, request-sharing and underrun counters for the status line."""
+        summary = ""
+        if self.tts.cache is not None:
+            stats = self.tts.cache.stats()
+            summary = f" | cache {stats['hits']} hits / {stats['misses']} misses"
+        deduplicated = self.tts.inflight.stats()['deduplicated']
+        if deduplicated:
+            summary += f" | {deduplicated} shared requests"
+        underruns = self.audio_router.underruns
+        if underruns:
+            summary += f" | {underruns} underruns (buffering {self.audio_router.jitter.target_ms:.0f} ms)"
+        return summary
     
     def _on_stop(self):
         """Handles the Stop button click."""
@@ -270,7 +470,7 @@ Your Case Number is {case_number}. Disclaimer: This message is generated by an A
     
     def _reset_ui(self):
         """Resets UI elements after operation."""
-        self.generate_button.config(state=tk.NORMAL)
+        self.generate_button.config(state=tk.NORMAL if self.backend_ready else tk.DISABLED)
         self.stop_button.config(state=tk.DISABLED)
         self.progress.stop()
         self.is_transmitting = False
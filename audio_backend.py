@@ -0,0 +1,445 @@
+import bisect
+import math
+import os
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+from wav_codec import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, WavFormat, build_wav
+
+# PortAudio sample format codes (same values pyaudio exposes)
+paFloat32 = 1
+paInt32 = 2
+paInt24 = 4
+paInt16 = 8
+paInt8 = 16
+paUInt8 = 32
+
+# Stream callback return flags and status bits
+paContinue = 0
+paComplete = 1
+paAbort = 2
+paOutputUnderflow = 4
+
+# Error code pyaudio raises from write(..., exception_on_underflow=True)
+paOutputUnderflowed = -9980
+
+# Bytes per sample for each format code
+FORMAT_WIDTHS = {paFloat32: 4, paInt32: 4, paInt24: 3, paInt16: 2, paInt8: 1, paUInt8: 1}
+
+BACKEND_ENV = "AUDIO_BACKEND"
+BACKEND_FILE_ENV = "AUDIO_BACKEND_FILE"
+DEFAULT_RECORDING_FILE = "audio_backend_output.wav"
+
+
+def stream_wav_format(format: int, rate: int, channels: int) -> WavFormat:
+    """Describes the sample layout of a stream opened with the given format code."""
+    audio_format = WAVE_FORMAT_IEEE_FLOAT if format == paFloat32 else WAVE_FORMAT_PCM
+    return WavFormat(rate, channels, FORMAT_WIDTHS[format], audio_format)
+
+
+def format_for_wav(fmt: WavFormat) -> int:
+    """Picks the format code that plays samples laid out as `fmt` (the inverse of stream_wav_format)."""
+    if fmt.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return paFloat32
+    if fmt.sample_width == 4:
+        # get_format_from_width(4) means float; 32-bit PCM needs the integer code
+        return paInt32
+    return {1: paUInt8, 2: paInt16, 3: paInt24}[fmt.sample_width]
+
+
+class Recording(NamedTuple):
+    """Everything one stream of a recording backend was asked to play."""
+    format: WavFormat
+    data: bytes
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / self.format.byte_rate
+
+
+class AudioBackend:
+    """PyAudio-shaped output backend: device queries plus open() returning a blocking-write stream."""
+
+    name = "base"
+
+    def get_device_count(self) -> int:
+        raise NotImplementedError
+
+    def get_device_info_by_index(self, index: int) -> dict:
+        raise NotImplementedError
+
+    def get_default_output_device_info(self) -> dict:
+        return self.get_device_info_by_index(0)
+
+    def get_format_from_width(self, width: int, unsigned: bool = True) -> int:
+        """Maps a sample width to a format code the way pyaudio does."""
+        if width == 1:
+            return paUInt8 if unsigned else paInt8
+        if width == 2:
+            return paInt16
+        if width == 3:
+            return paInt24
+        if width == 4:
+            return paFloat32
+        raise ValueError(f"Invalid width: {width}")
+
+    def get_sample_size(self, format: int) -> int:
+        return FORMAT_WIDTHS[format]
+
+    def is_format_supported(self, rate: float, output_device: Optional[int] = None,
+                            output_channels: Optional[int] = None,
+                            output_format: Optional[int] = None, **kwargs) -> bool:
+        """Whether an output stream with this format can be opened (virtual sinks accept any format)."""
+        return output_format is None or output_format in FORMAT_WIDTHS
+
+    def open(self, format: int, channels: int, rate: int, output: bool = True,
+             output_device_index: Optional[int] = None, frames_per_buffer: int = 1024,
+             **kwargs):
+        raise NotImplementedError
+
+    def terminate(self):
+        pass
+
+
+class PyAudioBackend(AudioBackend):
+    """The real PortAudio devices via pyaudio."""
+
+    name = "pyaudio"
+
+    def __init__(self):
+        import pyaudio
+        self._pyaudio = pyaudio.PyAudio()
+
+    def __getattr__(self, attribute):
+        # Anything not overridden (host API queries etc.) goes straight to PyAudio
+        return getattr(self._pyaudio, attribute)
+
+    def get_device_count(self) -> int:
+        return self._pyaudio.get_device_count()
+
+    def get_device_info_by_index(self, index: int) -> dict:
+        return self._pyaudio.get_device_info_by_index(index)
+
+    def get_default_output_device_info(self) -> dict:
+        return self._pyaudio.get_default_output_device_info()
+
+    def is_format_supported(self, rate: float, output_device: Optional[int] = None,
+                            output_channels: Optional[int] = None,
+                            output_format: Optional[int] = None, **kwargs) -> bool:
+        if output_device is None:
+            output_device = self._pyaudio.get_default_output_device_info()['index']
+        try:
+            # pyaudio raises ValueError instead of returning False
+            return self._pyaudio.is_format_supported(rate, output_device=output_device,
+                                                     output_channels=output_channels,
+                                                     output_format=output_format, **kwargs)
+        except ValueError:
+            return False
+
+    def open(self, *args, **kwargs):
+        return self._pyaudio.open(*args, **kwargs)
+
+    def terminate(self):
+        self._pyaudio.terminate()
+
+
+class NullStream:
+    """Output stream that discards audio; with realtime pacing, write() blocks like a device would.
+
+    Opened with a stream_callback it instead pulls one buffer every
+    frames_per_buffer / rate seconds from a clock thread, like PortAudio.
+    """
+
+    def __init__(self, backend: 'NullBackend', format: int, channels: int, rate: int,
+                 frames_per_buffer: int, realtime: bool,
+                 stream_callback: Optional[Callable] = None, start: bool = True):
+        self.backend = backend
+        self.format = format
+        self.channels = channels
+        self.rate = rate
+        self.frames_per_buffer = frames_per_buffer
+        self.realtime = realtime
+        self.frame_bytes = FORMAT_WIDTHS[format] * channels
+
+        self.frames_written = 0
+        self.underflows = 0
+        self._active = False
+        self._clock_start: Optional[float] = None
+        self._clock_frames = 0
+
+        self._callback = stream_callback
+        self._callback_thread: Optional[threading.Thread] = None
+        if start:
+            self.start_stream()
+
+    @property
+    def buffer_frames(self) -> int:
+        """Frames the simulated device buffers ahead of playback (two buffers, as PortAudio typically does)."""
+        return 2 * self.frames_per_buffer
+
+    def _pace(self, frames: int) -> float:
+        """Blocks until the simulated device has room; returns when the written frames start playing.
+
+        The device clock runs continuously from start_stream() in whole buffers,
+        so audio written after the device ran dry starts at the next buffer
+        boundary plus one buffer of output latency.
+        """
+        now = time.perf_counter()
+        if self._clock_start is None:
+            self._clock_start = now
+            self._clock_frames = 0
+
+        played = (now - self._clock_start) * self.rate
+        if played > self._clock_frames:
+            # The device drained everything before this write arrived
+            if self._clock_frames > 0:
+                self.underflows += 1
+            boundary = math.ceil(played / self.frames_per_buffer) * self.frames_per_buffer
+            self._clock_frames = boundary + self.frames_per_buffer
+
+        play_time = self._clock_start + self._clock_frames / self.rate
+        self._clock_frames += frames
+        ahead = self._clock_frames - self.buffer_frames - played
+        if ahead > 0:
+            wake = now + ahead / self.rate
+            delay = wake - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return play_time
+
+    def write(self, frames: bytes, num_frames: Optional[int] = None,
+              exception_on_underflow: bool = False):
+        if self._callback is not None:
+            raise IOError("Cannot write to a callback stream")
+
+        data = bytes(frames)
+        count = num_frames if num_frames is not None else len(data) // self.frame_bytes
+        underflows = self.underflows
+        play_time = self._pace(count) if self.realtime else time.perf_counter()
+        self._consume(data, play_time)
+        self.frames_written += count
+
+        # Like PortAudio, the audio is written and the underflow reported afterwards
+        if exception_on_underflow and self.underflows != underflows:
+            raise IOError(paOutputUnderflowed, "Output underflowed")
+
+    def _run_callback(self):
+        """Clock thread: requests one buffer per period, flagging late wakeups as underflows."""
+        period = self.frames_per_buffer / self.rate
+        silence = bytes(self.frames_per_buffer * self.frame_bytes)
+        deadline = time.perf_counter()
+        status = 0
+
+        while self._active:
+            now = time.perf_counter()
+            if now < deadline:
+                time.sleep(deadline - now)
+            elif now - deadline > period:
+                # Scheduler stall: the device played silence we never supplied
+                status |= paOutputUnderflow
+                self.underflows += 1
+                deadline = now
+
+            play_time = deadline + period
+            time_info = {'current_time': time.perf_counter(), 'output_buffer_dac_time': play_time}
+            data, flag = self._callback(None, self.frames_per_buffer, time_info, status)
+            status = 0
+
+            data = bytes(data) if data else silence
+            self._consume(data, play_time)
+            self.frames_written += len(data) // self.frame_bytes
+            deadline += period
+
+            if flag != paContinue:
+                self._active = False
+
+    def _consume(self, data: bytes, play_time: float):
+        pass
+
+    def get_output_latency(self) -> float:
+        return self.buffer_frames / self.rate
+
+    def get_write_available(self) -> int:
+        return self.buffer_frames
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def is_stopped(self) -> bool:
+        return not self._active
+
+    def start_stream(self):
+        if self._active:
+            return
+        self._active = True
+        self._clock_start = time.perf_counter()
+        self._clock_frames = 0
+        if self._callback is not None:
+            self._callback_thread = threading.Thread(target=self._run_callback, daemon=True)
+            self._callback_thread.start()
+
+    def stop_stream(self):
+        self._active = False
+        self._clock_start = None
+        thread = self._callback_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._callback_thread = None
+
+    def close(self):
+        self.stop_stream()
+
+
+class NullBackend(AudioBackend):
+    """Headless sink: one fake output device that discards audio, paced to wall-clock time by default.
+
+    Every device index resolves to the same sink, so scripts with a hardcoded
+    index run unchanged.
+    """
+
+    name = "null"
+    device_name = "Null Output (virtual)"
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.streams: List[NullStream] = []
+
+    def get_device_count(self) -> int:
+        return 1
+
+    def get_device_info_by_index(self, index: int) -> dict:
+        return {
+            'index': 0,
+            'name': self.device_name,
+            'hostApi': 0,
+            'maxInputChannels': 0,
+            'maxOutputChannels': 2,
+            'defaultSampleRate': 48000.0,
+            'defaultLowOutputLatency': 0.01,
+            'defaultHighOutputLatency': 0.04,
+        }
+
+    def _make_stream(self, *args, **kwargs) -> NullStream:
+        return NullStream(self, *args, **kwargs)
+
+    def open(self, format: int, channels: int, rate: int, output: bool = True,
+             output_device_index: Optional[int] = None, frames_per_buffer: int = 1024,
+             stream_callback: Optional[Callable] = None, start: bool = True,
+             **kwargs) -> NullStream:
+        if not output:
+            raise ValueError(f"The {self.name} backend only supports output streams")
+        stream = self._make_stream(format, channels, int(rate), frames_per_buffer, self.realtime,
+                                   stream_callback=stream_callback, start=start)
+        self.streams.append(stream)
+        return stream
+
+
+class RecordingStream(NullStream):
+    """Null stream that keeps every byte written, optionally saving it as a WAV file on close.
+
+    `timeline` maps byte offsets in the buffer to the time they start playing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.buffer = bytearray()
+        self.timeline: List[Tuple[int, float]] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        super().__init__(*args, **kwargs)
+
+    def _consume(self, data: bytes, play_time: float):
+        with self._lock:
+            self.timeline.append((len(self.buffer), play_time))
+            self.buffer += data
+
+    def play_time(self, byte_offset: int) -> float:
+        """Returns when the frame at byte_offset starts playing."""
+        with self._lock:
+            index = bisect.bisect_right(self.timeline, (byte_offset, float("inf"))) - 1
+            start, play_time = self.timeline[index]
+        return play_time + (byte_offset - start) / self.frame_bytes / self.rate
+
+    @property
+    def wav_format(self) -> WavFormat:
+        return stream_wav_format(self.format, self.rate, self.channels)
+
+    def close(self):
+        super().close()
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            self.backend._finish(Recording(self.wav_format, bytes(self.buffer)))
+
+
+class RecordingBackend(NullBackend):
+    """Memory/file sink recording what would have been played; runs as fast as possible unless realtime.
+
+    Closed streams are collected in `recordings`; with `path` set, each closed
+    stream is also written there as a WAV file (later streams overwrite earlier ones).
+    """
+
+    name = "memory"
+    device_name = "Recording Output (virtual)"
+
+    def __init__(self, path: Optional[str] = None, realtime: bool = False):
+        super().__init__(realtime)
+        self.path = path
+        self.recordings: List[Recording] = []
+
+    def _make_stream(self, *args, **kwargs) -> RecordingStream:
+        return RecordingStream(self, *args, **kwargs)
+
+    def _finish(self, recording: Recording):
+        self.recordings.append(recording)
+        if self.path:
+            with open(self.path, "wb") as f:
+                f.write(build_wav(recording.format, recording.data))
+
+    def recorded(self) -> bytes:
+        """Returns everything played so far, including streams that are still open."""
+        open_streams = [bytes(s.buffer) for s in self.streams if not s._closed]
+        return b"".join([r.data for r in self.recordings] + open_streams)
+
+
+def create_backend(name: Optional[str] = None, **kwargs) -> AudioBackend:
+    """Builds the backend named by `name` or the AUDIO_BACKEND env var (pyaudio, null, memory or file)."""
+    name = (name or os.environ.get(BACKEND_ENV) or "pyaudio").lower()
+
+    if name == "pyaudio":
+        return PyAudioBackend()
+    if name == "null":
+        return NullBackend(**kwargs)
+    if name == "memory":
+        return RecordingBackend(**kwargs)
+    if name == "file":
+        kwargs.setdefault("path", os.environ.get(BACKEND_FILE_ENV, DEFAULT_RECORDING_FILE))
+        backend = RecordingBackend(**kwargs)
+        backend.name = "file"
+        return backend
+
+    raise ValueError(f"Unknown audio backend '{name}' (expected pyaudio, null, memory or file)")
+
+
+if __name__ == "__main__":
+    # Self-check: the null sink honors wall-clock timing, the memory sink records exactly what was written
+    import numpy as np
+
+    rate, channels, chunk = 48000, 2, 1024
+    tone = np.sin(2 * np.pi * 440 * np.arange(rate) / rate).astype(np.float32)
+    audio = np.repeat(tone[:, None], channels, axis=1)
+
+    for backend in (create_backend("null"), create_backend("memory")):
+        stream = backend.open(format=paFloat32, channels=channels, rate=rate,
+                              output=True, frames_per_buffer=chunk)
+        started = time.perf_counter()
+        for start in range(0, len(audio), chunk):
+            stream.write(audio[start:start + chunk].tobytes())
+        elapsed = time.perf_counter() - started
+        stream.stop_stream()
+        stream.close()
+        print(f"{backend.name:<7} 1.00 s of audio written in {elapsed:.3f} s "
+              f"({stream.underflows} underflows)")
+
+    recorded = np.frombuffer(backend.recorded(), dtype=np.float32).reshape(-1, channels)
+    print(f"memory  recorded {len(recorded)} frames, identical: {np.array_equal(recorded, audio)}")
\ No newline at end of file
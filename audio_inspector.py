@@ -1,32 +1,30 @@
-import pyaudio
 import platform
 import subprocess
 import json
 from typing import List, Dict, Any
+from device_registry import get_registry
 
 class AudioInspector:
     """Inspects and reports on system audio devices and their usage."""
     
     def __init__(self):
-        self.pyaudio = pyaudio.PyAudio()
+        self.registry = get_registry()
         self.platform = platform.system()
     
     def get_audio_devices(self) -> List[Dict[str, Any]]:
         """Retrieves all audio devices with their properties."""
         devices = []
         
-        for i in range(self.pyaudio.get_device_count()):
-            info = self.pyaudio.get_device_info_by_index(i)
-            
+        for info in self.registry.devices():
             # Extract relevant information
             device = {
-                'index': i,
-                'name': info['name'],
-                'channels': info['maxInputChannels'],
-                'sample_rate': int(info['defaultSampleRate']),
-                'is_input': info['maxInputChannels'] > 0,
-                'is_output': info['maxOutputChannels'] > 0,
-                'host_api': self.pyaudio.get_host_api_info_by_index(info['hostApi'])['name']
+                'index': info.index,
+                'name': info.name,
+                'channels': info.max_input_channels,
+                'sample_rate': int(info.default_sample_rate),
+                'is_input': info.is_input,
+                'is_output': info.is_output,
+                'host_api': info.host_api
             }
             devices.append(device)
         
@@ -160,10 +158,7 @@ class AudioInspector:
                 virtual_devices.append(device)
         
         return virtual_devices
-    
-    def __del__(self):
-        """Cleanup PyAudio instance."""
-        self.pyaudio.terminate()
+
 
 if __name__ == "__main__":
     inspector = AudioInspector()
@@ -1,62 +1,225 @@
-import pyaudio
+import asyncio
 import threading
 import queue
 import time
 import numpy as np
-from typing import Optional, Callable
+from typing import Optional, Callable, List
+from audio_backend import (AudioBackend, paAbort, paContinue, paFloat32, paInt16, paInt24,
+                           paOutputUnderflow, paOutputUnderflowed, stream_wav_format)
+from calibration import DEFAULT_CHUNK_SIZE, LatencyProfile, load_profile
+from device_registry import VIRTUAL_CABLE_KEYWORDS, DeviceRef, DeviceRegistry, get_registry
+from gain_control import LoudnessController
+from jitter_buffer import AdaptiveJitterBuffer
+from metrics import MetricsRegistry, Trace, current_trace, get_metrics
+from pcm_format import StreamConverter, convert_frames, encode_pcm, remix_channels
+from ring_buffer import RingBuffer
+from signal_generators import SignalGenerator
+from wav_codec import WAVE_FORMAT_IEEE_FLOAT, WavFormat
+
+# Stream formats tried in order when none is given: float32 is the router's
+# working format (no per-period conversion), then the narrowest integer
+# format that still holds 24-bit TTS output
+STREAM_FORMAT_PREFERENCE = (paFloat32, paInt24, paInt16)
+
+class _ProducerState:
+    """Send-side carry-over for one epoch: partial frame bytes, decoders and held converted frames.
+    
+    clear_queue() never touches it; the next send replaces it with a fresh one,
+    so a send still finishing in the old epoch can only modify the old state.
+    """
+    
+    def __init__(self, epoch: int, channels: int):
+        self.epoch = epoch
+        self.partial = b""
+        self.converters = {}
+        self.converted_pending = np.zeros((0, channels), dtype=np.float32)
 
 class AudioRouter:
-    """Routes audio data to virtual audio output devices."""
+    """Routes audio data to virtual audio output devices.
+    
+    In "callback" mode (default) PortAudio pulls exactly one buffer per period
+    from a preallocated ring that send_audio() writes into; gaps are filled
+    with silence. "blocking" mode keeps the original queue + stream.write()
+    playback thread.
+    
+    When the buffer runs dry mid-message the producer fell behind: that is an
+    underrun, and `jitter_buffer` (an AdaptiveJitterBuffer) raises the fill
+    playback waits for before resuming, lowering it again once playback has
+    been stable. Output underflows the stream itself reports are counted in
+    `xruns`. A playback failure stops output and is raised by the next send.
+    
+    Audio is held as float32 frames at the router's rate and channel count.
+    send_frames() takes float arrays and send_audio(..., fmt=...) PCM bytes of
+    a declared WavFormat; each is converted once on entry. The device stream
+    uses `sample_format` or the first of STREAM_FORMAT_PREFERENCE the device
+    accepts, so with a float32 stream nothing is converted per period. Without
+    a chunk_size the device's calibrated buffer size is used (calibration.py).
     
-    def __init__(self, device_name: Optional[str] = None, 
+    Either way at most `buffer_ms` of audio is held. When the buffer fills
+    (high watermark) send_audio() blocks until playback drains it to
+    `low_watermark_ms`; `on_watermark` is told "high" / "low" at each crossing.
+    
+    Audio sent while a metrics trace is current (metrics.use_trace) marks
+    "enqueue" on it, and the device side marks "first_write" / "last_write"
+    as that audio is handed to the stream.
+    
+    `background` (a signal_generators.SignalGenerator, e.g. a 50 Hz pilot
+    tone or comfort noise) is mixed under everything played, after the gain
+    stage. In callback mode it also fills the silent gaps between messages,
+    which keeps Teams' noise gate open.
+    """
+    
+    def __init__(self, device_name: DeviceRef = None, 
                  sample_rate: int = 48000,  # VB-Cable compatible
                  channels: int = 2,          # VB-Cable stereo
-                 chunk_size: int = 2048):    # Larger chunks for 48kHz
-        self.pyaudio = pyaudio.PyAudio()
-        self.device_index = self._find_device(device_name) if device_name else None
+                 chunk_size: Optional[int] = None,  # None: calibrated size for the device, else 2048
+                 gain_stage: Optional[LoudnessController] = None,
+                 backend: Optional[AudioBackend] = None,
+                 mode: str = "callback",
+                 buffer_ms: float = 400.0,
+                 low_watermark_ms: float = 200.0,
+                 on_watermark: Optional[Callable[[str], None]] = None,
+                 sample_format: Optional[int] = None,
+                 registry: Optional[DeviceRegistry] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 jitter_buffer: Optional[AdaptiveJitterBuffer] = None,
+                 background: Optional[SignalGenerator] = None):
+        if mode not in ("callback", "blocking"):
+            raise ValueError(f"Unknown router mode '{mode}' (expected callback or blocking)")
+        
+        # The shared registry's backend (PyAudio, or AUDIO_BACKEND=null/memory/file) unless one is given
+        self.registry = registry or (DeviceRegistry(backend) if backend else get_registry())
+        self.backend = self.registry.backend
+        self.device_index = self._find_device(device_name) if device_name is not None else None
+        
+        # Buffer size as given, else from the device's calibrated profile (see calibration.py)
+        self.profile: Optional[LatencyProfile] = None
+        if chunk_size is None:
+            self.profile = self._load_profile(sample_rate, channels)
+            chunk_size = self.profile.chunk_size if self.profile else DEFAULT_CHUNK_SIZE
+        
         self.sample_rate = sample_rate
         self.channels = channels
         self.chunk_size = chunk_size
+        self.mode = mode
+        self.sample_format = sample_format
+        self.stream_format: Optional[WavFormat] = None
         self.audio_queue = queue.Queue()
         self.is_running = False
         self.stream = None
         self.playback_thread = None
-    
-    def _find_device(self, device_name: str) -> Optional[int]:
-        """Finds output device by name."""
-        for i in range(self.pyaudio.get_device_count()):
-            info = self.pyaudio.get_device_info_by_index(i)
-            if device_name.lower() in info['name'].lower() and info['maxOutputChannels'] > 0:
-                print(f"Found audio device: {info['name']} (Index: {i})")
-                return i
         
-        print(f"Warning: Device '{device_name}' not found. Using default.")
-        return None
+        # Bounded buffer: capacity is the high watermark, producers resume below the low one
+        self.capacity_frames = max(chunk_size, int(sample_rate * buffer_ms / 1000))
+        self.low_watermark_frames = min(self.capacity_frames - 1, int(sample_rate * low_watermark_ms / 1000))
+        self.on_watermark = on_watermark
+        self._space = threading.Condition()
+        self._full = False
+        self._epoch = 0
+        self._queued_frames = 0
+        
+        # Callback mode: producers write into the ring, the PortAudio callback reads from it
+        self.ring = RingBuffer(self.capacity_frames, channels)
+        self._callback_out = np.zeros((chunk_size, channels), dtype=np.float32)
+        self._callback_scratch = np.zeros((chunk_size, channels), dtype=np.float32)
+        self._enqueued_frames = 0
+        
+        # Underrun handling: fill target for (re)starting playback, adapted to the producer
+        self.jitter = jitter_buffer or AdaptiveJitterBuffer(
+            sample_rate, chunk_size, max_ms=min(200.0, low_watermark_ms))
+        self.xruns = 0
+        self.playback_error: Optional[BaseException] = None
+        
+        # Partial frames, decoders for send_audio(..., fmt=...) and converted frames a
+        # partial accept left behind, for the current epoch
+        self._producer = _ProducerState(self._epoch, channels)
+        
+        # Optional causal AGC/limiter applied to everything played
+        self.gain_stage = gain_stage
+        self._gain_stage_primed = False
+        self._gain_pending = np.zeros((0, channels), dtype=np.float32)
+        # Epoch of the last clear_queue() the consumer has applied to the gain stage
+        self._gain_epoch = 0
+        
+        # Optional signal (pilot tone, comfort noise) mixed under the output
+        self.background = background
+        
+        # Timing: the trace of the audio being played, plus per-buffer device-side costs
+        self.metrics = metrics or get_metrics()
+        self.trace: Optional[Trace] = None
+        if mode == "callback":
+            self._buffer_seconds = self.metrics.histogram(
+                "router_callback_seconds", help="Time spent filling one device buffer in the stream callback")
+        else:
+            self._buffer_seconds = self.metrics.histogram(
+                "router_write_seconds", help="Time blocked in one stream.write() call")
+        self._underrun_counter = self.metrics.counter(
+            "router_underruns_total", help="Times the producer fell behind and playback ran dry mid-message")
+        self._xrun_counter = self.metrics.counter(
+            "router_xruns_total", help="Output underflows reported by the audio stream")
+        self._jitter_on_underrun = self.jitter.on_underrun
+        self.jitter.on_underrun = self._on_underrun
+    
+    def _find_device(self, device_name: DeviceRef) -> Optional[int]:
+        """Finds output device by name (or index) in the device registry."""
+        device = self.registry.resolve(device_name)
+        if device is None:
+            return None
+        print(f"Found audio device: {device.name} (Index: {device.index})")
+        return device.index
+    
+    def _load_profile(self, sample_rate: int, channels: int) -> Optional[LatencyProfile]:
+        """Loads the calibrated latency profile of the output device, if one was saved."""
+        if self.device_index is not None:
+            device = self.registry.get(self.device_index)
+        else:
+            device = self.registry.default_output()
+        return load_profile(device, sample_rate, channels)
+    
+    def _choose_sample_format(self) -> int:
+        """Picks the first preferred stream format the output device accepts."""
+        for sample_format in STREAM_FORMAT_PREFERENCE:
+            if self.backend.is_format_supported(self.sample_rate, output_device=self.device_index,
+                                                output_channels=self.channels,
+                                                output_format=sample_format):
+                return sample_format
+        return paFloat32
     
     def start(self):
-        """Starts the audio routing thread."""
+        """Starts the audio routing thread (or the stream callback in callback mode)."""
         if self.is_running:
             return
         
         self.is_running = True
+        self.playback_error = None
+        callback = self._stream_callback if self.mode == "callback" else None
         
-        # Open audio stream with VB-Cable compatible format
-        # Note: PyAudio doesn't have direct 24-bit support, we'll use 32-bit float
-        # which VB-Cable can handle and provides good quality
-        self.stream = self.pyaudio.open(
-            format=pyaudio.paFloat32,  # Better compatibility than paInt24
+        # Open the stream in the device's format (float32 for VB-Cable)
+        if self.sample_format is None:
+            self.sample_format = self._choose_sample_format()
+        self.stream_format = stream_wav_format(self.sample_format, self.sample_rate, self.channels)
+        self.stream = self.backend.open(
+            format=self.sample_format,
             channels=self.channels,
             rate=self.sample_rate,
             output=True,
             output_device_index=self.device_index,
-            frames_per_buffer=self.chunk_size
+            frames_per_buffer=self.chunk_size,
+            stream_callback=callback,
+            start=False
         )
         
-        # Start playback thread
-        self.playback_thread = threading.Thread(target=self._playback_loop)
-        self.playback_thread.start()
+        if callback is not None:
+            self.stream.start_stream()
+        else:
+            # Start playback thread
+            self.stream.start_stream()
+            self.playback_thread = threading.Thread(target=self._playback_loop)
+            self.playback_thread.start()
         
-        print(f"Audio router started: {self.sample_rate}Hz, {self.channels} channels")
+        calibrated = " (calibrated)" if self.profile else ""
+        print(f"Audio router started: {self.sample_rate}Hz, {self.channels} channels, "
+              f"{self._format_label()}, {self.chunk_size}-frame buffer{calibrated} ({self.mode} mode)")
     
     def stop(self):
         """Stops the audio routing thread."""
@@ -65,8 +228,10 @@ class AudioRouter:
         
         self.is_running = False
         
-        # Signal thread to stop
+        # Signal thread to stop and release any producer waiting for space
         self.audio_queue.put(None)
+        with self._space:
+            self._space.notify_all()
         
         # Wait for thread to finish
         if self.playback_thread:
@@ -79,33 +244,422 @@ class AudioRouter:
         
         print("Audio router stopped.")
     
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback: pulls frame_count frames from the ring, padding gaps with silence."""
+        started = time.perf_counter()
+        try:
+            if frame_count == self.chunk_size:
+                out = self._callback_out
+            else:
+                out = np.zeros((frame_count, self.channels), dtype=np.float32)
+            
+            if status & paOutputUnderflow:
+                self._on_xrun()
+            self._sync_gain_stage()
+            
+            # After running dry, hold off until the jitter buffer's target fill is reached
+            jitter = self.jitter
+            filled = 0
+            if jitter.playing or jitter.ready(self.ring.available + len(self._gain_pending),
+                                              self.ring.written, started):
+                filled = self._read_frames(out)
+                jitter.on_played(filled)
+                if filled < frame_count:
+                    jitter.on_dry(started)
+            
+            if filled and self.trace is not None:
+                self._mark_write(started)
+            if filled < frame_count:
+                out[filled:] = 0.0
+            if self.background is not None:
+                self._mix_background(out)
+            
+            if self._full:
+                self._check_low_watermark()
+            
+            data = self._encode_output(out)
+            self._buffer_seconds.observe(time.perf_counter() - started)
+            return data, paContinue
+        except Exception as e:
+            self._fail(e)
+            return b"", paAbort
+    
+    def _read_frames(self, out: np.ndarray) -> int:
+        """Fills out from the ring (through the gain stage if set); returns the frames filled."""
+        if self.gain_stage is None:
+            return self.ring.read_into(out)
+        
+        frame_count = len(out)
+        filled = 0
+        
+        # Processed frames left over from the previous callback go first
+        if len(self._gain_pending):
+            filled = min(len(self._gain_pending), frame_count)
+            out[:filled] = self._gain_pending[:filled]
+            self._gain_pending = self._gain_pending[filled:]
+        
+        while filled < frame_count:
+            count = self.ring.read_into(self._callback_scratch[:frame_count - filled])
+            if count:
+                processed = self.gain_stage.process(self._callback_scratch[:count])
+                self._gain_stage_primed = True
+            elif self._gain_stage_primed:
+                # Ring ran dry: release the lookahead tail right behind the last frames
+                processed = self.gain_stage.flush()
+                self._gain_stage_primed = False
+            else:
+                break
+            
+            taken = min(len(processed), frame_count - filled)
+            out[filled:filled + taken] = processed[:taken]
+            self._gain_pending = processed[taken:]
+            filled += taken
+        
+        return filled
+    
     def _playback_loop(self):
         """Main playback loop that processes audio queue."""
-        while self.is_running:
-            try:
-                # Get audio data from queue (timeout prevents hanging)
-                audio_data = self.audio_queue.get(timeout=0.1)
+        try:
+            while self.is_running:
+                try:
+                    audio_data = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    # Nothing left to hand the device: the stream runs dry (or a message ended)
+                    if self.jitter.playing:
+                        self.jitter.on_dry(time.perf_counter())
+                    try:
+                        # Get audio data from queue (timeout prevents hanging)
+                        audio_data = self.audio_queue.get(timeout=0.1)
+                    except queue.Empty:
+                        # Idle: release the tail held in the gain stage's lookahead
+                        self._sync_gain_stage()
+                        if self._gain_stage_primed:
+                            self._gain_stage_primed = False
+                            self._write(self.gain_stage.flush(), resumed=True)
+                        continue
                 
                 if audio_data is None:  # Stop signal
                     break
                 
-                # Write to audio stream
-                self.stream.write(audio_data)
-                
-            except queue.Empty:
-                # No audio data available, continue
-                continue
-            except Exception as e:
-                print(f"Playback error: {e}")
+                frames = len(audio_data) // (4 * self.channels)
+                try:
+                    resumed = not self.jitter.playing
+                    if resumed:
+                        self._wait_for_fill()
+                    
+                    frames_out = np.frombuffer(audio_data, dtype=np.float32).reshape(-1, self.channels)
+                    
+                    # Level the audio before it reaches the device
+                    self._sync_gain_stage()
+                    if self.gain_stage is not None:
+                        frames_out = self._apply_gain_stage(frames_out)
+                    
+                    # Write to audio stream
+                    self._write(frames_out, resumed)
+                    self.jitter.on_played(frames)
+                finally:
+                    with self._space:
+                        self._queued_frames -= frames
+                    self._check_low_watermark()
+        except Exception as e:
+            self._fail(e)
+    
+    def _wait_for_fill(self):
+        """Blocking mode: holds the next write until the jitter buffer's target fill is queued."""
+        period = self.chunk_size / self.sample_rate
+        while self.is_running and not self.jitter.ready(self._queued_frames, self._enqueued_frames,
+                                                         time.perf_counter()):
+            time.sleep(period)
+    
+    def _write(self, frames: np.ndarray, resumed: bool = False):
+        """Blocking mode: writes float32 frames to the stream, timing the call.
+        
+        The device was expected to run out before the first write after a
+        pause (resumed), so an underflow reported by that write is not an xrun.
+        """
+        if self.background is not None:
+            frames = self._mix_background(np.array(frames, dtype=np.float32))
+        data = self._encode_output(frames)
+        started = time.perf_counter()
+        if self.trace is not None and len(frames):
+            self._mark_write(started)
+        try:
+            self.stream.write(data, exception_on_underflow=True)
+        except IOError as e:
+            # The data was written; the stream only reports that it ran out before it
+            if e.errno != paOutputUnderflowed:
+                raise
+            if not resumed:
+                self._on_xrun()
+        self._buffer_seconds.observe(time.perf_counter() - started)
+    
+    def _mix_background(self, frames: np.ndarray) -> np.ndarray:
+        """Adds the background signal to frames in place, keeping them in [-1, 1]."""
+        self.background.mix_into(frames)
+        return np.clip(frames, -1.0, 1.0, out=frames)
+    
+    def _on_underrun(self):
+        self._underrun_counter.inc()
+        if self._jitter_on_underrun is not None:
+            self._jitter_on_underrun()
+    
+    def _on_xrun(self):
+        self.xruns += 1
+        self._xrun_counter.inc()
+    
+    def _fail(self, error: BaseException):
+        """Stops output after a playback error; the next send raises it."""
+        import traceback
+        print(f"Playback error: {error}")
+        traceback.print_exception(type(error), error, error.__traceback__)
+        self.playback_error = error
+        with self._space:
+            self._space.notify_all()
+    
+    def _check_playback(self):
+        """Raises the error that stopped playback, if any."""
+        if self.playback_error is not None:
+            raise RuntimeError(f"Audio playback failed: {self.playback_error}") from self.playback_error
+    
+    def _mark_write(self, at: float):
+        """Marks audio of the current trace reaching the device; forgets the trace once finished."""
+        trace = self.trace
+        if trace is None:
+            return
+        if trace.finished:
+            self.trace = None
+            return
+        trace.mark("first_write", at)
+        trace.mark("last_write", at, first=False)
+    
+    def _sync_gain_stage(self):
+        """Consumer side: drops gain-stage audio and state left over from before the last clear_queue()."""
+        epoch = self._epoch
+        if epoch == self._gain_epoch:
+            return
+        self._gain_epoch = epoch
+        self._gain_pending = self._gain_pending[:0]
+        self._gain_stage_primed = False
+        if self.gain_stage is not None:
+            self.gain_stage.reset()
+    
+    def _apply_gain_stage(self, frames: np.ndarray) -> np.ndarray:
+        """Runs float32 frames through the gain stage."""
+        self._gain_stage_primed = True
+        return self.gain_stage.process(frames)
+    
+    def _encode_output(self, frames: np.ndarray) -> bytes:
+        """Converts float32 frames to the stream's sample format."""
+        if self.stream_format.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+            return frames.tobytes()
+        return encode_pcm(frames, self.stream_format.sample_width)
+    
+    def _format_label(self) -> str:
+        if self.stream_format.audio_format == WAVE_FORMAT_IEEE_FLOAT:
+            return "float32"
+        return f"{self.stream_format.sample_width * 8}-bit"
+    
+    @property
+    def buffered_frames(self) -> int:
+        """Frames sent but not yet handed to the device."""
+        if self.mode == "callback":
+            return self.ring.available
+        return self._queued_frames
+    
+    @property
+    def buffered_duration(self) -> float:
+        """Seconds of audio sent but not yet handed to the device."""
+        return self.buffered_frames / self.sample_rate
+    
+    def _check_low_watermark(self):
+        """Consumer side: wakes producers once the buffer has drained to the low watermark."""
+        if not self._full or self.buffered_frames > self.low_watermark_frames:
+            return
+        with self._space:
+            self._full = False
+            self._space.notify_all()
+        if self.on_watermark is not None:
+            self.on_watermark("low")
     
-    def send_audio(self, audio_data: bytes):
-        """Sends audio data to the output device."""
+    def _refill_wait(self) -> float:
+        """Seconds until playback should have drained the buffer to the low watermark."""
+        backlog = self.buffered_frames - self.low_watermark_frames
+        return max(self.chunk_size / self.sample_rate / 4, backlog / self.sample_rate)
+    
+    def _producer_state(self) -> _ProducerState:
+        """Producer side: the send state for the current epoch, started fresh after a clear_queue()."""
+        state = self._producer
+        epoch = self._epoch
+        if state.epoch != epoch:
+            state = _ProducerState(epoch, self.channels)
+            self._producer = state
+        return state
+    
+    def _accept(self, audio_data: bytes, state: _ProducerState) -> int:
+        """Moves as many whole frames as fit into the buffer without blocking; returns bytes consumed.
+        
+        Nothing is accepted once clear_queue() has started a new epoch.
+        """
+        epoch = state.epoch
+        if epoch != self._epoch:
+            return 0
+        
+        frame_bytes = 4 * self.channels
+        carried = len(state.partial)
+        data = state.partial + bytes(audio_data) if carried else audio_data
+        
+        whole = len(data) // frame_bytes
+        count = min(whole, max(0, self.capacity_frames - self.buffered_frames))
+        if count:
+            trace = current_trace()
+            if trace is not None:
+                trace.mark("enqueue")
+                self.trace = trace
+            if self.mode == "callback":
+                frames = np.frombuffer(data, dtype=np.float32, count=count * self.channels)
+                # Under the lock clear_queue() bumps the epoch with, so a write either
+                # lands before its ring.clear() or not at all
+                with self._space:
+                    if epoch != self._epoch:
+                        return 0
+                    count = self.ring.write(frames.reshape(-1, self.channels))
+            else:
+                # Device-sized items, so a Stop only waits for the write in progress
+                step = self.chunk_size * frame_bytes
+                with self._space:
+                    if epoch != self._epoch:
+                        return 0
+                    self._queued_frames += count
+                    self._enqueued_frames += count
+                    for start in range(0, count * frame_bytes, step):
+                        self.audio_queue.put(bytes(data[start:min(start + step, count * frame_bytes)]))
+        
+        if count == whole:
+            # Everything fitted; a partial trailing frame waits for the next call
+            state.partial = bytes(data[count * frame_bytes:])
+            return len(audio_data)
+        
+        if self.buffered_frames >= self.capacity_frames and not self._full:
+            self._full = True
+            if self.on_watermark is not None:
+                self.on_watermark("high")
+        
+        if count == 0:
+            return 0
+        state.partial = b""
+        return count * frame_bytes - carried
+    
+    def send_frames(self, frames: np.ndarray, sample_rate: Optional[int] = None,
+                    block: bool = True, timeout: Optional[float] = None) -> int:
+        """Sends float frames (frames x channels, or 1-D mono); returns the frames accepted.
+        
+        Other channel counts are remixed; a different sample_rate is resampled
+        treating frames as one complete clip (stream through send_audio(..., fmt=...)
+        instead to resample chunk by chunk).
+        """
+        frames = np.asarray(frames, dtype=np.float32)
+        if frames.ndim == 1:
+            frames = frames[:, None]
+        if sample_rate and sample_rate != self.sample_rate:
+            frames = convert_frames(frames, sample_rate, self.sample_rate, self.channels)
+        else:
+            frames = remix_channels(frames, self.channels)
+        
+        data = memoryview(np.ascontiguousarray(frames)).cast('B')
+        return self.send_audio(data, block=block, timeout=timeout) // (4 * self.channels)
+    
+    def send_audio(self, audio_data: bytes, fmt: Optional[WavFormat] = None,
+                   block: bool = True, timeout: Optional[float] = None) -> int:
+        """Sends audio data to the output device; returns the bytes accepted.
+        
+        Without fmt the bytes must be interleaved float32 at the router's rate and
+        channel count. With fmt they are decoded (and remixed/resampled) on entry;
+        partial frames carry over to the next call with the same format.
+        
+        With block=True this waits for space while the buffer is full, returning
+        early if clear_queue() or stop() is called. With block=False it takes only
+        what fits right now. With fmt the input is either taken whole or not at
+        all: converted frames that do not fit are held by the router and go out
+        ahead of the next call's, and a call returns 0 while they are still held.
+        """
         if not self.is_running:
             print("Warning: Audio router not started.")
-            return
+            return 0
+        self._check_playback()
+        
+        state = self._producer_state()
+        if fmt is not None:
+            # The converter's state has moved past held frames, so they must go first
+            if not self._send_converted_pending(state, block, timeout):
+                self._check_playback()
+                return 0
+            frames = self._converter(state, fmt).process(audio_data)
+            self._send_converted(state, frames, block, timeout)
+            self._check_playback()
+            return len(audio_data)
+        
+        epoch = state.epoch
+        accepted = self._accept(audio_data, state)
+        if not block:
+            return accepted
         
-        # Add to queue for playback
-        self.audio_queue.put(audio_data)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while accepted < len(audio_data):
+            with self._space:
+                if not self.is_running or self._epoch != epoch or self.playback_error is not None:
+                    break
+                wait = self._refill_wait()
+                if deadline is not None:
+                    wait = min(wait, deadline - time.perf_counter())
+                    if wait <= 0:
+                        break
+                if self._full:
+                    self._space.wait(wait)
+            accepted += self._accept(audio_data[accepted:], state)
+        self._check_playback()
+        return accepted
+    
+    def _send_converted(self, state: _ProducerState, frames: np.ndarray, block: bool,
+                        timeout: Optional[float]):
+        """Sends converted frames, holding whatever does not fit for the next call."""
+        accepted = self.send_frames(frames, block=block, timeout=timeout) if len(frames) else 0
+        if accepted < len(frames):
+            state.converted_pending = frames[accepted:]
+    
+    def _send_converted_pending(self, state: _ProducerState, block: bool,
+                                timeout: Optional[float]) -> bool:
+        """Sends frames held from an earlier partial accept; True once none are left."""
+        pending = state.converted_pending
+        if not len(pending):
+            return True
+        state.converted_pending = pending[:0]
+        self._send_converted(state, pending, block, timeout)
+        return not len(state.converted_pending)
+    
+    def _converter(self, state: _ProducerState, fmt: WavFormat) -> StreamConverter:
+        """Returns the decoder for fmt, creating it on first use."""
+        converter = state.converters.get(fmt)
+        if converter is None:
+            converter = StreamConverter(fmt.sample_rate, fmt.channels, fmt.sample_width,
+                                        self.sample_rate, self.channels, fmt.audio_format)
+            state.converters[fmt] = converter
+        return converter
+    
+    async def send_audio_async(self, audio_data: bytes) -> int:
+        """Asyncio variant of send_audio: awaits space instead of blocking the event loop."""
+        if not self.is_running:
+            print("Warning: Audio router not started.")
+            return 0
+        self._check_playback()
+        
+        state = self._producer_state()
+        accepted = self._accept(audio_data, state)
+        while (accepted < len(audio_data) and self.is_running and self._epoch == state.epoch
+               and self.playback_error is None):
+            await asyncio.sleep(self._refill_wait())
+            accepted += self._accept(audio_data[accepted:], state)
+        self._check_playback()
+        return accepted
     
     def send_audio_stream(self, audio_generator):
         """Sends audio from a generator/stream."""
@@ -115,12 +669,74 @@ class AudioRouter:
             self.send_audio(chunk)
     
     def clear_queue(self):
-        """Clears any pending audio in the queue."""
+        """Clears any pending audio in the queue and releases blocked producers."""
+        # New epoch first, so in-flight sends stop adding audio before the buffer is emptied
+        # The ring is cleared under the same lock, so callback-mode writes of the
+        # old epoch land before the clear and writes of the new one after it
+        with self._space:
+            self._epoch += 1
+            self.ring.clear()
+            was_full = self._full
+            self._full = False
+            self._space.notify_all()
+        
+        # Producers start fresh send state, and the consumer drops gain-stage
+        # leftovers, when each sees the new epoch
+        self.end_stream()
         while not self.audio_queue.empty():
             try:
-                self.audio_queue.get_nowait()
+                audio_data = self.audio_queue.get_nowait()
             except queue.Empty:
                 break
+            if audio_data is None:
+                # Keep the stop signal for the playback thread
+                self.audio_queue.put(None)
+                break
+            with self._space:
+                self._queued_frames -= len(audio_data) // (4 * self.channels)
+        
+        if was_full and self.on_watermark is not None:
+            self.on_watermark("low")
+    
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything sent so far has been handed to the device; False on timeout."""
+        # Release held converted frames, then the resampler tails of declared-format streams
+        state = self._producer_state()
+        self._send_converted_pending(state, True, timeout)
+        converters, state.converters = state.converters, {}
+        for converter in converters.values():
+            tail = converter.flush()
+            if len(tail):
+                self.send_frames(tail, timeout=timeout)
+        
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.is_running and (self.buffered_frames or
+                                   (len(self._gain_pending) and self._gain_epoch == self._epoch)):
+            self._check_playback()
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.chunk_size / self.sample_rate / 4)
+        
+        self.end_stream()
+        return True
+    
+    def end_stream(self):
+        """Marks the audio sent so far as a complete message, so running dry after it is not an underrun."""
+        self.jitter.end_of_stream()
+    
+    @property
+    def underruns(self) -> int:
+        """Times the producer fell behind and playback ran dry mid-message."""
+        return self.jitter.underruns
+    
+    def stats(self) -> dict:
+        """Returns underrun/xrun counters, the jitter buffer target and the current fill."""
+        stats = self.jitter.stats()
+        stats.update({
+            'xruns': self.xruns,
+            'buffered_ms': self.buffered_duration * 1000,
+        })
+        return stats
     
     def get_latency(self) -> float:
         """Returns the current audio latency in seconds."""
@@ -129,25 +745,133 @@ class AudioRouter:
         return 0.0
     
     def __del__(self):
-        """Cleanup resources."""
+        """Cleanup resources (the backend belongs to the device registry)."""
         self.stop()
-        self.pyaudio.terminate()
+
+def list_output_devices(backend: Optional[AudioBackend] = None) -> List[str]:
+    """Lists the names of all output-capable devices (from the shared registry's cached enumeration)."""
+    registry = DeviceRegistry(backend) if backend else get_registry()
+    return registry.output_names()
 
 # Utility function for finding virtual cable device
-def find_virtual_cable_device() -> Optional[str]:
-    """Automatically finds virtual audio cable device name."""
-    p = pyaudio.PyAudio()
+def find_virtual_cable_device(devices: Optional[List[str]] = None) -> Optional[str]:
+    """Automatically finds virtual audio cable device name (from an existing device list if given)."""
+    if devices is None:
+        device = get_registry().virtual_cable()
+        if device is not None:
+            print(f"Found virtual cable: {device.name}")
+        return device.name if device else None
+    
+    for name in devices:
+        device_name = name.lower()
+        if any(kw in device_name for kw in VIRTUAL_CABLE_KEYWORDS):
+            print(f"Found virtual cable: {name}")
+            return name
     
-    virtual_keywords = ['cable input', 'cable output', 'vb-audio', 'blackhole', 'virtual']
+    return None
+
+def benchmark_modes(trials: int = 40, chunk_size: int = 1024) -> dict:
+    """Measures send-to-playout latency, its jitter, underruns and xruns for callback vs blocking mode."""
+    from audio_backend import RecordingBackend
+    
+    rng = np.random.default_rng(0)
+    results = {}
     
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
-        device_name = info['name'].lower()
+    for mode in ("callback", "blocking"):
+        backend = RecordingBackend(realtime=True)
+        router = AudioRouter(backend=backend, chunk_size=chunk_size, mode=mode)
+        router.start()
+        
+        # Isolated clicks: when does a chunk sent from idle start playing?
+        impulse = np.zeros((chunk_size, router.channels), dtype=np.float32)
+        impulse[0] = 0.5
+        sent = []
+        for _ in range(trials):
+            time.sleep(rng.uniform(0.05, 0.1))
+            sent.append(time.perf_counter())
+            router.send_audio(impulse.tobytes())
+            router.end_stream()
+        router.drain()
+        time.sleep(0.1)
         
-        if any(kw in device_name for kw in virtual_keywords) and info['maxOutputChannels'] > 0:
-            print(f"Found virtual cable: {info['name']} (Index: {i})")
-            p.terminate()
-            return info['name']
+        # Continuous speech-length stream from a bursty producer
+        underruns_before, xruns_before = router.underruns, router.xruns
+        block = np.full((chunk_size // 2, router.channels), 0.1, dtype=np.float32)
+        for _ in range(int(3.0 * router.sample_rate / len(block))):
+            router.send_audio(block.tobytes())
+            time.sleep(rng.uniform(0.0, 1.8) * len(block) / router.sample_rate)
+        router.drain()
+        time.sleep(0.1)
+        underruns, xruns = router.underruns - underruns_before, router.xruns - xruns_before
+        router.stop()
+        
+        stream = backend.streams[0]
+        samples = np.frombuffer(bytes(stream.buffer), dtype=np.float32)[0::router.channels]
+        onsets = np.flatnonzero(samples == 0.5)[:trials]
+        latencies = np.array([stream.play_time(int(i) * stream.frame_bytes) for i in onsets]) - sent[:len(onsets)]
+        
+        results[mode] = {
+            'latency_mean': float(np.mean(latencies)),
+            'latency_p95': float(np.percentile(latencies, 95)),
+            'jitter': float(np.std(latencies)),
+            'underruns': underruns,
+            'xruns': xruns,
+            'jitter_target_ms': router.jitter.target_ms,
+        }
+    
+    return results
+
+
+def benchmark_backpressure(mode: str = "callback", clip_seconds: float = 3.0) -> dict:
+    """Pushes a whole clip at once and measures peak buffer depth and how fast Stop takes effect."""
+    from audio_backend import RecordingBackend
+    
+    router = AudioRouter(backend=RecordingBackend(realtime=True), mode=mode)
+    router.start()
+    
+    depths = []
+    def monitor():
+        while router.is_running:
+            depths.append(router.buffered_duration)
+            time.sleep(0.01)
+    threading.Thread(target=monitor, daemon=True).start()
+    
+    stop_times = {}
+    def operator_stop():
+        time.sleep(clip_seconds / 3)
+        stop_times['clicked'] = time.perf_counter()
+        router.clear_queue()
+    threading.Thread(target=operator_stop, daemon=True).start()
+    
+    clip = np.full((int(router.sample_rate * clip_seconds), router.channels), 0.1, dtype=np.float32)
+    router.send_audio(clip.tobytes())
+    stop_times['producer'] = time.perf_counter()
+    
+    # Silence reaches the device once the buffer is empty
+    while router.buffered_frames:
+        time.sleep(0.001)
+    stop_times['silent'] = time.perf_counter()
+    router.stop()
+    
+    return {
+        'max_buffered': max(depths),
+        'producer_release': stop_times['producer'] - stop_times['clicked'],
+        'stop_latency': stop_times['silent'] - stop_times['clicked'],
+        'buffer_period': router.chunk_size / router.sample_rate,
+    }
+
+
+if __name__ == "__main__":
+    # Benchmark on the real-time null sink (no sound device needed)
+    print("Benchmarking callback vs blocking playback (about 20 s)...")
+    for mode, stats in benchmark_modes().items():
+        print(f"{mode:<9} latency mean {stats['latency_mean'] * 1000:6.1f} ms, "
+              f"p95 {stats['latency_p95'] * 1000:6.1f} ms, jitter {stats['jitter'] * 1000:5.1f} ms, "
+              f"underruns {stats['underruns']}, xruns {stats['xruns']} "
+              f"(jitter target now {stats['jitter_target_ms']:.0f} ms)")
     
-    p.terminate()
-    return None
\ No newline at end of file
+    for mode in ("callback", "blocking"):
+        stats = benchmark_backpressure(mode)
+        print(f"{mode:<9} max buffered {stats['max_buffered'] * 1000:5.0f} ms, producer released "
+              f"{stats['producer_release'] * 1000:4.1f} ms and buffer empty {stats['stop_latency'] * 1000:4.1f} ms "
+              f"after Stop (buffer period {stats['buffer_period'] * 1000:.1f} ms)")
@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+from gemini_tts import GeminiTTS
+from message_text import render_message
+from tts_cache import TTSCache
+from wav_codec import parse_wav
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def read_recipients(path: str, name_field: str = "full_name",
+                    case_field: str = "case_number") -> Iterator[Dict[str, str]]:
+    """Reads recipients from a CSV (with header) or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for line_number, row in enumerate(rows, start=1):
+            name = str(row.get(name_field) or "").strip()
+            case = str(row.get(case_field) or "").strip()
+            if not name or not case:
+                print(f"Skipping entry {line_number}: missing {name_field} or {case_field}")
+                continue
+            yield {"full_name": name, "case_number": case}
+
+
+def output_filename(full_name: str, case_number: str) -> str:
+    """Builds generate_message_audio's file name, made filesystem safe and unique per recipient.
+
+    Sanitizing can map different names or case numbers to the same string, so a
+    short hash of the raw values is appended to keep every recipient's file apart.
+    """
+    digest = hashlib.sha1(f"{full_name}\0{case_number}".encode("utf-8")).hexdigest()[:8]
+    name = f"message_{full_name.replace(' ', '_')}_{case_number}_{digest}.wav"
+    return re.sub(r"[^\w.\-]", "_", name)
+
+
+class AsyncRateLimiter:
+    """Token bucket limiting request starts to `rate` per second."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BatchGenerator:
+    """Pre-generates message audio for a recipient list with bounded concurrency and resume support."""
+
+    def __init__(self, tts: GeminiTTS, output_dir: Optional[str] = "batch_output",
+                 concurrency: int = 4, rate: float = 2.0, burst: int = 1):
+        self.tts = tts
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.limiter = AsyncRateLimiter(rate, burst)
+
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+
+    def _manifest_path(self) -> Optional[str]:
+        if self.output_dir is None:
+            return None
+        return os.path.join(self.output_dir, MANIFEST_NAME)
+
+    def _load_done(self) -> set:
+        """Returns the (name, case) pairs a previous run already finished."""
+        done = set()
+        path = self._manifest_path()
+        if path is None or not os.path.exists(path):
+            return done
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial line from an interrupted run
+                    continue
+                # Failed entries carry no file and are retried
+                if entry.get("file") and os.path.exists(os.path.join(self.output_dir, entry["file"])):
+                    done.add((entry["full_name"], entry["case_number"]))
+        return done
+
+    async def _generate_one(self, recipient: Dict[str, str], semaphore: asyncio.Semaphore, manifest):
+        async with semaphore:
+            await self.limiter.acquire()
+            text = render_message(recipient["full_name"], recipient["case_number"])
+            started = time.perf_counter()
+
+            # Any failure stays with this recipient; it must not cancel the rest of the batch
+            try:
+                audio_data = await self.tts.generate_speech_async(text)
+                audio_format, pcm = parse_wav(audio_data)
+
+                entry = {"full_name": recipient["full_name"], "case_number": recipient["case_number"]}
+                if self.output_dir is not None:
+                    filename = output_filename(recipient["full_name"], recipient["case_number"])
+                    await asyncio.to_thread(self._write_atomic, filename, audio_data)
+                    entry.update(file=filename, bytes=len(audio_data))
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed {recipient['full_name']} / {recipient['case_number']}: {e}")
+                self._record(manifest, {
+                    "full_name": recipient["full_name"],
+                    "case_number": recipient["case_number"],
+                    "error": f"{type(e).__name__}: {e}",
+                    "seconds": round(time.perf_counter() - started, 3),
+                })
+                return
+
+            self.audio_seconds += len(pcm) / audio_format.byte_rate
+            entry["seconds"] = round(time.perf_counter() - started, 3)
+            self._record(manifest, entry)
+            self.completed += 1
+
+    @staticmethod
+    def _record(manifest, entry: dict):
+        manifest.write(json.dumps(entry) + "\n")
+        manifest.flush()
+
+    def _write_atomic(self, filename: str, audio_data: bytes):
+        path = os.path.join(self.output_dir, filename)
+        temp_path = path + ".part"
+        with open(temp_path, "wb") as f:
+            f.write(audio_data)
+        os.replace(temp_path, path)
+
+    async def run(self, recipients: List[Dict[str, str]]) -> dict:
+        """Generates every recipient not already completed and returns a throughput report."""
+        done = set()
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            done = self._load_done()
+
+        pending = []
+        for recipient in recipients:
+            if (recipient["full_name"], recipient["case_number"]) in done:
+                self.skipped += 1
+            else:
+                pending.append(recipient)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+
+        manifest_path = self._manifest_path()
+        manifest = open(manifest_path, "a", encoding="utf-8") if manifest_path else open(os.devnull, "w")
+        try:
+            await asyncio.gather(*(self._generate_one(r, semaphore, manifest) for r in pending))
+        finally:
+            manifest.close()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "total": len(recipients),
+            "completed": self.completed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed": elapsed,
+            "messages_per_sec": self.completed / elapsed if elapsed > 0 else 0.0,
+            "audio_seconds": self.audio_seconds,
+            "realtime_factor": self.audio_seconds / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def self_check() -> int:
+    """Warms a scratch cache through the fake HTTP endpoint, then checks the GUI's lookups hit it."""
+    import tempfile
+    from google import genai
+    from fake_gemini import FakeGeminiClient, FakeGeminiServer
+
+    recipients = [{"full_name": "Jane Roe", "case_number": "582193"},
+                  {"full_name": "John Smith", "case_number": "ABC-12345"},
+                  {"full_name": "Ana Lopez", "case_number": "77-41-20-9"}]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with FakeGeminiServer(FakeGeminiClient(first_byte_latency=0.05, chunk_interval=0.0)) as server:
+            client = genai.Client(api_key="fake", http_options={"base_url": server.url})
+            tts = GeminiTTS(cache=TTSCache(cache_dir), client=client)
+            report = asyncio.run(BatchGenerator(tts, None, concurrency=2, rate=0).run(recipients))
+
+        # A fresh process-style lookup: new cache instance, no client needed on a hit
+        gui_tts = GeminiTTS(cache=TTSCache(cache_dir), client=FakeGeminiClient())
+        passed = report["completed"] == len(recipients)
+        for recipient in recipients:
+            # What the GUI renders from its name and case number fields
+            text = render_message(recipient["full_name"].lower(), recipient["case_number"])
+            hit = gui_tts.is_cached(text)
+            passed = passed and hit
+            print(f"{'PASS' if hit else 'FAIL'}  GUI lookup hits the cache for {recipient['full_name']}")
+
+        # Streaming mode (the GUI default) reads the same entry
+        first = next(gui_tts.generate_frames_stream(text), None)
+        stats = gui_tts.cache.stats()
+        streamed = first is not None and stats['hits'] == 1 and stats['misses'] == 0
+        passed = passed and streamed
+        print(f"{'PASS' if streamed else 'FAIL'}  GUI streaming path is served from the cache")
+
+        # Names that sanitize alike get separate files, and a bad response fails only its own entry
+        class GarbledTTS:
+            async def generate_speech_async(self, text):
+                audio_data = await gui_tts.generate_speech_async(text)
+                return b"not a wav" if "ANA LOPEZ" in text else audio_data
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            batch = [{"full_name": "Jane Roe", "case_number": "582193"},
+                     {"full_name": "Jane_Roe", "case_number": "582193"},
+                     recipients[2]]
+            isolated = asyncio.run(BatchGenerator(GarbledTTS(), output_dir, rate=0).run(batch))
+            with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f]
+            files = {entry["file"] for entry in entries if "file" in entry}
+            ok = (isolated["completed"] == 2 and isolated["failed"] == 1 and len(files) == 2
+                  and sum("error" in entry for entry in entries) == 1)
+            passed = passed and ok
+            print(f"{'PASS' if ok else 'FAIL'}  colliding names keep separate files; a failure is recorded, not fatal")
+
+    print(f"Self-check {'passed' if passed else 'FAILED'} ({report['completed']}/{len(recipients)} generated)")
+    return 0 if passed else 1
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Pre-generate message audio for a recipient list.")
+    parser.add_argument("recipients", nargs="?", help="CSV (with header) or JSONL recipient file")
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for generated WAV files")
+    parser.add_argument("--cache-only", action="store_true",
+                        help="Only populate the TTS cache; do not write WAV files")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=2.0, help="Maximum request starts per second (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=1, help="Requests allowed back-to-back before rate limiting")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use the offline fake Gemini client (for benchmarking and load tests)")
+    parser.add_argument("--name-field", default="full_name")
+    parser.add_argument("--case-field", default="case_number")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Run a small batch against the fake HTTP endpoint and verify GUI cache hits")
+    args = parser.parse_args(argv)
+
+    if args.self_check:
+        return self_check()
+    if args.recipients is None:
+        parser.error("the recipients file is required")
+
+    cache = TTSCache.from_env()
+    if args.cache_only and cache is None:
+        parser.error("--cache-only needs the TTS cache (unset TTS_CACHE_DISABLE)")
+
+    recipients = list(read_recipients(args.recipients, args.name_field, args.case_field))
+    if args.fake:
+        from fake_gemini import FakeGeminiClient
+        tts = GeminiTTS(cache=cache, client=FakeGeminiClient())
+    else:
+        tts = GeminiTTS(cache=cache)
+    generator = BatchGenerator(tts, None if args.cache_only else args.output_dir,
+                               args.concurrency, args.rate, args.burst)
+
+    print(f"Generating {len(recipients)} messages "
+          f"(concurrency {args.concurrency}, rate {args.rate}/s)...")
+    report = asyncio.run(generator.run(recipients))
+
+    print("\n=== Batch Report ===")
+    print(f"Completed: {report['completed']}  Skipped (resumed): {report['skipped']}  Failed: {report['failed']}")
+    print(f"Elapsed: {report['elapsed']:.1f} s  Throughput: {report['messages_per_sec']:.2f} messages/s")
+    print(f"Audio generated: {report['audio_seconds']:.1f} s ({report['realtime_factor']:.1f}x real time)")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from device_registry import DeviceInfo, DeviceRef, DeviceRegistry, get_registry, parse_device_arg
+from jitter_buffer import AdaptiveJitterBuffer
+from metrics import MetricsRegistry
+
+# Buffer sizes tried, smallest (lowest latency) first
+CALIBRATION_BUFFER_SIZES = (256, 512, 1024, 2048, 4096)
+
+# Buffer size for devices without a calibrated profile
+DEFAULT_CHUNK_SIZE = 2048
+
+# A callback busier than this share of its period (p99) has too little headroom to count as stable
+MAX_CALLBACK_LOAD = 0.5
+
+PROFILE_FILE_ENV = "AI_AUDIO_LATENCY_PROFILES"
+DEFAULT_PROFILE_FILE = "latency_profiles.json"
+
+
+class CalibrationResult(NamedTuple):
+    """How one buffer size played through the router."""
+    chunk_size: int
+    output_latency: float
+    underruns: int
+    xruns: int
+    callback_load: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def stable(self) -> bool:
+        return (self.error is None and self.underruns == 0 and self.xruns == 0
+                and (self.callback_load is None or self.callback_load < MAX_CALLBACK_LOAD))
+
+
+class LatencyProfile(NamedTuple):
+    """The buffer size chosen for one device and stream layout."""
+    device: str
+    host_api: str
+    sample_rate: int
+    channels: int
+    chunk_size: int
+    output_latency: float
+    stable: bool
+    calibrated_at: float
+
+
+def device_key(device: DeviceInfo, sample_rate: int, channels: int) -> str:
+    """Identifies a device by name rather than index, which changes when devices come and go."""
+    return f"{device.host_api}/{device.name}@{sample_rate}x{channels}"
+
+
+class ProfileStore:
+    """Latency profiles per device, persisted as one JSON file."""
+
+    def __init__(self, path: str = DEFAULT_PROFILE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ProfileStore':
+        """Uses the file named by AI_AUDIO_LATENCY_PROFILES, else latency_profiles.json."""
+        return cls(os.environ.get(PROFILE_FILE_ENV, DEFAULT_PROFILE_FILE))
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read latency profiles from {self.path}: {e}")
+            return {}
+
+    def get(self, device: DeviceInfo, sample_rate: int, channels: int) -> Optional[LatencyProfile]:
+        """The saved profile for device in this layout, or None if it was never calibrated."""
+        with self._lock:
+            entry = self._load().get(device_key(device, sample_rate, channels))
+        if entry is None:
+            return None
+        try:
+            return LatencyProfile(**entry['profile'])
+        except (KeyError, TypeError):
+            return None
+
+    def put(self, device: DeviceInfo, profile: LatencyProfile,
+            results: Sequence[CalibrationResult] = ()):
+        """Saves profile (and the measurements behind it) with an atomic write."""
+        with self._lock:
+            profiles = self._load()
+            profiles[device_key(device, profile.sample_rate, profile.channels)] = {
+                'profile': profile._asdict(),
+                'measurements': [r._asdict() for r in results],
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(profiles, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+
+
+def resolve_output(registry: DeviceRegistry, device: DeviceRef = None) -> Optional[DeviceInfo]:
+    """The requested device, else the virtual cable, else the default output device."""
+    return registry.output_device(device) or registry.default_output()
+
+
+def load_profile(device: Optional[DeviceInfo], sample_rate: int, channels: int,
+                 store: Optional[ProfileStore] = None) -> Optional[LatencyProfile]:
+    """The calibrated profile for device, if one was saved."""
+    if device is None:
+        return None
+    return (store or ProfileStore.from_env()).get(device, sample_rate, channels)
+
+
+def buffer_size_for(device: Optional[DeviceInfo], sample_rate: int = 48000, channels: int = 2,
+                    default: int = DEFAULT_CHUNK_SIZE) -> int:
+    """The calibrated buffer size for device, else default."""
+    profile = load_profile(device, sample_rate, channels)
+    return profile.chunk_size if profile else default
+
+
+def calibration_signal(seconds: float, sample_rate: int = 48000, channels: int = 2) -> np.ndarray:
+    """Half-second beeps rising in pitch, one per second, at -10 dBFS."""
+    frames = int(seconds * sample_rate)
+    t = np.arange(frames) / sample_rate
+    gate = (t % 1.0) < 0.5
+    tone = np.sin(2 * np.pi * (440 + 100 * np.floor(t)) * t) * 0.3 * gate
+    return np.repeat(tone.astype(np.float32)[:, None], channels, axis=1)
+
+
+def measure(device: Optional[DeviceInfo], chunk_size: int, signal: np.ndarray,
+            sample_rate: int = 48000, mode: str = "callback",
+            registry: Optional[DeviceRegistry] = None) -> CalibrationResult:
+    """Plays signal through an AudioRouter with this buffer size and counts what went wrong."""
+    from audio_router import AudioRouter
+
+    channels = signal.shape[1]
+    metrics = MetricsRegistry()
+    router = AudioRouter(device.index if device else None, sample_rate, channels,
+                         chunk_size=chunk_size, mode=mode, registry=registry, metrics=metrics,
+                         # No jitter target: every gap counts
+                         jitter_buffer=AdaptiveJitterBuffer(sample_rate, chunk_size, max_ms=0.0))
+    try:
+        router.start()
+        # Feed 20 ms blocks as fast as the buffer takes them, like the TTS path
+        block = sample_rate // 50
+        for start in range(0, len(signal), block):
+            router.send_frames(signal[start:start + block])
+        router.drain(timeout=len(signal) / sample_rate + 1.0)
+        latency = router.get_latency()
+    except Exception as e:
+        return CalibrationResult(chunk_size, 0.0, router.underruns, router.xruns, error=str(e))
+    finally:
+        router.stop()
+
+    load = None
+    if mode == "callback":
+        p99 = metrics.histogram("router_callback_seconds").percentile(99)
+        load = p99 / (chunk_size / sample_rate) if p99 is not None else None
+    return CalibrationResult(chunk_size, latency, router.underruns, router.xruns, load)
+
+
+def calibrate(device: DeviceRef = None, buffer_sizes: Sequence[int] = CALIBRATION_BUFFER_SIZES,
+              seconds: float = 2.0, sample_rate: int = 48000, channels: int = 2,
+              signal: Optional[np.ndarray] = None, mode: str = "callback",
+              registry: Optional[DeviceRegistry] = None,
+              store: Optional[ProfileStore] = None, save: bool = True) -> LatencyProfile:
+    """Measures every buffer size on the device and saves the smallest stable one as its profile.
+
+    If none is stable, the largest size tried is saved, marked unstable.
+    """
+    registry = registry or get_registry()
+    info = resolve_output(registry, device)
+    if signal is None:
+        signal = calibration_signal(seconds, sample_rate, channels)
+    channels = signal.shape[1]
+
+    print(f"Calibrating {info.name if info else 'default output'} "
+          f"({len(signal) / sample_rate:.1f} s per buffer size)...")
+    results: List[CalibrationResult] = []
+    for chunk_size in sorted(buffer_sizes):
+        result = measure(info, chunk_size, signal, sample_rate, mode, registry)
+        results.append(result)
+        print(f"  {format_result(result, sample_rate)}")
+        time.sleep(0.2)
+
+    stable = [r for r in results if r.stable]
+    chosen = stable[0] if stable else max(results, key=lambda r: r.chunk_size)
+    profile = LatencyProfile(
+        device=info.name if info else "",
+        host_api=info.host_api if info else "",
+        sample_rate=sample_rate,
+        channels=channels,
+        chunk_size=chosen.chunk_size,
+        output_latency=chosen.output_latency,
+        stable=chosen.stable,
+        calibrated_at=time.time(),
+    )
+
+    if save and info is not None:
+        store = store or ProfileStore.from_env()
+        store.put(info, profile, results)
+        print(f"Saved latency profile to {store.path}")
+    return profile
+
+
+def format_result(result: CalibrationResult, sample_rate: int = 48000) -> str:
+    """One table row: buffer size, latencies, problems and verdict."""
+    period = result.chunk_size / sample_rate * 1000
+    if result.error is not None:
+        return f"{result.chunk_size:5d} frames ({period:5.1f} ms): failed: {result.error}"
+    load = f", callback load {result.callback_load:4.0%}" if result.callback_load is not None else ""
+    return (f"{result.chunk_size:5d} frames ({period:5.1f} ms): output latency "
+            f"{result.output_latency * 1000:6.1f} ms, {result.underruns} underruns, "
+            f"{result.xruns} xruns{load} -> {'stable' if result.stable else 'unstable'}")
+
+
+if __name__ == "__main__":
+    # Calibrate the virtual cable (or the device named/indexed by the first argument)
+    profile = calibrate(parse_device_arg(sys.argv[1] if len(sys.argv) > 1 else None))
+    verdict = "" if profile.stable else " (no size was stable; using the largest)"
+    print(f"Chosen buffer size: {profile.chunk_size} frames, "
+          f"{profile.output_latency * 1000:.1f} ms output latency{verdict}")
\ No newline at end of file
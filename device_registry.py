@@ -0,0 +1,306 @@
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+from audio_backend import AudioBackend, create_backend
+
+# Keywords identifying virtual audio cable devices, in no particular priority
+VIRTUAL_CABLE_KEYWORDS = ['cable input', 'cable output', 'vb-audio', 'blackhole', 'virtual']
+
+DeviceRef = Union[int, str, None]
+
+
+class DeviceInfo(NamedTuple):
+    """One audio device as enumerated by the backend."""
+    index: int
+    name: str
+    host_api: str
+    max_input_channels: int
+    max_output_channels: int
+    default_sample_rate: float
+    default_low_output_latency: float = 0.0
+    default_high_output_latency: float = 0.0
+
+    @property
+    def is_input(self) -> bool:
+        return self.max_input_channels > 0
+
+    @property
+    def is_output(self) -> bool:
+        return self.max_output_channels > 0
+
+    @property
+    def is_virtual_cable(self) -> bool:
+        name = self.name.lower()
+        return any(kw in name for kw in VIRTUAL_CABLE_KEYWORDS)
+
+
+class DeviceRegistry:
+    """Cached device enumeration over a single backend (one PortAudio context per process).
+
+    Devices are enumerated once and indexed by lowercased name and by
+    virtual-cable keyword, so lookups are dictionary hits; partial names are
+    resolved once and memoized. refresh() re-enumerates on demand and tells
+    listeners when the device list changed. PortAudio only sees hot-plugged
+    devices after re-initialization, which refresh(reinitialize=True) does;
+    streams opened before that must be closed first.
+    """
+
+    def __init__(self, backend: Optional[AudioBackend] = None):
+        self._backend = backend
+        self._owns_backend = backend is None
+
+        self._lock = threading.RLock()
+        self._devices: List[DeviceInfo] = []
+        self._by_name: Dict[str, DeviceInfo] = {}
+        self._by_keyword: Dict[str, List[DeviceInfo]] = {}
+        self._virtual_cable: Optional[DeviceInfo] = None
+        self._lookups: Dict[str, Optional[DeviceInfo]] = {}
+        self._loaded = False
+
+        self._listeners: List[Callable[['DeviceRegistry'], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watching = False
+
+        self.refreshes = 0
+        self.lookups = 0
+
+    @property
+    def backend(self) -> AudioBackend:
+        """The shared backend, created on first use (AUDIO_BACKEND picks pyaudio/null/memory/file)."""
+        with self._lock:
+            if self._backend is None:
+                self._backend = create_backend()
+            return self._backend
+
+    def _enumerate(self) -> List[DeviceInfo]:
+        backend = self.backend
+        host_apis: Dict[int, str] = {}
+        devices = []
+        for i in range(backend.get_device_count()):
+            info = backend.get_device_info_by_index(i)
+            host_index = info.get('hostApi', 0)
+            if host_index not in host_apis:
+                try:
+                    host_apis[host_index] = backend.get_host_api_info_by_index(host_index)['name']
+                except (AttributeError, OSError, IOError):
+                    host_apis[host_index] = backend.name
+            devices.append(DeviceInfo(
+                index=i,
+                name=info['name'],
+                host_api=host_apis[host_index],
+                max_input_channels=info.get('maxInputChannels', 0),
+                max_output_channels=info.get('maxOutputChannels', 0),
+                default_sample_rate=float(info.get('defaultSampleRate', 0.0)),
+                default_low_output_latency=info.get('defaultLowOutputLatency', 0.0),
+                default_high_output_latency=info.get('defaultHighOutputLatency', 0.0),
+            ))
+        return devices
+
+    def refresh(self, reinitialize: bool = False) -> bool:
+        """Re-enumerates devices; returns True if the list changed (listeners are notified)."""
+        with self._lock:
+            if reinitialize and self._owns_backend and self._backend is not None:
+                self._backend.terminate()
+                self._backend = create_backend()
+
+            devices = self._enumerate()
+            changed = self._loaded and devices != self._devices
+
+            self._devices = devices
+            self._by_name = {}
+            self._by_keyword = {kw: [] for kw in VIRTUAL_CABLE_KEYWORDS}
+            for device in devices:
+                # First device wins for duplicate names, as a linear scan would
+                self._by_name.setdefault(device.name.lower(), device)
+                for kw in VIRTUAL_CABLE_KEYWORDS:
+                    if kw in device.name.lower():
+                        self._by_keyword[kw].append(device)
+            self._virtual_cable = next((d for d in devices if d.is_output and d.is_virtual_cable), None)
+            self._lookups = {}
+            self._loaded = True
+            self.refreshes += 1
+            listeners = list(self._listeners) if changed else []
+
+        for listener in listeners:
+            listener(self)
+        return changed
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.refresh()
+
+    def devices(self, output_only: bool = False) -> List[DeviceInfo]:
+        """All devices (or only output-capable ones) in backend index order."""
+        self._ensure_loaded()
+        with self._lock:
+            return [d for d in self._devices if d.is_output or not output_only]
+
+    def output_names(self) -> List[str]:
+        """Names of all output-capable devices."""
+        return [d.name for d in self.devices(output_only=True)]
+
+    def get(self, index: int) -> Optional[DeviceInfo]:
+        """The device at a backend index, or None if there is no such device."""
+        self._ensure_loaded()
+        with self._lock:
+            if 0 <= index < len(self._devices):
+                return self._devices[index]
+        return None
+
+    def find(self, name: str, output_only: bool = True) -> Optional[DeviceInfo]:
+        """Finds a device by exact (case-insensitive) name, else by the first partial match."""
+        self._ensure_loaded()
+        key = f"{name.lower()}|{output_only}"
+        with self._lock:
+            self.lookups += 1
+            if key in self._lookups:
+                return self._lookups[key]
+
+            device = self._by_name.get(name.lower())
+            if device is None or (output_only and not device.is_output):
+                device = next((d for d in self._devices
+                               if name.lower() in d.name.lower() and (d.is_output or not output_only)),
+                              None)
+            self._lookups[key] = device
+            return device
+
+    def find_keyword(self, keyword: str) -> List[DeviceInfo]:
+        """Devices whose names contain one of VIRTUAL_CABLE_KEYWORDS (or any other keyword, by scan)."""
+        self._ensure_loaded()
+        with self._lock:
+            if keyword.lower() in self._by_keyword:
+                return list(self._by_keyword[keyword.lower()])
+        return [d for d in self.devices() if keyword.lower() in d.name.lower()]
+
+    def virtual_cable(self) -> Optional[DeviceInfo]:
+        """The first output device that looks like a virtual audio cable."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._virtual_cable
+
+    def default_output(self) -> Optional[DeviceInfo]:
+        """The backend's default output device, if it has one."""
+        try:
+            index = self.backend.get_default_output_device_info()['index']
+        except (IOError, OSError, KeyError):
+            return None
+        return self.get(index)
+
+    def resolve(self, device: DeviceRef) -> Optional[DeviceInfo]:
+        """Resolves an index or (partial) name to an output device; None means the default device."""
+        if device is None:
+            return None
+        if isinstance(device, int):
+            info = self.get(device)
+        else:
+            info = self.find(device)
+        if info is None:
+            print(f"Warning: Device '{device}' not found. Using default.")
+        return info
+
+    def output_device(self, device: DeviceRef = None) -> Optional[DeviceInfo]:
+        """The requested device, or the virtual cable when none is requested."""
+        if device is None:
+            return self.virtual_cable()
+        return self.resolve(device)
+
+    def add_listener(self, listener: Callable[['DeviceRegistry'], None]):
+        """Calls listener(registry) whenever a refresh finds a different device list."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[['DeviceRegistry'], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def watch(self, interval: float = 2.0, reinitialize: bool = False):
+        """Polls for device changes on a daemon thread until stop_watching()."""
+        if self._watching:
+            return
+        self._watching = True
+
+        def poll():
+            while self._watching:
+                time.sleep(interval)
+                if self._watching:
+                    try:
+                        self.refresh(reinitialize=reinitialize)
+                    except Exception as e:
+                        print(f"Device refresh failed: {e}")
+
+        self._watcher = threading.Thread(target=poll, daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._watching = False
+
+    def stats(self) -> dict:
+        """Returns enumeration and lookup counters."""
+        with self._lock:
+            return {
+                'devices': len(self._devices),
+                'refreshes': self.refreshes,
+                'lookups': self.lookups,
+                'cached_lookups': len(self._lookups),
+            }
+
+    def close(self):
+        """Stops watching and terminates the backend if the registry created it."""
+        self.stop_watching()
+        with self._lock:
+            if self._owns_backend and self._backend is not None:
+                self._backend.terminate()
+                self._backend = None
+            self._loaded = False
+
+
+def parse_device_arg(value: Optional[str]) -> DeviceRef:
+    """Turns a command-line device argument into an index (all digits) or a name."""
+    if not value:
+        return None
+    return int(value) if value.isdigit() else value
+
+
+_registry: Optional[DeviceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DeviceRegistry:
+    """Returns the process-wide registry, creating it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry()
+        return _registry
+
+
+if __name__ == "__main__":
+    # Startup cost: one enumeration shared by every lookup vs a backend session per lookup
+    lookups = 200
+    started = time.perf_counter()
+    for _ in range(lookups):
+        backend = create_backend()
+        for i in range(backend.get_device_count()):
+            info = backend.get_device_info_by_index(i)
+            if 'virtual' in info['name'].lower():
+                break
+        backend.terminate()
+    per_session = (time.perf_counter() - started) / lookups
+
+    registry = get_registry()
+    started = time.perf_counter()
+    registry.refresh()
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(lookups):
+        registry.virtual_cable()
+        registry.find("virtual")
+    cached = (time.perf_counter() - started) / (2 * lookups)
+
+    print(f"Backend: {registry.backend.name}, {registry.stats()['devices']} device(s)")
+    for device in registry.devices():
+        marker = "  <- virtual cable" if device == registry.virtual_cable() else ""
+        print(f"  {device.index}: {device.name} [{device.host_api}]{marker}")
+    print(f"Backend session per lookup: {per_session * 1e6:9.1f} us")
+    print(f"Registry first enumeration: {first * 1e6:9.1f} us, then {cached * 1e6:.2f} us per lookup")
\ No newline at end of file
@@ -1,7 +1,10 @@
-import pyaudio
-import wave
 import numpy as np
 import time
+from pcm_format import decode_pcm
+from wav_codec import WavReader
+from audio_backend import paInt16
+from calibration import calibrate
+from device_registry import get_registry
 
 def diagnose_teams_audio(wav_file="download.wav"):
     """Diagnose why audio cuts off in MS Teams"""
@@ -10,20 +13,19 @@ def diagnose_teams_audio(wav_file="download.wav"):
     
     # Step 1: Check file
     try:
-        wf = wave.open(wav_file, 'rb')
-        duration = wf.getnframes() / wf.getframerate()
+        wf = WavReader(wav_file)
+        fmt = wf.format
         print(f"Audio file: {wav_file}")
-        print(f"Duration: {duration:.2f} seconds")
-        print(f"Format: {wf.getframerate()}Hz, {wf.getnchannels()} channels, {wf.getsampwidth()*8}-bit")
+        print(f"Duration: {wf.duration:.2f} seconds")
+        print(f"Format: {fmt.sample_rate}Hz, {fmt.channels} channels, {fmt.sample_width*8}-bit")
         
         # Read first second of audio
-        first_second_frames = int(wf.getframerate() * 1.0)
-        first_second_data = wf.readframes(first_second_frames)
-        wf.close()
+        first_second_data = wf.view(0, fmt.sample_rate)
         
         # Check if audio starts with silence
-        audio_array = np.frombuffer(first_second_data, dtype=np.int16)
-        max_amplitude = np.max(np.abs(audio_array))
+        audio_array = decode_pcm(first_second_data, fmt.sample_width, fmt.channels, fmt.audio_format)
+        wf.close()
+        max_amplitude = int(np.max(np.abs(audio_array)) * 32767)
         print(f"First second max amplitude: {max_amplitude} (out of 32767)")
         
     except Exception as e:
@@ -32,22 +34,19 @@ def diagnose_teams_audio(wav_file="download.wav"):
     
     print("\n=== Testing different playback methods ===\n")
     
-    p = pyaudio.PyAudio()
+    # Shared device registry (AUDIO_BACKEND=null/memory/file for headless runs)
+    registry = get_registry()
+    p = registry.backend
     
-    # Find the CABLE Input device
-    cable_device = None
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
-        if info['name'] == "CABLE Input (VB-Audio Virtual Cable)" and info['defaultSampleRate'] == 48000:
-            cable_device = i
-            break
+    # Find the CABLE Input device (any virtual cable if VB-Cable is not installed)
+    cable = registry.find("CABLE Input (VB-Audio Virtual Cable)") or registry.virtual_cable()
     
-    if cable_device is None:
+    if cable is None or cable.default_sample_rate != 48000:
         print("ERROR: Could not find CABLE Input device at 48kHz")
-        p.terminate()
         return
     
-    print(f"Using device {cable_device}: CABLE Input (VB-Audio Virtual Cable)\n")
+    cable_device = cable.index
+    print(f"Using device {cable_device}: {cable.name}\n")
     
     # Test 1: Simple beep test
     print("Test 1: Playing 1-second beep...")
@@ -64,7 +63,7 @@ def diagnose_teams_audio(wav_file="download.wav"):
     
     try:
         stream = p.open(
-            format=pyaudio.paInt16,
+            format=paInt16,
             channels=2,
             rate=sample_rate,
             output=True,
@@ -93,12 +92,12 @@ def diagnose_teams_audio(wav_file="download.wav"):
     
     time.sleep(2)
     
-    # Test 2: Play with different buffer configurations
-    print("Test 2: Testing different buffer sizes...")
+    # Test 2: Play the pattern at each buffer size and keep the smallest stable one
+    print("Test 2: Calibrating buffer sizes...")
     
     # Generate a spoken test pattern
     test_duration = 5.0
-    t = np.linspace(0, test_duration, int(sample_rate * test_duration))
+    t = np.arange(int(sample_rate * test_duration)) / sample_rate
     
     # Create a pattern: beep-silence-beep-silence...
     test_pattern = np.zeros_like(t)
@@ -108,56 +107,20 @@ def diagnose_teams_audio(wav_file="download.wav"):
         if end < len(test_pattern):
             test_pattern[start:end] = np.sin(2 * np.pi * (440 + i * 100) * t[start:end]) * 0.3
     
-    test_audio = (test_pattern * 32767).astype(np.int16)
     # Make stereo
-    stereo_test = np.zeros(len(test_audio) * 2, dtype=np.int16)
-    stereo_test[0::2] = test_audio
-    stereo_test[1::2] = test_audio
-    
-    for buffer_size in [512, 1024, 2048, 4096]:
-        print(f"\nTesting buffer size: {buffer_size}")
-        
-        try:
-            stream = p.open(
-                format=pyaudio.paInt16,
-                channels=2,
-                rate=sample_rate,
-                output=True,
-                output_device_index=cable_device,
-                frames_per_buffer=buffer_size
-            )
-            
-            # Pre-fill with silence
-            silence = np.zeros(buffer_size * 2, dtype=np.int16)
-            for _ in range(10):
-                stream.write(silence.tobytes())
-            
-            # Play test pattern
-            chunk_size = buffer_size * 2
-            for i in range(0, len(stereo_test), chunk_size):
-                chunk = stereo_test[i:i+chunk_size]
-                if len(chunk) < chunk_size:
-                    chunk = np.pad(chunk, (0, chunk_size - len(chunk)), mode='constant')
-                stream.write(chunk.tobytes())
-            
-            # Post-fill with silence
-            for _ in range(10):
-                stream.write(silence.tobytes())
-            
-            stream.stop_stream()
-            stream.close()
-            print(f"Buffer size {buffer_size} - completed")
-            
-        except Exception as e:
-            print(f"Buffer size {buffer_size} - failed: {e}")
-        
-        time.sleep(1)
+    stereo_test = np.repeat(test_pattern.astype(np.float32)[:, None], 2, axis=1)
     
-    p.terminate()
+    profile = calibrate(cable_device, buffer_sizes=[512, 1024, 2048, 4096],
+                        sample_rate=sample_rate, signal=stereo_test, registry=registry)
+    if profile.stable:
+        print(f"Smallest stable buffer: {profile.chunk_size} frames "
+              f"({profile.output_latency * 1000:.1f} ms output latency); AudioRouter will use it\n")
+    else:
+        print(f"No buffer size played cleanly; AudioRouter will use {profile.chunk_size} frames\n")
     
     print("\n=== Diagnostic Summary ===")
     print("1. If you heard the initial beep, VB-Cable connection is working")
-    print("2. If you heard all 5 beeps in the pattern, audio streaming is stable")
+    print("2. If you heard all 5 beeps at every buffer size, audio streaming is stable")
     print("3. If audio cuts off, it may be due to:")
     print("   - MS Teams audio processing/gating")
     print("   - VB-Cable buffer underruns")
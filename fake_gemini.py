@@ -0,0 +1,351 @@
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+import zlib
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Iterator, List, Optional, Tuple
+
+# Gemini TTS returns 16-bit mono PCM at 24 kHz without a container
+FAKE_SAMPLE_RATE = 24000
+FAKE_MIME_TYPE = f"audio/L16;codec=pcm;rate={FAKE_SAMPLE_RATE}"
+
+INJECTED_ERROR = "503 UNAVAILABLE: injected fake Gemini failure"
+
+
+class FakeGeminiError(Exception):
+    """Injected upstream failure (shaped like a 503 from the API)."""
+
+    code = 503
+    status = "UNAVAILABLE"
+
+
+def _extract_text(contents) -> str:
+    """Pulls the prompt text out of a string, Content objects or REST-style dicts."""
+    if isinstance(contents, str):
+        return contents
+
+    texts = []
+    for content in contents if isinstance(contents, (list, tuple)) else [contents]:
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        parts = content.get("parts", []) if isinstance(content, dict) else (content.parts or [])
+        for part in parts:
+            text = part.get("text") if isinstance(part, dict) else getattr(part, "text", None)
+            if text:
+                texts.append(text)
+    return " ".join(texts)
+
+
+def _response(pcm: bytes):
+    """Wraps PCM in the candidates -> content.parts -> inline_data shape GeminiTTS reads."""
+    inline_data = SimpleNamespace(data=pcm, mime_type=FAKE_MIME_TYPE)
+    part = SimpleNamespace(inline_data=inline_data, text=None)
+    content = SimpleNamespace(role="model", parts=[part])
+    return SimpleNamespace(candidates=[SimpleNamespace(content=content, finish_reason="STOP")])
+
+
+class FakeGeminiClient:
+    """Offline stand-in for genai.Client covering the TTS calls GeminiTTS makes.
+
+    Audio is a deterministic speech-like tone whose length follows the text.
+    Timing is first_byte_latency before the first chunk, then chunk_interval
+    between chunks, each wait stretched by up to `jitter` seconds; a `tail_rate`
+    fraction of requests stall an extra `tail_latency` before the first chunk.
+    Requests fail with FakeGeminiError at `error_rate`, or for the next N calls
+    after fail_next(N).
+    """
+
+    def __init__(self, first_byte_latency: float = 0.3,
+                 chunk_interval: float = 0.05,
+                 chunk_seconds: float = 0.25,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 tail_rate: float = 0.0,
+                 tail_latency: float = 2.0,
+                 seconds_per_char: float = 0.06,
+                 seed: Optional[int] = None):
+        self.first_byte_latency = first_byte_latency
+        self.chunk_interval = chunk_interval
+        self.chunk_seconds = chunk_seconds
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.seconds_per_char = seconds_per_char
+
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.peak_active = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fail_next = 0
+
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def fail_next(self, count: int = 1):
+        """Makes the next `count` requests fail regardless of error_rate."""
+        with self._lock:
+            self._fail_next += count
+
+    def render_pcm(self, text: str) -> bytes:
+        """Renders the deterministic 16-bit PCM the fake returns for text."""
+        seconds = max(0.5, len(text) * self.seconds_per_char)
+        t = np.arange(int(FAKE_SAMPLE_RATE * seconds)) / FAKE_SAMPLE_RATE
+
+        # Pitch from the text so different prompts produce different audio
+        pitch = 140.0 + zlib.crc32(text.encode("utf-8")) % 120
+        syllables = 0.55 + 0.45 * np.sin(2 * np.pi * 4.0 * t)
+        signal = syllables * (np.sin(2 * np.pi * pitch * t) + 0.3 * np.sin(2 * np.pi * 2 * pitch * t))
+        return (signal * 7000).astype("<i2").tobytes()
+
+    def _plan(self, contents) -> Tuple[List[bytes], List[float], bool]:
+        """Starts a request: returns its chunks, the wait before each and whether it should fail."""
+        text = _extract_text(contents)
+        pcm = self.render_pcm(text)
+        chunk_bytes = int(FAKE_SAMPLE_RATE * self.chunk_seconds) * 2
+        chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+        with self._lock:
+            self.requests += 1
+            fail = self._fail_next > 0 or self._random.random() < self.error_rate
+            if fail:
+                self._fail_next = max(0, self._fail_next - 1)
+                self.errors += 1
+            waits = [self.first_byte_latency + self._random.uniform(0, self.jitter)]
+            if self._random.random() < self.tail_rate:
+                waits[0] += self.tail_latency
+            waits += [self.chunk_interval + self._random.uniform(0, self.jitter)
+                      for _ in chunks[1:]]
+
+        return chunks, waits, fail
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def stream_chunks(self, contents) -> Iterator[bytes]:
+        """Yields PCM chunks at the configured cadence."""
+        self._enter()
+        try:
+            chunks, waits, fail = self._plan(contents)
+            if fail:
+                # Failures still cost a round trip
+                time.sleep(min(waits[0], 0.05))
+                raise FakeGeminiError(INJECTED_ERROR)
+            for chunk, wait in zip(chunks, waits):
+                time.sleep(wait)
+                yield chunk
+        finally:
+            self._exit()
+
+    def stats(self) -> dict:
+        """Returns request, error and concurrency counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'peak_active': self.peak_active,
+            }
+
+
+class _FakeModels:
+    """client.models: blocking generate_content and generate_content_stream."""
+
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents, config=None):
+        return _response(b"".join(self._client.stream_chunks(contents)))
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        for chunk in self._client.stream_chunks(contents):
+            yield _response(chunk)
+
+
+class _FakeAsyncModels:
+    """client.aio.models: asyncio variants that sleep without blocking the loop."""
+
+    def __init__(self, client: FakeGeminiClient):
+        self._client = client
+
+    async def _chunks(self, contents):
+        self._client._enter()
+        try:
+            chunks, waits, fail = self._client._plan(contents)
+            if fail:
+                await asyncio.sleep(min(waits[0], 0.05))
+                raise FakeGeminiError(INJECTED_ERROR)
+            for chunk, wait in zip(chunks, waits):
+                await asyncio.sleep(wait)
+                yield chunk
+        finally:
+            self._client._exit()
+
+    async def generate_content(self, model: str, contents, config=None):
+        return _response(b"".join([chunk async for chunk in self._chunks(contents)]))
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        async def responses():
+            async for chunk in self._chunks(contents):
+                yield _response(chunk)
+        return responses()
+
+
+class FakeGeminiServer:
+    """Local HTTP endpoint speaking the Gemini REST generateContent / streamGenerateContent shapes.
+
+    Point a real client at it with
+    genai.Client(api_key="fake", http_options={"base_url": server.url}).
+    """
+
+    def __init__(self, client: Optional[FakeGeminiClient] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.client = client or FakeGeminiClient()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeGeminiServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        fake = self.client
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: dict):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                path = self.path.split("?", 1)[0]
+                streaming = path.endswith(":streamGenerateContent")
+                if not streaming and not path.endswith(":generateContent"):
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found",
+                                                    "status": "NOT_FOUND"}})
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                chunks = fake.stream_chunks(request.get("contents", []))
+
+                try:
+                    if not streaming:
+                        self._send_json(200, self._rest_response(b"".join(chunks)))
+                        return
+
+                    # Pull the first chunk before committing to a 200 so errors surface as HTTP errors
+                    first = next(chunks, None)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    self.close_connection = True
+                    if first is not None:
+                        self._send_event(first)
+                        for chunk in chunks:
+                            self._send_event(chunk)
+                except FakeGeminiError as e:
+                    self._send_json(e.code, {"error": {"code": e.code, "message": str(e),
+                                                       "status": e.status}})
+
+            def _send_event(self, pcm: bytes):
+                event = json.dumps(self._rest_response(pcm))
+                self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+
+            @staticmethod
+            def _rest_response(pcm: bytes) -> dict:
+                return {"candidates": [{
+                    "content": {"role": "model", "parts": [{"inlineData": {
+                        "mimeType": FAKE_MIME_TYPE,
+                        "data": base64.b64encode(pcm).decode("ascii"),
+                    }}]},
+                    "finishReason": "STOP",
+                }]}
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # Self-check: GeminiTTS against the in-process fake, then a real SDK client against the HTTP fake
+    from gemini_tts import GeminiTTS
+    from request_policy import RequestPolicy
+
+    text = "This is an offline fake Gemini benchmark message."
+    fake = FakeGeminiClient(first_byte_latency=0.2, chunk_interval=0.02, jitter=0.02, seed=1)
+    tts = GeminiTTS(client=fake)
+
+    started = time.perf_counter()
+    audio = tts.generate_speech(text)
+    print(f"In-process generate_speech: {len(audio)} bytes in {time.perf_counter() - started:.2f} s")
+
+    started = time.perf_counter()
+    first = None
+    for _ in tts.generate_frames_stream(text):
+        if first is None:
+            first = time.perf_counter() - started
+    print(f"In-process stream: first chunk after {first * 1000:.0f} ms")
+
+    # A single attempt, so the injected 503 is not retried away by the default policy
+    fake.fail_next()
+    try:
+        GeminiTTS(client=fake, policy=RequestPolicy(max_attempts=1)).generate_speech(text)
+        print("Error injection: FAIL (no error raised)")
+    except FakeGeminiError:
+        print("Error injection: raised FakeGeminiError as configured")
+
+    try:
+        from google import genai
+    except ImportError:
+        print("google-genai not installed; skipping HTTP check")
+    else:
+        with FakeGeminiServer(FakeGeminiClient(first_byte_latency=0.2, chunk_interval=0.02)) as server:
+            http_tts = GeminiTTS(client=genai.Client(api_key="fake",
+                                                     http_options={"base_url": server.url}))
+            started = time.perf_counter()
+            audio = http_tts.generate_speech(text)
+            print(f"HTTP generate_speech: {len(audio)} bytes in {time.perf_counter() - started:.2f} s")
+            chunks = sum(1 for _ in http_tts.generate_speech_stream(text))
+            print(f"HTTP stream: {chunks} chunks from {server.url}")
+
+    print(f"Fake stats: {fake.stats()}")
\ No newline at end of file
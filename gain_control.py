@@ -0,0 +1,174 @@
+import math
+import numpy as np
+from typing import Optional
+
+
+def db_to_gain(db: float) -> float:
+    """Converts decibels to a linear amplitude factor."""
+    return 10.0 ** (db / 20.0)
+
+
+class LoudnessController:
+    """Causal block-based gain stage: running-RMS AGC followed by a short-lookahead peak limiter.
+
+    Output lags input by `latency_frames`; flush() drains the delay line at
+    the end of a stream, so a stream's output is exactly as long as its input.
+    """
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 2,
+                 target_rms_db: float = -18.0,
+                 max_gain_db: float = 18.0,
+                 min_gain_db: float = -12.0,
+                 agc_time: float = 0.5,
+                 gate_db: float = -50.0,
+                 ceiling_db: float = -1.0,
+                 lookahead_ms: float = 5.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.target_rms = db_to_gain(target_rms_db)
+        self.max_gain = db_to_gain(max_gain_db)
+        self.min_gain = db_to_gain(min_gain_db)
+        self.agc_time = agc_time
+        self.gate = db_to_gain(gate_db)
+        self.ceiling = db_to_gain(ceiling_db)
+
+        # The limiter gain is a min-filter followed by a moving average, each
+        # `half_window` wide on both sides, so it needs 2 * half_window of lookahead
+        self.half_window = max(1, int(sample_rate * lookahead_ms / 2000.0))
+        self.latency_frames = 2 * self.half_window
+
+        self.reset()
+
+    def reset(self):
+        """Clears all carried state (AGC level, limiter delay line)."""
+        self._mean_square: Optional[float] = None
+        self._agc_gain = 1.0
+        self._reset_delay_line()
+
+    def _reset_delay_line(self):
+        self._pending = np.zeros((self.latency_frames, self.channels), dtype=np.float32)
+        self._limit_history = np.ones(2 * self.latency_frames, dtype=np.float32)
+        # Leading delay-line silence still to be discarded
+        self._priming = self.latency_frames
+
+    @property
+    def current_gain_db(self) -> float:
+        """The AGC gain currently applied, in dB."""
+        return 20.0 * math.log10(self._agc_gain)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Applies AGC and limiting to a block of float32 frames (frames x channels)."""
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        if not len(block):
+            return block
+
+        leveled = self._apply_agc(block)
+        return self._apply_limiter(leveled)
+
+    def flush(self) -> np.ndarray:
+        """Emits the frames held in the lookahead delay line; the AGC level carries over."""
+        tail = self._apply_limiter(np.zeros((self.latency_frames, self.channels), dtype=np.float32))
+        self._reset_delay_line()
+        return tail
+
+    def apply(self, frames: np.ndarray, block_ms: float = 20.0) -> np.ndarray:
+        """Processes a complete clip in `block_ms` blocks, returning output aligned with the input.
+
+        Feeding the clip as one block would ramp the gain across the whole
+        clip; fixed short blocks give it the same time constant as streaming.
+        """
+        frames = np.asarray(frames, dtype=np.float32).reshape(-1, self.channels)
+        block_frames = max(1, int(self.sample_rate * block_ms / 1000.0))
+        blocks = [self.process(frames[start:start + block_frames])
+                  for start in range(0, len(frames), block_frames)]
+        blocks.append(self.flush())
+        return np.concatenate(blocks)
+
+    def _apply_agc(self, block: np.ndarray) -> np.ndarray:
+        """Ramps the gain toward the level that brings the running RMS to target."""
+        block_mean_square = float(np.mean(np.square(block)))
+        previous_gain = self._agc_gain
+
+        # Hold the gain through silence so pauses are not pumped up into noise
+        if block_mean_square > self.gate * self.gate:
+            if self._mean_square is None:
+                # First voiced block: jump straight to its gain rather than
+                # fading in from unity
+                self._mean_square = block_mean_square
+                previous_gain = min(self.max_gain, max(self.min_gain,
+                                                       self.target_rms / math.sqrt(block_mean_square)))
+            else:
+                smoothing = math.exp(-len(block) / (self.agc_time * self.sample_rate))
+                self._mean_square = smoothing * self._mean_square + (1.0 - smoothing) * block_mean_square
+
+            desired = self.target_rms / math.sqrt(self._mean_square)
+            self._agc_gain = min(self.max_gain, max(self.min_gain, desired))
+
+        if previous_gain == self._agc_gain:
+            return block * np.float32(self._agc_gain)
+
+        ramp = np.linspace(previous_gain, self._agc_gain, len(block) + 1, dtype=np.float32)[1:]
+        return block * ramp[:, None]
+
+    def _apply_limiter(self, block: np.ndarray) -> np.ndarray:
+        """Delays the block by the lookahead and scales it so peaks stay under the ceiling."""
+        window = 2 * self.half_window + 1
+
+        # Instantaneous gain each frame would need to stay under the ceiling
+        peaks = np.max(np.abs(block), axis=1)
+        needed = np.minimum(1.0, self.ceiling / np.maximum(peaks, 1e-9)).astype(np.float32)
+
+        gains = np.concatenate((self._limit_history, needed))
+        frames = np.concatenate((self._pending, block))
+
+        # Min-filter then moving average: the smoothed gain never exceeds the
+        # needed gain of any frame within half_window, so the ceiling holds
+        held = np.lib.stride_tricks.sliding_window_view(gains, window).min(axis=1)
+        cumulative = np.concatenate(([0.0], np.cumsum(held, dtype=np.float64)))
+        smoothed = (cumulative[window:] - cumulative[:-window]) / window
+
+        count = len(block)
+        output = frames[:count] * smoothed[:count, None].astype(np.float32)
+
+        self._pending = frames[count:]
+        self._limit_history = gains[count:]
+
+        if self._priming:
+            skipped = min(self._priming, count)
+            self._priming -= skipped
+            output = output[skipped:]
+
+        return output
+
+
+if __name__ == "__main__":
+    # Self-check: quiet then loud speech-like bursts processed in fixed 1024-frame blocks
+    rate = 48000
+    rng = np.random.default_rng(0)
+    t = np.arange(rate * 4) / rate
+    envelope = np.where(t < 2.0, 0.05, 0.9) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    signal_in = (envelope * np.sin(2 * np.pi * 220 * t + rng.normal(0, 0.3, len(t)).cumsum() * 0.01))
+    frames = np.column_stack((signal_in, signal_in)).astype(np.float32)
+
+    controller = LoudnessController(rate, 2)
+    blocks = [controller.process(frames[i:i + 1024]) for i in range(0, len(frames), 1024)]
+    blocks.append(controller.flush())
+    output = np.concatenate(blocks)
+
+    def rms_db(x):
+        return 20 * np.log10(np.sqrt(np.mean(np.square(x))))
+
+    print(f"Latency: {controller.latency_frames} frames ({controller.latency_frames / rate * 1000:.1f} ms)")
+    print(f"Input  RMS quiet/loud: {rms_db(frames[rate // 2:rate * 2]):6.1f} / {rms_db(frames[rate * 3:]):6.1f} dBFS")
+    print(f"Output RMS quiet/loud: {rms_db(output[rate // 2:rate * 2]):6.1f} / {rms_db(output[rate * 3:]):6.1f} dBFS")
+    print(f"Output peak: {np.max(np.abs(output)):.4f} (ceiling {controller.ceiling:.4f})")
+    print(f"Output length matches input: {len(output) == len(frames)}")
+
+    # Steady tone through apply(): the level must hold from the first second to the last
+    steady_t = np.arange(rate * 6) / rate
+    steady = (0.03 * np.sin(2 * np.pi * 440 * steady_t)).astype(np.float32)
+    steady_out = LoudnessController(rate, 2).apply(np.column_stack((steady, steady)))
+    levels = [rms_db(steady_out[second * rate:(second + 1) * rate]) for second in range(6)]
+    spread = max(levels) - min(levels)
+    print("Steady tone per-second RMS: " + ", ".join(f"{level:.1f}" for level in levels) + " dBFS")
+    print(f"Steady tone level constant: {'PASS' if spread < 0.5 else 'FAIL'} (spread {spread:.2f} dB)")
@@ -0,0 +1,158 @@
+from typing import Callable, Optional
+
+
+class AdaptiveJitterBuffer:
+    """Decides when playback may (re)start and how much audio to hold first.
+
+    While audio is flowing nothing is held back. Once the buffer runs dry,
+    playback restarts only when `target_frames` are buffered (or the producer
+    has gone quiet, i.e. this is a message tail). Audio resuming less than
+    `underrun_gap` seconds after a mid-stream dry-out means the producer fell
+    behind: that is an underrun, and the target grows by one step. Every
+    `stable_seconds` of played audio without one shrinks it by half a step,
+    so it settles at the lowest fill that stays glitch-free. Dry-outs after
+    end_of_stream() (drain, Stop) are message ends, not underruns.
+
+    All methods but end_of_stream() are called from the consumer thread only.
+    """
+
+    def __init__(self, sample_rate: int = 48000, step_frames: int = 1024,
+                 target_ms: float = 0.0,
+                 min_ms: float = 0.0,
+                 max_ms: float = 200.0,
+                 stable_seconds: float = 10.0,
+                 underrun_gap: float = 1.0,
+                 on_underrun: Optional[Callable[[], None]] = None):
+        self.sample_rate = sample_rate
+        self.step_frames = step_frames
+        self.min_frames = int(sample_rate * min_ms / 1000)
+        self.max_frames = max(self.min_frames, int(sample_rate * max_ms / 1000))
+        self.target_frames = min(self.max_frames, max(self.min_frames, int(sample_rate * target_ms / 1000)))
+        self.stable_frames = int(sample_rate * stable_seconds)
+        self.underrun_gap = underrun_gap
+        self.on_underrun = on_underrun
+
+        self.playing = False
+        self.underruns = 0
+        self.grows = 0
+        self.shrinks = 0
+        self.rebuffers = 0
+
+        self._dry_at: Optional[float] = None
+        self._mid_stream = False
+        self._ended = False
+        self._waiting = False
+        self._last_written: Optional[int] = None
+        self._played_since_underrun = 0
+
+    @property
+    def target_ms(self) -> float:
+        return self.target_frames / self.sample_rate * 1000
+
+    def ready(self, available: int, written: int, now: float) -> bool:
+        """Whether a stopped stream should start playing.
+
+        available is the audio buffered right now, written the producer's
+        running total of frames sent (unchanged between two calls = producer idle).
+        """
+        idle = written == self._last_written
+        self._last_written = written
+        if available <= 0:
+            return False
+
+        if self._dry_at is not None:
+            # Audio resumed: a short gap in the middle of a stream was an underrun
+            if self._mid_stream and now - self._dry_at < self.underrun_gap:
+                self._underrun()
+            self._dry_at = None
+            self._ended = False
+
+        if available >= self.target_frames or idle:
+            self.playing = True
+            self._waiting = False
+            return True
+
+        if not self._waiting:
+            self._waiting = True
+            self.rebuffers += 1
+        return False
+
+    def on_dry(self, now: float):
+        """The playing stream ran out of audio."""
+        self.playing = False
+        self._dry_at = now
+        self._mid_stream = not self._ended
+
+    def on_played(self, frames: int):
+        """Counts audio played; long enough without an underrun shrinks the target."""
+        self._played_since_underrun += frames
+        if self._played_since_underrun >= self.stable_frames:
+            self._played_since_underrun = 0
+            if self.target_frames > self.min_frames:
+                self.target_frames = max(self.min_frames, self.target_frames - self.step_frames // 2)
+                self.shrinks += 1
+
+    def end_of_stream(self):
+        """The producer finished (or was stopped): the next dry-out is not an underrun."""
+        if self.playing:
+            self._ended = True
+        else:
+            self._mid_stream = False
+
+    def _underrun(self):
+        self.underruns += 1
+        self._played_since_underrun = 0
+        if self.target_frames < self.max_frames:
+            self.target_frames = min(self.max_frames, self.target_frames + self.step_frames)
+            self.grows += 1
+        if self.on_underrun is not None:
+            self.on_underrun()
+
+    def stats(self) -> dict:
+        """Returns underrun counters and the current target fill."""
+        return {
+            'underruns': self.underruns,
+            'rebuffers': self.rebuffers,
+            'grows': self.grows,
+            'shrinks': self.shrinks,
+            'target_ms': self.target_ms,
+        }
+
+
+if __name__ == "__main__":
+    # Simulation: a producer that only just keeps up (and stalls now and then), played in 1024-frame periods
+    import numpy as np
+
+    rate, period = 48000, 1024
+
+    def simulate(jitter: AdaptiveJitterBuffer, seconds: float = 120.0):
+        rng = np.random.default_rng(0)
+        buffered = written = 0
+        stall_until = 0.0
+        targets = []
+        now = 0.0
+        for _ in range(int(seconds * rate / period)):
+            now += period / rate
+            # Producer: real time on average in uneven bursts, with a 50 ms stall every ~4 s for the first minute
+            if now < 60 and rng.random() < period / rate / 4:
+                stall_until = now + 0.05
+            if now >= stall_until:
+                produced = min(int(rng.uniform(0.5, 1.5) * period), int(0.4 * rate) - buffered)
+                buffered += produced
+                written += produced
+            # Consumer: one period per tick
+            if jitter.playing or jitter.ready(buffered, written, now):
+                taken = min(period, buffered)
+                buffered -= taken
+                jitter.on_played(taken)
+                if taken < period:
+                    jitter.on_dry(now)
+            targets.append(jitter.target_ms)
+        return targets
+
+    for label, jitter in (("fixed (no target)", AdaptiveJitterBuffer(rate, period, max_ms=0.0)),
+                          ("adaptive", AdaptiveJitterBuffer(rate, period, stable_seconds=5.0))):
+        targets = simulate(jitter)
+        stats = jitter.stats()
+        print(f"{label:<18} underruns {stats['underruns']:3d}  target fill: mean {np.mean(targets):5.1f} ms, "
+              f"peak {max(targets):5.1f} ms, final {stats['target_ms']:5.1f} ms")
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Project message; only {full_name} and {case_number} change between calls
+MESSAGE_TEMPLATE = """This message is for {full_name}, this is Jessica with COUNTY Process Serving Division.
+Your Case Number is {case_number}. Disclaimer: This message is generated by an AI system."""
+
+
+def format_case_number(case_number: str) -> str:
+    """Formats case number for speech (e.g., '582193' → '58...21...93')."""
+    # Remove any non-numeric characters
+    digits = ''.join(filter(str.isdigit, case_number))
+
+    # Group digits for clearer speech
+    if len(digits) >= 6:
+        return f"{digits[:2]}...{digits[2:4]}...{digits[4:6]}"
+    return case_number
+
+
+def message_values(full_name: str, case_number: str) -> dict:
+    """Returns the template values spoken for a recipient (name uppercased, case number grouped)."""
+    return {'full_name': full_name.upper(), 'case_number': format_case_number(case_number)}
+
+
+def render_message(full_name: str, case_number: str, template: str = MESSAGE_TEMPLATE) -> str:
+    """Renders the exact text synthesized for a recipient.
+
+    Every entry point (GUI, batch, generate_message_audio) goes through here,
+    so the same recipient always maps to the same TTS cache key.
+    """
+    return template.format(**message_values(full_name, case_number))
@@ -0,0 +1,354 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, 1 ms to 30 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefix for exported metric names
+NAMESPACE = "ai_audio"
+
+# When set, get_metrics() exports to this path (.json or .prom) on every flush()
+METRICS_FILE_ENV = "AI_AUDIO_METRICS_FILE"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) plus a rolling window for percentiles."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._window = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+            self._window.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile over the most recent observations."""
+        with self._lock:
+            samples = sorted(self._window)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(p / 100.0 * len(samples) + 0.5)) - 1))
+        return samples[rank]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, total = [], 0
+            for count in self.bucket_counts:
+                total += count
+                cumulative.append(total)
+            snapshot = {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                        'buckets': dict(zip((str(b) for b in self.buckets), cumulative))}
+        snapshot.update({f'p{p}': self.percentile(p) for p in (50, 95, 99)})
+        return snapshot
+
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Trace:
+    """Timeline of one operation: named marks in seconds since it started (monotonic clock).
+
+    Marks keep their first occurrence unless recorded with first=False (e.g.
+    "last_write"). finish() files every mark into the `<name>_stage_seconds`
+    histogram, so the stage offsets of many operations can be compared.
+    """
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, **attributes):
+        self.registry = registry
+        self.name = name
+        self.attributes = {k: str(v) for k, v in attributes.items()}
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.marks: Dict[str, float] = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def mark(self, stage: str, at: Optional[float] = None, first: bool = True):
+        """Records that stage happened now (or at a time.perf_counter() value)."""
+        offset = (time.perf_counter() if at is None else at) - self.start
+        with self._lock:
+            if self.finished or (first and stage in self.marks):
+                return
+            self.marks[stage] = offset
+
+    def since(self, stage: str) -> Optional[float]:
+        """Seconds from the start of the trace to stage, if it was marked."""
+        with self._lock:
+            return self.marks.get(stage)
+
+    def summary(self) -> str:
+        """One-line timeline, e.g. "request_sent +2 ms, full_response +840 ms, ..."."""
+        marks = self.to_dict()['marks']
+        return ", ".join(f"{stage} +{offset * 1000:.0f} ms" for stage, offset in marks.items()) or "no stages"
+
+    def finish(self):
+        """Closes the trace and records its stage offsets."""
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            marks = dict(self.marks)
+        for stage, offset in marks.items():
+            self.registry.histogram(f"{self.name}_stage_seconds", stage=stage,
+                                    help=f"Seconds from the start of a {self.name} to each stage").observe(offset)
+        self.registry._record_trace(self)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            marks = sorted(self.marks.items(), key=lambda item: item[1])
+        return {'name': self.name, 'started_at': self.started_at,
+                'attributes': self.attributes, 'marks': dict(marks)}
+
+
+class MetricsRegistry:
+    """In-process histograms, counters and recent traces, exportable as JSON or Prometheus text."""
+
+    def __init__(self, max_traces: int = 50):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], Counter] = {}
+        self._help: Dict[str, str] = {}
+        self._traces = deque(maxlen=max_traces)
+        self._exporters: List[Callable[['MetricsRegistry'], None]] = []
+
+    def histogram(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels) -> Histogram:
+        """Returns the histogram for name and labels, creating it on first use."""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            if help:
+                self._help[name] = help
+            return histogram
+
+    def counter(self, name: str, help: str = "", **labels) -> Counter:
+        """Returns the counter for name and labels, creating it on first use."""
+        key = (name, _labels(labels))
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = Counter()
+            if help:
+                self._help[name] = help
+            return counter
+
+    def observe(self, name: str, value: float, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        self.counter(name, **labels).inc(amount)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Times the block into span_seconds{span=name} and marks name on the current trace when it ends."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            ended = time.perf_counter()
+            self.histogram("span_seconds", span=name, help="Duration of each timed stage").observe(ended - started)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.mark(name, ended)
+
+    def trace(self, name: str, **attributes) -> Trace:
+        """Starts a trace; activate it on a thread with use_trace()."""
+        return Trace(self, name, **attributes)
+
+    def _record_trace(self, trace: Trace):
+        with self._lock:
+            self._traces.append(trace.to_dict())
+
+    def snapshot(self) -> dict:
+        """Everything recorded so far as plain data."""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+            traces = list(self._traces)
+        return {
+            'histograms': [{'name': name, 'labels': dict(labels), **h.snapshot()}
+                           for (name, labels), h in sorted(histograms, key=lambda item: item[0])],
+            'counters': [{'name': name, 'labels': dict(labels), 'value': c.value}
+                         for (name, labels), c in sorted(counters, key=lambda item: item[0])],
+            'traces': traces,
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def prometheus_text(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            counters = sorted(self._counters.items(), key=lambda item: item[0])
+            help_text = dict(self._help)
+
+        lines = []
+        described = set()
+
+        def describe(name: str, full_name: str, kind: str):
+            if full_name not in described:
+                described.add(full_name)
+                if name in help_text:
+                    lines.append(f"# HELP {full_name} {help_text[name]}")
+                lines.append(f"# TYPE {full_name} {kind}")
+
+        for (name, labels), histogram in histograms:
+            full_name = f"{NAMESPACE}_{name}"
+            describe(name, full_name, "histogram")
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot['buckets'].items():
+                lines.append(f"{full_name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+            lines.append(f"{full_name}_bucket{_format_labels(labels, ('le', '+Inf'))} {snapshot['count']}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {snapshot['sum']}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {snapshot['count']}")
+
+        for (name, labels), counter in counters:
+            full_name = f"{NAMESPACE}_{name}"
+            describe(name, full_name, "counter")
+            lines.append(f"{full_name}{_format_labels(labels)} {counter.value}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        """Writes a JSON (.json) or Prometheus text (anything else) snapshot to path."""
+        content = self.to_json() if path.endswith(".json") else self.prometheus_text()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def add_exporter(self, exporter: Callable[['MetricsRegistry'], None]):
+        """Registers a hook called with the registry on every flush()."""
+        with self._lock:
+            self._exporters.append(exporter)
+
+    def flush(self):
+        """Runs the export hooks; an exporter failure is reported, never raised."""
+        with self._lock:
+            exporters = list(self._exporters)
+        for exporter in exporters:
+            try:
+                exporter(self)
+            except Exception as e:
+                print(f"Warning: metrics export failed: {e}")
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Makes trace the current trace for this thread (and asyncio tasks / to_thread calls it starts)."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def mark(stage: str, first: bool = True):
+    """Marks stage on the current trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(stage, first=first)
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry (exporting to AI_AUDIO_METRICS_FILE if set)."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+            path = os.environ.get(METRICS_FILE_ENV)
+            if path:
+                _metrics.add_exporter(lambda registry: registry.export(path))
+        return _metrics
+
+
+if __name__ == "__main__":
+    # Demo: one traced message through the fake Gemini client into a recording router
+    import sys
+    from audio_backend import create_backend
+    from audio_router import AudioRouter
+    from fake_gemini import FakeGeminiClient
+    from gemini_tts import GeminiTTS
+    from metrics import get_metrics, use_trace  # the module the other modules report into, not __main__
+    from wav_codec import parse_wav
+
+    metrics = get_metrics()
+    tts = GeminiTTS(client=FakeGeminiClient(first_byte_latency=0.3))
+    router = AudioRouter(backend=create_backend("memory", realtime=True))
+    router.start()
+
+    for _ in range(3):
+        trace = metrics.trace("send")
+        with use_trace(trace):
+            audio_format, pcm = parse_wav(tts.generate_speech("Metrics demo message."))
+            step = router.chunk_size * audio_format.block_align
+            for start in range(0, len(pcm), step):
+                router.send_audio(pcm[start:start + step], fmt=audio_format)
+        router.drain()
+        trace.finish()
+        print(f"Stage timings: {trace.summary()}")
+    router.stop()
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    if path:
+        metrics.export(path)
+        print(f"Metrics written to {path}")
+    else:
+        print(metrics.prometheus_text())
\ No newline at end of file
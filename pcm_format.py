@@ -0,0 +1,258 @@
+import struct
+import time
+import numpy as np
+from typing import Union
+from resampler import PolyphaseResampler, resample
+from wav_codec import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM
+
+# Signed 24-bit integer range
+INT24_MIN = -(2**23)
+INT24_MAX = 2**23 - 1
+
+# Integer container and full-scale value for each supported PCM width
+_INT_FORMATS = {
+    1: (np.uint8, 128.0),
+    2: (np.dtype('<i2'), 32768.0),
+    3: (np.dtype('<i4'), 8388608.0),
+    4: (np.dtype('<i4'), 2147483648.0),
+}
+
+BufferLike = Union[bytes, bytearray, memoryview]
+
+
+def pack_int24(samples: np.ndarray) -> bytes:
+    """Packs integer samples into 24-bit little-endian PCM bytes (interleaved order kept)."""
+    flat = np.asarray(samples).reshape(-1)
+    flat = np.clip(flat, INT24_MIN, INT24_MAX).astype('<i4', copy=False)
+
+    # Drop the most significant byte of every little-endian int32
+    return flat.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+
+def unpack_int24(data: bytes) -> np.ndarray:
+    """Unpacks 24-bit little-endian PCM bytes into a flat int32 array."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    triples = raw[:len(raw) - len(raw) % 3].reshape(-1, 3)
+
+    samples = np.empty(len(triples), dtype='<i4')
+    samples_bytes = samples.view(np.uint8).reshape(-1, 4)
+    samples_bytes[:, :3] = triples
+    # Sign-extend from bit 23 into the top byte
+    samples_bytes[:, 3] = (triples[:, 2] >> 7) * 0xFF
+
+    return samples
+
+
+def decode_pcm(data: BufferLike, sample_width: int, channels: int,
+               audio_format: int = WAVE_FORMAT_PCM) -> np.ndarray:
+    """Decodes interleaved PCM bytes into float32 frames (frames x channels) in [-1.0, 1.0)."""
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        if sample_width != 4:
+            raise ValueError(f"Unsupported float sample width: {sample_width * 8}-bit")
+        samples = np.frombuffer(data, dtype='<f4').astype(np.float32)
+        usable = len(samples) - len(samples) % channels
+        return samples[:usable].reshape(-1, channels)
+
+    if sample_width not in _INT_FORMATS:
+        raise ValueError(f"Unsupported PCM sample width: {sample_width * 8}-bit")
+
+    dtype, full_scale = _INT_FORMATS[sample_width]
+    if sample_width == 3:
+        samples = unpack_int24(data)
+    else:
+        raw = memoryview(data).cast('B')
+        samples = np.frombuffer(raw[:len(raw) - len(raw) % sample_width], dtype=dtype)
+
+    audio = samples.astype(np.float32)
+    if sample_width == 1:
+        # 8-bit WAV is unsigned with a midpoint of 128
+        audio -= 128.0
+    audio *= 1.0 / full_scale
+
+    usable = len(audio) - len(audio) % channels
+    return audio[:usable].reshape(-1, channels)
+
+
+def quantize(frames: np.ndarray, sample_width: int) -> np.ndarray:
+    """Converts float frames to the integer sample values of the given PCM width (24-bit in int32)."""
+    dtype, full_scale = _INT_FORMATS[sample_width]
+
+    # Same scale as decode_pcm so codes round-trip exactly; +1.0 clips to the
+    # top code. 32-bit needs float64 to represent full_scale - 1.
+    work_dtype = np.float64 if sample_width == 4 else np.float32
+    scaled = np.rint(np.asarray(frames, dtype=work_dtype) * full_scale)
+    np.clip(scaled, -full_scale, full_scale - 1.0, out=scaled)
+    if sample_width == 1:
+        scaled += 128.0
+    return scaled.astype(dtype)
+
+
+def encode_pcm(frames: np.ndarray, sample_width: int,
+               audio_format: int = WAVE_FORMAT_PCM) -> bytes:
+    """Encodes float frames into interleaved little-endian PCM bytes."""
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT:
+        return np.asarray(frames, dtype='<f4').tobytes()
+
+    samples = quantize(frames, sample_width)
+    if sample_width == 3:
+        return pack_int24(samples)
+    return samples.tobytes()
+
+
+def remix_channels(frames: np.ndarray, channels: int) -> np.ndarray:
+    """Remixes frames to the requested channel count (downmix by averaging, upmix by duplication)."""
+    source_channels = frames.shape[1]
+    if source_channels == channels:
+        return frames
+    if channels == 1:
+        return frames.mean(axis=1, dtype=np.float32, keepdims=True)
+    if source_channels == 1:
+        return np.repeat(frames, channels, axis=1)
+
+    # Fold everything to mono first, then spread to the target layout
+    return np.repeat(frames.mean(axis=1, dtype=np.float32, keepdims=True), channels, axis=1)
+
+
+def convert_frames(frames: np.ndarray, orig_rate: int, target_rate: int, channels: int) -> np.ndarray:
+    """Remixes and resamples float frames, resampling whichever side has fewer channels."""
+    if frames.shape[1] > channels:
+        frames = remix_channels(frames, channels)
+
+    if orig_rate != target_rate:
+        frames = resample(frames, orig_rate, target_rate)
+
+    return remix_channels(frames, channels)
+
+
+class StreamConverter:
+    """Incrementally decodes, remixes and resamples a PCM byte stream into float32 frames."""
+
+    def __init__(self, sample_rate: int, channels: int, sample_width: int,
+                 target_rate: int, target_channels: int,
+                 audio_format: int = WAVE_FORMAT_PCM):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.audio_format = audio_format
+        self.target_rate = target_rate
+        self.target_channels = target_channels
+
+        # Bytes of a partial frame left over from the previous chunk
+        self._remainder = b""
+        self._resampler = None
+        if sample_rate != target_rate:
+            self._resampler = PolyphaseResampler(sample_rate, target_rate,
+                                                 min(channels, target_channels))
+
+    def process(self, data: BufferLike) -> np.ndarray:
+        """Converts the next chunk of PCM bytes, returning every frame it completes."""
+        frame_size = self.channels * self.sample_width
+        if self._remainder:
+            data = self._remainder + bytes(data)
+        usable = len(data) - len(data) % frame_size
+        self._remainder = bytes(data[usable:])
+
+        frames = decode_pcm(memoryview(data)[:usable], self.sample_width,
+                            self.channels, self.audio_format)
+        return self._convert(frames)
+
+    def flush(self) -> np.ndarray:
+        """Drains the resampler delay line at the end of the stream."""
+        self._remainder = b""
+        if self._resampler is None:
+            return np.zeros((0, self.target_channels), dtype=np.float32)
+        return remix_channels(self._resampler.flush(), self.target_channels)
+
+    def _convert(self, frames: np.ndarray) -> np.ndarray:
+        if frames.shape[1] > self.target_channels:
+            frames = remix_channels(frames, self.target_channels)
+        if self._resampler is not None:
+            frames = self._resampler.process(frames)
+        return remix_channels(frames, self.target_channels)
+
+
+def _pack_int24_loop(samples: np.ndarray) -> bytes:
+    """Reference per-sample packer (the original GeminiTTS implementation)."""
+    audio_24bit = bytearray()
+    for sample in np.asarray(samples).reshape(-1):
+        audio_24bit.extend(struct.pack('<i', int(sample))[:3])
+    return bytes(audio_24bit)
+
+
+def benchmark_int24(num_samples: int = 960000, repeats: int = 3) -> dict:
+    """Measures 24-bit packing throughput in samples/sec against the per-sample loop."""
+    rng = np.random.default_rng(0)
+    samples = rng.integers(INT24_MIN, INT24_MAX, size=num_samples, dtype=np.int32)
+
+    def best_time(func):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(samples)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    packed = pack_int24(samples)
+    if packed != _pack_int24_loop(samples):
+        raise AssertionError("pack_int24 does not match the reference loop")
+    if not np.array_equal(unpack_int24(packed), samples):
+        raise AssertionError("unpack_int24 does not round-trip pack_int24")
+
+    loop_time = best_time(_pack_int24_loop)
+    pack_time = best_time(pack_int24)
+    unpack_time = best_time(lambda s: unpack_int24(packed))
+
+    return {
+        'samples': num_samples,
+        'loop_samples_per_sec': num_samples / loop_time,
+        'pack_samples_per_sec': num_samples / pack_time,
+        'unpack_samples_per_sec': num_samples / unpack_time,
+        'speedup': loop_time / pack_time,
+    }
+
+
+def benchmark_codecs(num_frames: int = 480000, channels: int = 2, repeats: int = 3) -> dict:
+    """Measures decode/encode throughput in samples/sec for every supported sample format."""
+    rng = np.random.default_rng(0)
+    frames = rng.uniform(-1.0, 1.0, size=(num_frames, channels)).astype(np.float32)
+    formats = [(1, WAVE_FORMAT_PCM), (2, WAVE_FORMAT_PCM), (3, WAVE_FORMAT_PCM),
+               (4, WAVE_FORMAT_PCM), (4, WAVE_FORMAT_IEEE_FLOAT)]
+
+    results = {}
+    for sample_width, audio_format in formats:
+        encoded = encode_pcm(frames, sample_width, audio_format)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            decoded = decode_pcm(encoded, sample_width, channels, audio_format)
+        decode_time = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            encode_pcm(decoded, sample_width, audio_format)
+        encode_time = (time.perf_counter() - start) / repeats
+
+        name = "float32" if audio_format == WAVE_FORMAT_IEEE_FLOAT else f"int{sample_width * 8}"
+        results[name] = {
+            'decode_samples_per_sec': frames.size / decode_time,
+            'encode_samples_per_sec': frames.size / encode_time,
+            'max_error': float(np.max(np.abs(decoded - frames))),
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    # 10 seconds of 48kHz stereo audio
+    results = benchmark_int24()
+    print(f"24-bit PCM packing benchmark ({results['samples']} samples)")
+    print(f"  struct loop:  {results['loop_samples_per_sec']:>14,.0f} samples/sec")
+    print(f"  pack_int24:   {results['pack_samples_per_sec']:>14,.0f} samples/sec")
+    print(f"  unpack_int24: {results['unpack_samples_per_sec']:>14,.0f} samples/sec")
+    print(f"  speedup:      {results['speedup']:.1f}x")
+
+    print("\nSample format conversion benchmark (480000 stereo frames)")
+    for name, stats in benchmark_codecs().items():
+        print(f"  {name:<8} decode {stats['decode_samples_per_sec']:>14,.0f} samples/sec, "
+              f"encode {stats['encode_samples_per_sec']:>14,.0f} samples/sec, "
+              f"round-trip error {stats['max_error']:.1e}")
@@ -0,0 +1,504 @@
+import asyncio
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Marks a stream that ended before yielding anything
+_END = object()
+
+# HTTP statuses a retry can fix: request timeout, rate limiting and server errors
+RETRYABLE_STATUS = frozenset({408, 429})
+
+
+class RequestTimeout(TimeoutError):
+    """An attempt produced no response within the per-attempt timeout."""
+
+
+def close_result(result: Any):
+    """Closes a result nobody will use (streams, responses), if it can be closed."""
+    close = getattr(result, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            print(f"Warning: could not close abandoned result: {e}")
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for errors worth retrying: timeouts, connection failures, 429 and 5xx responses."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    # httpx (under google-genai) has its own transport errors; only check when it is loaded
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, httpx.TransportError):
+        return True
+
+    # API errors carry the HTTP status as `code` (google-genai) or `status_code`
+    status = getattr(error, "code", None)
+    if not isinstance(status, int):
+        status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500)
+
+
+class LatencyTracker:
+    """Rolling window of request latencies with percentile queries."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Returns the p-th percentile (nearest rank) of the window, or None when empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(p / 100.0 * len(samples) + 0.5)) - 1))
+        return samples[rank]
+
+    def snapshot(self) -> dict:
+        """Returns the sample count and p50/p95/p99."""
+        return {
+            'count': len(self),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class RequestPolicy:
+    """Per-attempt timeouts, exponential backoff with full jitter, and optional hedging.
+
+    With hedging on, an attempt that has not answered within the tracked p95
+    (or `hedge_delay` until `hedge_min_samples` latencies are known) gets a
+    duplicate request; whichever answers first wins. For streams the latency
+    that matters is the first chunk, so retries and hedges only happen before it;
+    after it, each further chunk must arrive within `idle_timeout` (default
+    `timeout`). Only errors `retry_on` accepts are retried (transient ones by default).
+    
+    Synchronous attempts run on threads that cannot be interrupted, so attempts
+    that time out or lose a hedge are left to finish and their results closed.
+    """
+
+    def __init__(self, timeout: float = 30.0,
+                 max_attempts: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 hedge: bool = False,
+                 hedge_delay: float = 3.0,
+                 hedge_percentile: float = 95.0,
+                 hedge_min_samples: int = 20,
+                 retry_on: Callable[[BaseException], bool] = is_transient,
+                 idle_timeout: Optional[float] = None,
+                 name: str = "request"):
+        self.timeout = timeout
+        self.idle_timeout = timeout if idle_timeout is None else idle_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.retry_on = retry_on
+        self.name = name
+
+        self.latency = LatencyTracker()
+
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def current_hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging an attempt (None when hedging is off)."""
+        if not self.hedge:
+            return None
+        if len(self.latency) < self.hedge_min_samples:
+            return self.hedge_delay
+        return self.latency.percentile(self.hedge_percentile)
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retrying after `attempt` failures."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        with self._lock:
+            return self._random.uniform(0, ceiling)
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Returns the backoff before the next attempt, or None if the error is final."""
+        if not self.retry_on(error) or attempt >= self.max_attempts:
+            self._count('failures')
+            return None
+
+        self._count('retries')
+        delay = self.backoff(attempt)
+        print(f"{self.name} attempt {attempt}/{self.max_attempts} failed ({error}); "
+              f"retrying in {delay:.2f} s")
+        return delay
+
+    def _spawn(self, fn: Callable[[], T]) -> Future:
+        """Runs fn on a daemon thread; an abandoned attempt cannot block shutdown."""
+        future = Future()
+        future.started = time.perf_counter()
+
+        def run():
+            try:
+                result = fn()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                self.latency.record(time.perf_counter() - future.started)
+                future.set_result(result)
+
+        self._count('attempts')
+        threading.Thread(target=run, daemon=True).start()
+        return future
+
+    @staticmethod
+    def _abandon(futures: Iterable[Future], cleanup: Callable[[Any], None]):
+        """Cleans up the results of attempts nobody will use, now or whenever they finish."""
+        def discard(future: Future):
+            if future.exception() is None:
+                cleanup(future.result())
+
+        for future in futures:
+            future.add_done_callback(discard)
+
+    def _attempt(self, fn: Callable[[], T], cleanup: Callable[[Any], None]) -> T:
+        """One logical attempt: the primary request plus at most one hedge."""
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        hedge_delay = self.current_hedge_delay()
+
+        pending = {self._spawn(fn)}
+        hedge = None
+        error: Optional[BaseException] = None
+
+        while pending:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+
+            wake = deadline
+            if hedge is None and hedge_delay is not None:
+                wake = min(wake, started + hedge_delay)
+            done, pending = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    self._abandon((pending | done) - {future}, cleanup)
+                    return future.result()
+                error = future.exception()
+
+            # Hedge only while the primary is still outstanding
+            if (pending and hedge is None and hedge_delay is not None
+                    and time.perf_counter() >= started + hedge_delay):
+                self._count('hedges')
+                hedge = self._spawn(fn)
+                pending.add(hedge)
+
+        if pending:
+            self._count('timeouts')
+            self._abandon(pending, cleanup)
+            raise RequestTimeout(f"{self.name} timed out after {self.timeout:.1f} s")
+        raise error
+
+    def call(self, fn: Callable[[], T], cleanup: Callable[[Any], None] = close_result) -> T:
+        """Calls fn under the policy, returning the first successful result.
+
+        Results of timed-out or losing attempts are passed to cleanup when they arrive.
+        """
+        self._count('calls')
+        attempt = 1
+        while True:
+            try:
+                return self._attempt(fn, cleanup)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def call_stream(self, factory: Callable[[], Iterable[T]]) -> Iterator[T]:
+        """Streams from factory(); timeouts, retries and hedging apply up to the first item.
+
+        Later items must each arrive within idle_timeout, else RequestTimeout is raised.
+        """
+        def open_stream():
+            iterator = iter(factory())
+            return iterator, next(iterator, _END)
+
+        iterator, first = self.call(open_stream, cleanup=lambda opened: close_result(opened[0]))
+        if first is _END:
+            close_result(iterator)
+            return
+        yield first
+        yield from self._iterate_with_idle_timeout(iterator)
+
+    def _iterate_with_idle_timeout(self, iterator: Iterator[T]) -> Iterator[T]:
+        """Pulls the rest of a stream on a worker thread so a stalled chunk can time out."""
+        items = queue.Queue()
+        stop = threading.Event()
+
+        def pump():
+            try:
+                for item in iterator:
+                    if stop.is_set():
+                        break
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((_END, e))
+                return
+            finally:
+                # Releases the connection, including when the consumer gave up
+                close_result(iterator)
+            items.put((_END, None))
+
+        threading.Thread(target=pump, daemon=True).start()
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    self._count('timeouts')
+                    raise RequestTimeout(f"{self.name} stalled: no data for {self.idle_timeout:.1f} s")
+                if error is not None:
+                    raise error
+                if item is _END:
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    async def call_async(self, factory: Callable[[], Awaitable[T]]) -> T:
+        """Asyncio variant of call(); losing hedges are cancelled rather than abandoned."""
+        self._count('calls')
+        attempt = 1
+        while True:
+            try:
+                return await self._attempt_async(factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _attempt_async(self, factory: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.timeout
+        hedge_delay = self.current_hedge_delay()
+
+        async def timed():
+            began = loop.time()
+            result = await factory()
+            self.latency.record(loop.time() - began)
+            return result
+
+        self._count('attempts')
+        pending = {asyncio.ensure_future(timed())}
+        hedge = None
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    break
+
+                wake = deadline
+                if hedge is None and hedge_delay is not None:
+                    wake = min(wake, started + hedge_delay)
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - now),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+
+                if (pending and hedge is None and hedge_delay is not None
+                        and loop.time() >= started + hedge_delay):
+                    self._count('hedges')
+                    self._count('attempts')
+                    hedge = asyncio.ensure_future(timed())
+                    pending.add(hedge)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if pending:
+            self._count('timeouts')
+            raise RequestTimeout(f"{self.name} timed out after {self.timeout:.1f} s")
+        raise error
+
+    def stats(self) -> dict:
+        """Returns attempt/retry/hedge counters and latency percentiles."""
+        with self._lock:
+            stats = {
+                'calls': self.calls,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'timeouts': self.timeouts,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'failures': self.failures,
+            }
+        stats.update(self.latency.snapshot())
+        return stats
+
+
+if __name__ == "__main__":
+    # Self-check against the offline fake Gemini client
+    from fake_gemini import FakeGeminiClient, FakeGeminiError
+    from gemini_tts import GeminiTTS
+
+    def check(label: str, passed: bool):
+        print(f"{'PASS' if passed else 'FAIL'}  {label}")
+
+    text = "Request policy check."
+
+    # Retries: two injected failures, third attempt succeeds
+    fake = FakeGeminiClient(first_byte_latency=0.01, chunk_interval=0.0)
+    policy = RequestPolicy(max_attempts=3, backoff_base=0.01, name="retry check")
+    tts = GeminiTTS(client=fake, policy=policy)
+    fake.fail_next(2)
+    tts.generate_speech(text)
+    check("retries through transient errors", policy.stats()['retries'] == 2)
+
+    # Exhausted retries surface the upstream error
+    fake.fail_next(3)
+    try:
+        tts.generate_speech(text)
+        check("gives up after max_attempts", False)
+    except FakeGeminiError:
+        check("gives up after max_attempts", policy.stats()['failures'] == 1)
+
+    # Per-attempt timeout
+    slow = FakeGeminiClient(first_byte_latency=1.0, chunk_interval=0.0)
+    policy = RequestPolicy(timeout=0.2, max_attempts=2, backoff_base=0.01, name="timeout check")
+    started = time.perf_counter()
+    try:
+        GeminiTTS(client=slow, policy=policy).generate_speech(text)
+        check("per-attempt timeout", False)
+    except RequestTimeout:
+        elapsed = time.perf_counter() - started
+        check(f"per-attempt timeout ({elapsed:.2f} s for 2 attempts)",
+              policy.stats()['timeouts'] == 2 and elapsed < 0.6)
+
+    # Streaming: retry before the first chunk
+    fake.fail_next(1)
+    stream_policy = RequestPolicy(backoff_base=0.01, name="stream check")
+    tts = GeminiTTS(client=fake, stream_policy=stream_policy)
+    chunks = list(tts.generate_speech_stream(text))
+    check("stream retries before first chunk", len(chunks) > 0 and stream_policy.stats()['retries'] == 1)
+
+    # Hedging: 4% of requests stall; hedged p99 should stay near the fast path
+    def tail_run(hedge: bool) -> dict:
+        tail = FakeGeminiClient(first_byte_latency=0.02, chunk_interval=0.0,
+                                tail_rate=0.04, tail_latency=0.6, seed=7)
+        policy = RequestPolicy(hedge=hedge, hedge_delay=0.1, hedge_min_samples=10,
+                               name="hedge check")
+        tts = GeminiTTS(client=tail, policy=policy)
+        latencies = LatencyTracker()
+        for _ in range(100):
+            started = time.perf_counter()
+            tts.generate_speech(text)
+            latencies.record(time.perf_counter() - started)
+        return {**latencies.snapshot(), 'hedges': policy.stats()['hedges'],
+                'hedge_wins': policy.stats()['hedge_wins']}
+
+    plain = tail_run(hedge=False)
+    hedged = tail_run(hedge=True)
+    print(f"      unhedged p50/p95/p99: {plain['p50'] * 1000:.0f} / {plain['p95'] * 1000:.0f} / "
+          f"{plain['p99'] * 1000:.0f} ms")
+    print(f"      hedged   p50/p95/p99: {hedged['p50'] * 1000:.0f} / {hedged['p95'] * 1000:.0f} / "
+          f"{hedged['p99'] * 1000:.0f} ms ({hedged['hedges']} hedges, {hedged['hedge_wins']} won)")
+    check("hedging cuts the tail", hedged['p99'] < plain['p99'] / 2)
+
+    # Async path with a retry
+    fake.fail_next(1)
+    async_policy = RequestPolicy(backoff_base=0.01, name="async check")
+    tts = GeminiTTS(client=fake, policy=async_policy)
+    asyncio.run(tts.generate_speech_async(text))
+    check("async retries", async_policy.stats()['retries'] == 1)
+
+    # Streams: a stall after the first chunk times out instead of hanging
+    def stalling_stream():
+        yield b"first"
+        time.sleep(1.0)
+        yield b"late"
+
+    idle_policy = RequestPolicy(timeout=1.0, idle_timeout=0.2, name="idle check")
+    started = time.perf_counter()
+    try:
+        list(idle_policy.call_stream(stalling_stream))
+        check("mid-stream stall times out", False)
+    except RequestTimeout:
+        check("mid-stream stall times out", time.perf_counter() - started < 0.5)
+
+    # Hedged streams: the losing stream is closed once it answers
+    closed = []
+    opened = []
+
+    def hedged_stream():
+        slow = not opened
+        opened.append(slow)
+        try:
+            if slow:
+                time.sleep(0.3)
+            yield b"chunk"
+            yield b"chunk"
+        finally:
+            closed.append(slow)
+
+    hedge_policy = RequestPolicy(hedge=True, hedge_delay=0.05, name="hedge close check")
+    chunks = list(hedge_policy.call_stream(hedged_stream))
+    time.sleep(0.5)
+    check("losing hedged stream is closed", len(chunks) == 2 and sorted(closed) == [False, True])
+
+    # Permanent errors surface immediately
+    permanent = RequestPolicy(backoff_base=0.01, name="permanent check")
+
+    def bad_request():
+        raise ValueError("bad request")
+
+    try:
+        permanent.call(bad_request)
+        check("permanent errors are not retried", False)
+    except ValueError:
+        check("permanent errors are not retried", permanent.stats()['attempts'] == 1)
\ No newline at end of file
@@ -0,0 +1,168 @@
+import math
+import time
+import numpy as np
+from typing import Optional
+
+# Output frames computed per vectorized step (bounds the gather buffer size)
+_BLOCK_FRAMES = 2048
+
+
+def design_lowpass(up: int, down: int, half_len: Optional[int] = None, beta: float = 5.0) -> np.ndarray:
+    """Designs the Kaiser-windowed sinc prototype filter used for rational resampling."""
+    max_rate = max(up, down)
+    if half_len is None:
+        half_len = 10 * max_rate
+
+    # Same design as scipy.signal.resample_poly so both paths agree
+    n = np.arange(2 * half_len + 1) - half_len
+    taps = np.sinc(n / max_rate) * np.kaiser(2 * half_len + 1, beta)
+    taps /= taps.sum()
+
+    return taps * up
+
+
+class PolyphaseResampler:
+    """Chunk-at-a-time rational resampler that carries its filter state between calls."""
+
+    def __init__(self, orig_rate: int, target_rate: int, channels: int = 1,
+                 half_len: Optional[int] = None):
+        divisor = math.gcd(int(orig_rate), int(target_rate))
+        self.orig_rate = orig_rate
+        self.target_rate = target_rate
+        self.up = int(target_rate) // divisor
+        self.down = int(orig_rate) // divisor
+        self.channels = channels
+
+        taps = design_lowpass(self.up, self.down, half_len)
+        self.delay = (len(taps) - 1) // 2
+
+        # Split the prototype into `up` phases of `taps_per_phase` taps, stored
+        # reversed so each phase is a dot product with a window of past input
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:len(taps)] = taps
+        self.phases = np.ascontiguousarray(
+            padded.reshape(self.taps_per_phase, self.up).T[:, ::-1], dtype=np.float32
+        )
+
+        self.reset()
+
+    def reset(self):
+        """Clears the carried filter state so the next chunk starts a new signal."""
+        self._history = np.zeros((self.taps_per_phase - 1, self.channels), dtype=np.float32)
+        self._frames_in = 0
+        self._frames_out = 0
+        # Upsampled-domain position of the next output frame (starts at the filter delay)
+        self._next_k = self.delay
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Resamples the next chunk of input, returning every output frame it completes."""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        squeeze = chunk.ndim == 1
+        frames = chunk.reshape(-1, self.channels)
+
+        output = self._consume(frames)
+        return output.reshape(-1) if squeeze else output
+
+    def flush(self, flat: bool = False) -> np.ndarray:
+        """Emits the remaining output frames held back by the filter delay."""
+        expected = -(-self._frames_in * self.up // self.down)
+        remaining = expected - self._frames_out
+        output = np.zeros((0, self.channels), dtype=np.float32)
+
+        if remaining > 0:
+            last_k = self._next_k + (remaining - 1) * self.down
+            padding = last_k // self.up + 1 - self._frames_in
+            output = self._consume(
+                np.zeros((max(padding, 0), self.channels), dtype=np.float32),
+                count_input=False,
+                max_outputs=remaining
+            )
+
+        self.reset()
+        return output.reshape(-1) if flat else output
+
+    def _consume(self, frames: np.ndarray, count_input: bool = True,
+                 max_outputs: Optional[int] = None) -> np.ndarray:
+        """Appends input frames and computes all output frames that are now fully determined."""
+        buffer_start = self._frames_in - len(self._history)
+        buffer = np.concatenate((self._history, frames))
+        available = self._frames_in + len(frames)
+
+        # Outputs are ready once the newest input sample they touch has arrived
+        num_outputs = max(0, -(-(available * self.up - self._next_k) // self.down))
+        if max_outputs is not None:
+            num_outputs = min(num_outputs, max_outputs)
+
+        output = np.empty((num_outputs, self.channels), dtype=np.float32)
+        if num_outputs:
+            windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps_per_phase, axis=0)
+
+        for block_start in range(0, num_outputs, _BLOCK_FRAMES):
+            count = min(_BLOCK_FRAMES, num_outputs - block_start)
+            ks = self._next_k + (block_start + np.arange(count)) * self.down
+            rows = ks // self.up - buffer_start - (self.taps_per_phase - 1)
+            output[block_start:block_start + count] = np.einsum(
+                'ncq,nq->nc', windows[rows], self.phases[ks % self.up]
+            )
+
+        self._next_k += num_outputs * self.down
+        self._frames_out += num_outputs
+        if count_input:
+            self._frames_in = available
+        self._history = buffer[len(buffer) - (self.taps_per_phase - 1):].copy()
+
+        return output
+
+
+def resample(audio: np.ndarray, orig_rate: int, target_rate: int) -> np.ndarray:
+    """Resamples a whole signal (1-D mono or frames x channels) with the polyphase resampler."""
+    audio = np.asarray(audio, dtype=np.float32)
+    if orig_rate == target_rate:
+        return audio
+
+    channels = 1 if audio.ndim == 1 else audio.shape[1]
+    resampler = PolyphaseResampler(orig_rate, target_rate, channels)
+    output = np.concatenate((resampler.process(audio), resampler.flush(flat=audio.ndim == 1)))
+
+    return output
+
+
+if __name__ == "__main__":
+    # Self-check: streaming output matches the batch path, then benchmark
+    from scipy import signal
+
+    rng = np.random.default_rng(0)
+    for orig_rate, target_rate in [(24000, 48000), (44100, 48000), (48000, 16000)]:
+        t = np.arange(orig_rate * 2) / orig_rate
+        audio = np.column_stack((
+            0.5 * np.sin(2 * np.pi * 440 * t),
+            0.1 * rng.standard_normal(len(t))
+        )).astype(np.float32)
+
+        reference = signal.resample_poly(audio.astype(np.float64), target_rate, orig_rate, axis=0)
+
+        resampler = PolyphaseResampler(orig_rate, target_rate, channels=2)
+        pieces = []
+        position = 0
+        while position < len(audio):
+            size = int(rng.integers(1, 4000))
+            pieces.append(resampler.process(audio[position:position + size]))
+            position += size
+        pieces.append(resampler.flush())
+        streamed = np.concatenate(pieces)
+
+        error = np.max(np.abs(streamed - reference))
+        status = "OK" if streamed.shape == reference.shape and error < 1e-4 else "MISMATCH"
+        print(f"{orig_rate} -> {target_rate}: {len(pieces) - 1} chunks, max error {error:.2e} [{status}]")
+
+    # Throughput for Gemini's 24kHz -> 48kHz on 10 seconds of mono speech
+    audio = rng.standard_normal(240000).astype(np.float32)
+    for name, func in [
+        ("scipy.signal.resample", lambda: signal.resample(audio, len(audio) * 2)),
+        ("polyphase (batch)", lambda: resample(audio, 24000, 48000)),
+    ]:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<22} {len(audio) / elapsed:>14,.0f} input samples/sec")
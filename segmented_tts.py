@@ -0,0 +1,116 @@
+import string
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from pcm_format import encode_pcm
+from wav_codec import WavFormat, build_wav
+
+# Level below which leading/trailing audio is treated as silence
+SILENCE_THRESHOLD = 10 ** (-45 / 20)
+
+
+def trim_silence(frames: np.ndarray, sample_rate: int, keep_ms: float = 30.0) -> np.ndarray:
+    """Trims leading and trailing silence, keeping a short natural margin."""
+    loud = np.flatnonzero(np.max(np.abs(frames), axis=1) > SILENCE_THRESHOLD)
+    if not len(loud):
+        return frames[:0]
+
+    keep = int(sample_rate * keep_ms / 1000)
+    return frames[max(0, loud[0] - keep):loud[-1] + 1 + keep]
+
+
+def splice(segments: List[np.ndarray], crossfade_frames: int, channels: int) -> np.ndarray:
+    """Joins segments with equal-power crossfades, writing once into a preallocated output."""
+    segments = [s for s in segments if len(s)]
+    if not segments:
+        return np.zeros((0, channels), dtype=np.float32)
+
+    # Each fade cannot be longer than either side of the join
+    fades = [min(crossfade_frames, len(a), len(b)) for a, b in zip(segments, segments[1:])]
+    total = sum(len(s) for s in segments) - sum(fades)
+    output = np.zeros((total, channels), dtype=np.float32)
+
+    position = 0
+    for index, segment in enumerate(segments):
+        fade_in = fades[index - 1] if index > 0 else 0
+        fade_out = fades[index] if index < len(fades) else 0
+        shaped = segment.copy()
+        if fade_in:
+            shaped[:fade_in] *= np.sin(np.linspace(0, np.pi / 2, fade_in, dtype=np.float32))[:, None]
+        if fade_out:
+            shaped[-fade_out:] *= np.cos(np.linspace(0, np.pi / 2, fade_out, dtype=np.float32))[:, None]
+
+        start = position - fade_in
+        output[start:start + len(shaped)] += shaped
+        position = start + len(shaped)
+
+    return output
+
+
+class SegmentedMessageRenderer:
+    """Renders a message template by splicing pre-rendered fixed phrases around per-call variable slots."""
+
+    def __init__(self, tts, template: str, crossfade_ms: float = 12.0):
+        self.tts = tts
+        self.template = template
+        self.crossfade_frames = int(tts.target_sample_rate * crossfade_ms / 1000)
+
+        # Alternating ('text', literal) and ('slot', field name) parts
+        self.parts: List[Tuple[str, str]] = []
+        for literal, field_name, _, _ in string.Formatter().parse(template):
+            literal = " ".join(literal.split())
+            if any(ch.isalnum() for ch in literal):
+                self.parts.append(('text', literal))
+            if field_name:
+                self.parts.append(('slot', field_name))
+
+        self._fixed = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_warm(self) -> bool:
+        """True once every fixed phrase is resident in target format."""
+        return all(text in self._fixed for kind, text in self.parts if kind == 'text')
+
+    def warm_up(self):
+        """Synthesizes the fixed phrases once and keeps them resident."""
+        for kind, text in self.parts:
+            if kind == 'text':
+                self._fixed_segment(text)
+
+    def _fixed_segment(self, text: str) -> np.ndarray:
+        with self._lock:
+            segment = self._fixed.get(text)
+        if segment is None:
+            segment = self._synthesize(text)
+            with self._lock:
+                self._fixed[text] = segment
+        return segment
+
+    def _synthesize(self, text: str) -> np.ndarray:
+        return trim_silence(self.tts.generate_frames(text), self.tts.target_sample_rate)
+
+    def render_frames(self, **values) -> np.ndarray:
+        """Renders the message as float32 frames, synthesizing only the variable slots."""
+        slots = [text for kind, text in self.parts if kind == 'slot']
+        missing = [name for name in slots if name not in values]
+        if missing:
+            raise KeyError(f"Missing template values: {', '.join(missing)}")
+
+        # Variable slots are independent requests; run them concurrently
+        with ThreadPoolExecutor(max_workers=max(1, len(slots))) as pool:
+            pending = {name: pool.submit(self._synthesize, str(values[name])) for name in slots}
+            segments = [
+                self._fixed_segment(text) if kind == 'text' else pending[text].result()
+                for kind, text in self.parts
+            ]
+
+        return splice(segments, self.crossfade_frames, self.tts.target_channels)
+
+    def render(self, **values) -> bytes:
+        """Renders the message as a WAV file in the TTS target format."""
+        frames = self.render_frames(**values)
+        width = self.tts.target_bit_depth // 8
+        target_format = WavFormat(self.tts.target_sample_rate, self.tts.target_channels, width)
+        return build_wav(target_format, encode_pcm(frames, width))
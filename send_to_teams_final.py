@@ -1,160 +1,159 @@
-import pyaudio
-import wave
 import numpy as np
 import sys
 import os
 import time
-from scipy import signal
+from typing import Iterable, Iterator
+from pcm_format import StreamConverter, convert_frames, decode_pcm, quantize
+from wav_codec import WavReader
+from audio_backend import paInt16
+from calibration import buffer_size_for
+from device_registry import get_registry, parse_device_arg
+from signal_generators import Sweep, SignalGenerator, WavetableOscillator, mix_blocks, render_blocks
 
-def send_audio_to_teams_final(wav_file, device_index=18):
+# Anti-gating carrier mixed under the message
+PILOT_FREQ = 50.0
+PILOT_LEVEL = 0.005
+MESSAGE_GAIN = 1.2
+
+# Pre-roll sweep that wakes up Teams' voice detection, and the tone trailing the message
+WAKE_START_FREQ = 200.0
+WAKE_END_FREQ = 800.0
+WAKE_SECONDS = 0.5
+WAKE_LEVEL = 0.1
+WAKE_FADE = 0.05
+TRAIL_SECONDS = 1.0
+TRAIL_LEVEL = 0.01
+
+# Frames read from the file per step
+READ_FRAMES = 4096
+
+def decode_blocks(wf: WavReader, target_rate: int, target_channels: int,
+                  read_frames: int = READ_FRAMES) -> Iterator[np.ndarray]:
+    """Reads the mapped file block by block, yielding float32 frames at the target rate and layout."""
+    fmt = wf.format
+    converter = StreamConverter(fmt.sample_rate, fmt.channels, fmt.sample_width,
+                                target_rate, target_channels, fmt.audio_format)
+    for block in wf.blocks(read_frames):
+        frames = converter.process(block)
+        if len(frames):
+            yield frames
+    tail = converter.flush()
+    if len(tail):
+        yield tail
+
+def rechunk(blocks: Iterable[np.ndarray], block_frames: int, channels: int) -> Iterator[np.ndarray]:
+    """Regroups frames into fixed-size buffers; the last one holds whatever is left."""
+    pending = np.zeros((0, channels), dtype=np.float32)
+    for block in blocks:
+        pending = np.concatenate((pending, block)) if len(pending) else block
+        while len(pending) >= block_frames:
+            yield pending[:block_frames]
+            pending = pending[block_frames:]
+    if len(pending):
+        yield pending
+
+def mix_pilot(blocks: Iterable[np.ndarray], rate: int) -> Iterator[np.ndarray]:
+    """Adds the pilot tone (phase-continuous across blocks), applies the message gain and clips, in place."""
+    return mix_blocks(blocks, WavetableOscillator(PILOT_FREQ, PILOT_LEVEL, rate), gain=MESSAGE_GAIN)
+
+def write_signal(stream, generator: SignalGenerator, seconds: float, block_frames: int = 1024):
+    """Plays seconds of a generator as int16, rendered one stream buffer at a time."""
+    frames = int(round(seconds * generator.sample_rate))
+    for block in render_blocks(generator, frames, block_frames):
+        stream.write(quantize(block, 2).tobytes())
+
+def playback_blocks(wf: WavReader, target_rate: int = 48000, target_channels: int = 2,
+                    block_frames: int = 1024) -> Iterator[bytes]:
+    """Read -> decode -> resample -> mix -> encode pipeline yielding int16 stream buffers.
+    
+    Only a few blocks are alive at once, so memory stays flat and the first
+    buffer is ready as soon as the first block is read, whatever the file length.
+    Output matches whole-file rendering in length; samples can differ by 1 LSB
+    because the pilot comes from a wavetable rather than a direct sin().
+    """
+    blocks = decode_blocks(wf, target_rate, target_channels)
+    blocks = mix_pilot(blocks, target_rate)
+    for block in rechunk(blocks, block_frames, target_channels):
+        yield quantize(block, 2).tobytes()
+
+def send_audio_to_teams_final(wav_file, device=None):
     """Send audio file to MS Teams with anti-gating measures"""
     
     if not os.path.exists(wav_file):
         print(f"Error: {wav_file} not found!")
         return
     
-    p = pyaudio.PyAudio()
+    # Shared device registry (AUDIO_BACKEND=null/memory/file for headless runs)
+    registry = get_registry()
+    p = registry.backend
     
     try:
-        # Open the wave file
-        wf = wave.open(wav_file, 'rb')
+        # Map the wave file (only the header is read here)
+        wf = WavReader(wav_file)
         
         # Get file properties
-        orig_rate = wf.getframerate()
-        orig_channels = wf.getnchannels()
-        sample_width = wf.getsampwidth()
-        total_frames = wf.getnframes()
+        orig_rate = wf.format.sample_rate
+        orig_channels = wf.format.channels
+        sample_width = wf.format.sample_width
+        total_frames = wf.frames
         duration = total_frames / orig_rate
         
         # Target format for VB-Cable
         target_rate = 48000
         target_channels = 2
         
-        # Get device info
-        device_info = p.get_device_info_by_index(device_index)
-        print(f"Sending audio to: {device_info['name']}")
+        # Requested device (index or name), or the virtual cable when none is given
+        device_info = registry.output_device(device)
+        device_index = device_info.index if device_info else None
+        print(f"Sending audio to: {device_info.name if device_info else 'default output device'}")
         print(f"File: {wav_file}")
         print(f"Duration: {duration:.2f} seconds")
         
-        # Read all audio data
-        print("Loading and processing audio...")
-        all_frames = wf.readframes(total_frames)
-        wf.close()
-        
-        # Convert to float32 for processing
-        if sample_width == 2:
-            audio_data = np.frombuffer(all_frames, dtype=np.int16).astype(np.float32) / 32768.0
-        else:
-            # Handle other bit depths
-            audio_data = np.frombuffer(all_frames, dtype=np.int16).astype(np.float32) / 32768.0
-        
-        # Convert mono to stereo if needed
-        if orig_channels == 1:
-            audio_data = np.repeat(audio_data, 2)
-            orig_channels = 2
-        
-        # Resample to 48kHz if needed
-        if orig_rate != target_rate:
-            print(f"Resampling from {orig_rate}Hz to {target_rate}Hz...")
-            new_length = int(len(audio_data) * target_rate / orig_rate / orig_channels)
-            
-            left = audio_data[0::2]
-            right = audio_data[1::2]
-            left_resampled = signal.resample(left, new_length)
-            right_resampled = signal.resample(right, new_length)
-            
-            audio_data = np.empty(new_length * 2, dtype=np.float32)
-            audio_data[0::2] = left_resampled
-            audio_data[1::2] = right_resampled
-            
-            duration = new_length / target_rate
-        
-        # IMPORTANT: Add a very low frequency pilot tone to prevent Teams from gating
-        print("Adding anti-gating carrier signal...")
-        t = np.linspace(0, duration, len(audio_data) // 2)
-        
-        # Create a 50Hz pilot tone at very low amplitude (barely audible)
-        pilot_tone = np.sin(2 * np.pi * 50 * t) * 0.005  # Very quiet
-        
-        # Add pilot tone to both channels
-        audio_data[0::2] += pilot_tone
-        audio_data[1::2] += pilot_tone
-        
-        # Also boost the overall level slightly
-        audio_data *= 1.2
-        
-        # Clip to prevent distortion
-        audio_data = np.clip(audio_data, -1.0, 1.0)
-        
-        # Convert back to int16
-        audio_data = (audio_data * 32767).astype(np.int16)
+        # Calibrated buffer size for this device (python calibration.py), else 1024
+        frames_per_buffer = buffer_size_for(device_info, target_rate, target_channels, default=1024)
         
         # Open stream with optimal settings
         print("Opening audio stream...")
         stream = p.open(
-            format=pyaudio.paInt16,
+            format=paInt16,
             channels=target_channels,
             rate=target_rate,
             output=True,
             output_device_index=device_index,
-            frames_per_buffer=1024
+            frames_per_buffer=frames_per_buffer
         )
         
         # Pre-roll: Send a tone burst to "wake up" Teams
         print("Sending wake-up signal...")
-        wake_duration = 0.5
-        wake_samples = int(target_rate * wake_duration)
-        t_wake = np.linspace(0, wake_duration, wake_samples)
-        
-        # Create a sweep from 200Hz to 800Hz
-        wake_freq = 200 + 600 * t_wake / wake_duration
-        wake_signal = np.sin(2 * np.pi * wake_freq * t_wake) * 0.1
-        
-        # Fade in/out
-        fade_len = int(0.05 * target_rate)
-        wake_signal[:fade_len] *= np.linspace(0, 1, fade_len)
-        wake_signal[-fade_len:] *= np.linspace(1, 0, fade_len)
-        
-        # Make stereo and convert to int16
-        wake_stereo = np.zeros(wake_samples * 2, dtype=np.int16)
-        wake_stereo[0::2] = (wake_signal * 32767).astype(np.int16)
-        wake_stereo[1::2] = (wake_signal * 32767).astype(np.int16)
-        
-        # Play wake-up signal
-        stream.write(wake_stereo.tobytes())
+        write_signal(stream, Sweep(WAKE_START_FREQ, WAKE_END_FREQ, WAKE_SECONDS, WAKE_LEVEL, WAKE_FADE,
+                                   target_rate, target_channels),
+                     WAKE_SECONDS, frames_per_buffer)
         
         # Short pause
         time.sleep(0.2)
         
-        # Play the main audio
+        # Play the main audio, processed block by block while it plays
+        if orig_rate != target_rate:
+            print(f"Resampling from {orig_rate}Hz to {target_rate}Hz on the fly...")
         print("Playing main audio...")
-        chunk_size = 1024 * target_channels
-        total_chunks = len(audio_data) // chunk_size
+        expected_frames = -(-total_frames * target_rate // orig_rate)
+        frames_played = 0
         
-        for i in range(0, len(audio_data), chunk_size):
-            chunk = audio_data[i:i+chunk_size]
-            
-            if len(chunk) < chunk_size:
-                chunk = np.pad(chunk, (0, chunk_size - len(chunk)), mode='constant')
-            
-            stream.write(chunk.tobytes())
+        for i, chunk in enumerate(playback_blocks(wf, target_rate, target_channels, frames_per_buffer)):
+            stream.write(chunk)
+            frames_played += len(chunk) // (2 * target_channels)
             
             # Progress
-            if (i // chunk_size) % 50 == 0:
-                progress = min(100, (i / len(audio_data)) * 100)
+            if i % 50 == 0:
+                progress = min(100, (frames_played / expected_frames) * 100)
                 print(f"\rProgress: {progress:.1f}%", end='', flush=True)
+        wf.close()
         
         print("\nFinalizing...")
         
         # Send trailing tone to ensure all audio is heard
-        trail_duration = 1.0
-        trail_samples = int(target_rate * trail_duration)
-        trail_tone = np.sin(2 * np.pi * 50 * np.linspace(0, trail_duration, trail_samples)) * 0.01
-        trail_stereo = np.zeros(trail_samples * 2, dtype=np.int16)
-        trail_stereo[0::2] = (trail_tone * 32767).astype(np.int16)
-        trail_stereo[1::2] = (trail_tone * 32767).astype(np.int16)
-        
-        stream.write(trail_stereo.tobytes())
+        write_signal(stream, WavetableOscillator(PILOT_FREQ, TRAIL_LEVEL, target_rate, target_channels),
+                     TRAIL_SECONDS, frames_per_buffer)
         
         # Cleanup
         stream.stop_stream()
@@ -165,10 +164,86 @@ def send_audio_to_teams_final(wav_file, device_index=18):
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        p.terminate()
+
+def benchmark_file_playback(durations=(60, 3600), legacy_max_seconds: float = 600) -> dict:
+    """Time to first buffer, total time and peak Python-heap memory: streaming vs whole-file rendering.
+    
+    Inputs are download.wav (or a tone) tiled to each duration as 24 kHz mono
+    16-bit files. The whole-file path is skipped above legacy_max_seconds,
+    where it would need several GB.
+    """
+    import tempfile
+    import tracemalloc
+    from wav_codec import WavFormat, wav_header
+    
+    def render_whole_file(wf: WavReader, target_rate: int = 48000, target_channels: int = 2) -> bytes:
+        """The original load-everything path (whole-file decode, resample and mix)."""
+        fmt = wf.format
+        audio_frames = decode_pcm(wf.view(), fmt.sample_width, fmt.channels, fmt.audio_format)
+        audio_data = convert_frames(audio_frames, fmt.sample_rate, target_rate, target_channels)
+        
+        t = np.arange(len(audio_data)) / target_rate
+        audio_data += (np.sin(2 * np.pi * PILOT_FREQ * t) * PILOT_LEVEL).astype(np.float32)[:, None]
+        audio_data *= MESSAGE_GAIN
+        return quantize(np.clip(audio_data, -1.0, 1.0), 2).tobytes()
+    
+    if os.path.exists("download.wav"):
+        with WavReader("download.wav") as source:
+            seed = decode_pcm(source.view(), source.format.sample_width, source.format.channels,
+                              source.format.audio_format)
+            seed = convert_frames(seed, source.format.sample_rate, 24000, 1)
+    else:
+        t = np.arange(24000 * 10) / 24000
+        seed = (np.sin(2 * np.pi * 220 * t) * 0.3).astype(np.float32)[:, None]
+    seed_bytes = quantize(seed, 2).tobytes()
+    
+    def measure(render) -> dict:
+        tracemalloc.start()
+        started = time.perf_counter()
+        first = None
+        for _ in render():
+            if first is None:
+                first = time.perf_counter() - started
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {'first_buffer': first, 'total': total, 'peak_bytes': peak}
+    
+    results = {}
+    workdir = tempfile.mkdtemp()
+    for seconds in durations:
+        path = os.path.join(workdir, f"input_{seconds}s.wav")
+        data_size = seconds * 24000 * 2
+        with open(path, "wb") as f:
+            f.write(wav_header(WavFormat(24000, 1, 2), data_size))
+            written = 0
+            while written < data_size:
+                piece = seed_bytes[:data_size - written]
+                f.write(piece)
+                written += len(piece)
+        
+        entry = {}
+        with WavReader(path) as wf:
+            entry['streaming'] = measure(lambda: playback_blocks(wf))
+            if seconds <= legacy_max_seconds:
+                entry['whole_file'] = measure(lambda: [render_whole_file(wf)])
+        os.remove(path)
+        results[seconds] = entry
+    os.rmdir(workdir)
+    return results
 
 if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        # Offline: no audio device, measures the processing pipeline only
+        print("File playback pipeline benchmark (1 minute and 1 hour inputs)...")
+        for seconds, entry in benchmark_file_playback().items():
+            for name, stats in entry.items():
+                print(f"{seconds // 60:>3} min {name:<10} first buffer {stats['first_buffer'] * 1000:8.1f} ms, "
+                      f"total {stats['total']:6.1f} s, peak memory {stats['peak_bytes'] / 1e6:7.1f} MB")
+            if 'whole_file' not in entry:
+                print(f"{seconds // 60:>3} min whole_file skipped (grows linearly; several GB at this length)")
+        sys.exit(0)
+    
     wav_file = sys.argv[1] if len(sys.argv) > 1 else "download.wav"
     
     print("=== MS Teams Audio Sender ===")
@@ -180,4 +255,5 @@ if __name__ == "__main__":
     
     time.sleep(3)
     
-    send_audio_to_teams_final(wav_file, device_index=18)
\ No newline at end of file
+    # Optional device index or name; defaults to the detected virtual cable
+    send_audio_to_teams_final(wav_file, parse_device_arg(sys.argv[2] if len(sys.argv) > 2 else None))
\ No newline at end of file
@@ -1,102 +1,73 @@
-import pyaudio
-import wave
 import numpy as np
 import sys
 import os
-from scipy import signal
+from pcm_format import decode_pcm, encode_pcm, remix_channels
+from resampler import resample
+from wav_codec import WavReader
+from audio_backend import format_for_wav
+from device_registry import get_registry, parse_device_arg
 
 def resample_audio(audio_data, orig_rate, target_rate, channels):
-    """Resample audio data to target sample rate"""
+    """Resample float32 audio frames to target sample rate"""
     if orig_rate == target_rate:
         return audio_data
     
-    # Calculate resampling ratio
-    ratio = target_rate / orig_rate
-    
-    # Calculate new length
-    new_length = int(len(audio_data) * ratio)
-    
-    # Resample
-    resampled = signal.resample(audio_data, new_length)
-    
-    return resampled.astype(audio_data.dtype)
+    # Polyphase resampling (exact rational ratio, no FFT over the whole clip)
+    return resample(audio_data.reshape(-1, channels), orig_rate, target_rate)
 
-def send_audio_to_teams(wav_file, device_index=18):
+def send_audio_to_teams(wav_file, device=None):
     """Send audio file to MS Teams through VB-Audio Virtual Cable with resampling"""
     
     if not os.path.exists(wav_file):
         print(f"Error: {wav_file} not found!")
         return
     
-    p = pyaudio.PyAudio()
+    # Shared device registry (AUDIO_BACKEND=null/memory/file for headless runs)
+    registry = get_registry()
+    p = registry.backend
     
     try:
-        # Open the wave file
-        wf = wave.open(wav_file, 'rb')
+        # Map the wave file (only the header is read here)
+        wf = WavReader(wav_file)
         
         # Get file properties
-        orig_rate = wf.getframerate()
-        orig_channels = wf.getnchannels()
-        sample_width = wf.getsampwidth()
+        orig_rate = wf.format.sample_rate
+        orig_channels = wf.format.channels
+        sample_width = wf.format.sample_width
         
         # Target format for VB-Cable
         target_rate = 48000
         target_channels = 2
         
-        # Get device info
-        device_info = p.get_device_info_by_index(device_index)
-        print(f"Sending audio to: {device_info['name']}")
+        # Requested device (index or name), or the virtual cable when none is given
+        device_info = registry.output_device(device)
+        device_index = device_info.index if device_info else None
+        print(f"Sending audio to: {device_info.name if device_info else 'default output device'}")
         print(f"File: {wav_file}")
         print(f"Original format: {orig_rate}Hz, {orig_channels} channels")
         print(f"Target format: {target_rate}Hz, {target_channels} channels")
         
-        # Read all audio data
-        frames = wf.readframes(wf.getnframes())
-        wf.close()
+        # Zero-copy view of the audio data
+        frames = wf.view()
         
-        # Convert to numpy array
-        if sample_width == 2:
-            dtype = np.int16
-            max_val = 32767
-        elif sample_width == 3:
-            dtype = np.int32
-            max_val = 8388607
-        elif sample_width == 4:
-            dtype = np.int32
-            max_val = 2147483647
-        else:
-            dtype = np.int16
-            max_val = 32767
-        
-        audio_data = np.frombuffer(frames, dtype=dtype)
+        # Decode to float32 frames
+        audio_frames = decode_pcm(frames, sample_width, orig_channels, wf.format.audio_format)
+        wf.close()
         
         # Handle channel conversion
-        if orig_channels == 1 and target_channels == 2:
-            # Mono to stereo: duplicate the channel
-            audio_data = np.repeat(audio_data, 2)
-        elif orig_channels == 2 and target_channels == 1:
-            # Stereo to mono: average the channels
-            audio_data = audio_data.reshape(-1, 2).mean(axis=1).astype(dtype)
+        audio_frames = remix_channels(audio_frames, target_channels)
         
         # Resample if needed
         if orig_rate != target_rate:
             print(f"Resampling from {orig_rate}Hz to {target_rate}Hz...")
-            # For mono/stereo audio
-            if target_channels == 2:
-                # Process stereo
-                left = audio_data[0::2]
-                right = audio_data[1::2]
-                left_resampled = resample_audio(left, orig_rate, target_rate, 1)
-                right_resampled = resample_audio(right, orig_rate, target_rate, 1)
-                audio_data = np.empty(len(left_resampled) * 2, dtype=dtype)
-                audio_data[0::2] = left_resampled
-                audio_data[1::2] = right_resampled
-            else:
-                audio_data = resample_audio(audio_data, orig_rate, target_rate, target_channels)
+            audio_frames = resample_audio(audio_frames, orig_rate, target_rate, target_channels)
+        
+        # Encode back to the original sample width
+        audio_data = encode_pcm(audio_frames, sample_width, wf.format.audio_format)
         
         # Open output stream
         stream = p.open(
-            format=p.get_format_from_width(sample_width),
+            format=format_for_wav(wf.format),
             channels=target_channels,
             rate=target_rate,
             output=True,
@@ -105,11 +76,11 @@ def send_audio_to_teams(wav_file, device_index=18):
         
         # Play the audio
         print("Playing audio to MS Teams...")
-        chunk_size = 4096
+        chunk_size = 4096 * sample_width
         
         for i in range(0, len(audio_data), chunk_size):
             chunk = audio_data[i:i+chunk_size]
-            stream.write(chunk.tobytes())
+            stream.write(chunk)
         
         # Cleanup
         stream.stop_stream()
@@ -120,13 +91,10 @@ def send_audio_to_teams(wav_file, device_index=18):
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        p.terminate()
 
 if __name__ == "__main__":
     # Default to download.wav if no argument provided
     wav_file = sys.argv[1] if len(sys.argv) > 1 else "download.wav"
     
-    # Try different device indices for CABLE Input
-    # Device 18 is CABLE Input at 48kHz with 2 channels
-    send_audio_to_teams(wav_file, device_index=18)
\ No newline at end of file
+    # Optional device index or name; defaults to the detected virtual cable
+    send_audio_to_teams(wav_file, parse_device_arg(sys.argv[2] if len(sys.argv) > 2 else None))
\ No newline at end of file
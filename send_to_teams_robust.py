@@ -1,103 +1,67 @@
-import pyaudio
-import wave
 import numpy as np
 import sys
 import os
 import time
-from scipy import signal
+from pcm_format import convert_frames, decode_pcm, quantize
+from wav_codec import WavReader
+from audio_backend import paInt16
+from calibration import buffer_size_for
+from device_registry import get_registry, parse_device_arg
 
-def send_audio_to_teams_robust(wav_file, device_index=18):
+def send_audio_to_teams_robust(wav_file, device=None):
     """Send audio file to MS Teams through VB-Audio Virtual Cable with robust playback"""
     
     if not os.path.exists(wav_file):
         print(f"Error: {wav_file} not found!")
         return
     
-    p = pyaudio.PyAudio()
+    # Shared device registry (AUDIO_BACKEND=null/memory/file for headless runs)
+    registry = get_registry()
+    p = registry.backend
     
     try:
-        # Open the wave file
-        wf = wave.open(wav_file, 'rb')
+        # Map the wave file (only the header is read here)
+        wf = WavReader(wav_file)
         
         # Get file properties
-        orig_rate = wf.getframerate()
-        orig_channels = wf.getnchannels()
-        sample_width = wf.getsampwidth()
-        total_frames = wf.getnframes()
+        orig_rate = wf.format.sample_rate
+        orig_channels = wf.format.channels
+        sample_width = wf.format.sample_width
+        total_frames = wf.frames
         
         # Target format for VB-Cable
         target_rate = 48000
         target_channels = 2
         
-        # Get device info
-        device_info = p.get_device_info_by_index(device_index)
-        print(f"Sending audio to: {device_info['name']}")
+        # Requested device (index or name), or the virtual cable when none is given
+        device_info = registry.output_device(device)
+        device_index = device_info.index if device_info else None
+        print(f"Sending audio to: {device_info.name if device_info else 'default output device'}")
         print(f"File: {wav_file}")
         print(f"Original format: {orig_rate}Hz, {orig_channels} channels, {sample_width*8}-bit")
         print(f"Target format: {target_rate}Hz, {target_channels} channels")
         print(f"Duration: {total_frames/orig_rate:.2f} seconds")
         
-        # Read all audio data at once
+        # Zero-copy view of the audio data
         print("Loading audio file...")
-        all_frames = wf.readframes(total_frames)
+        all_frames = wf.view()
+        
+        # Decode to float32 frames (vectorized for every sample width)
+        audio_frames = decode_pcm(all_frames, sample_width, orig_channels, wf.format.audio_format)
         wf.close()
         
-        # Convert to numpy array
-        if sample_width == 1:
-            dtype = np.uint8
-            audio_data = np.frombuffer(all_frames, dtype=dtype).astype(np.float32)
-            audio_data = (audio_data - 128) / 128.0  # Convert to -1 to 1 range
-        elif sample_width == 2:
-            dtype = np.int16
-            audio_data = np.frombuffer(all_frames, dtype=dtype).astype(np.float32)
-            audio_data = audio_data / 32768.0  # Convert to -1 to 1 range
-        elif sample_width == 3:
-            # Handle 24-bit audio
-            audio_data = np.zeros(total_frames * orig_channels, dtype=np.float32)
-            for i in range(0, len(all_frames), 3):
-                if i + 2 < len(all_frames):
-                    sample = int.from_bytes(all_frames[i:i+3], byteorder='little', signed=True)
-                    audio_data[i//3] = sample / 8388608.0  # Convert to -1 to 1 range
-        else:
-            dtype = np.int32
-            audio_data = np.frombuffer(all_frames, dtype=dtype).astype(np.float32)
-            audio_data = audio_data / 2147483648.0  # Convert to -1 to 1 range
-        
-        # Handle channel conversion
-        if orig_channels == 1 and target_channels == 2:
-            # Mono to stereo: duplicate the channel
-            print("Converting mono to stereo...")
-            audio_data = np.repeat(audio_data, 2)
-            orig_channels = 2
-        elif orig_channels == 2 and target_channels == 1:
-            # Stereo to mono: average the channels
-            print("Converting stereo to mono...")
-            audio_data = audio_data.reshape(-1, 2).mean(axis=1)
-            orig_channels = 1
-        
-        # Resample if needed
+        # Handle channel conversion and resampling
+        if orig_channels != target_channels:
+            print(f"Converting {orig_channels} channel(s) to {target_channels}...")
         if orig_rate != target_rate:
             print(f"Resampling from {orig_rate}Hz to {target_rate}Hz...")
-            new_length = int(len(audio_data) * target_rate / orig_rate / orig_channels)
-            
-            if orig_channels == 2:
-                # Resample stereo
-                left = audio_data[0::2]
-                right = audio_data[1::2]
-                left_resampled = signal.resample(left, new_length)
-                right_resampled = signal.resample(right, new_length)
-                audio_data = np.empty(new_length * 2, dtype=np.float32)
-                audio_data[0::2] = left_resampled
-                audio_data[1::2] = right_resampled
-            else:
-                audio_data = signal.resample(audio_data, new_length)
+        audio_frames = convert_frames(audio_frames, orig_rate, target_rate, target_channels)
         
         # Convert back to int16 for playback
-        audio_data = (audio_data * 32767).astype(np.int16)
+        audio_data = quantize(audio_frames, 2).reshape(-1)
         
-        # CRITICAL: Use optimal buffer size for VB-Cable
-        # According to the manual, VB-Cable works best with specific buffer sizes
-        frames_per_buffer = 1024  # This is optimal for 48kHz according to VB-Cable docs
+        # Calibrated buffer size for this device (python calibration.py), else 1024
+        frames_per_buffer = buffer_size_for(device_info, target_rate, target_channels, default=1024)
         
         print("Opening audio stream...")
         # Open stream with callback for more reliable playback
@@ -107,7 +71,7 @@ def send_audio_to_teams_robust(wav_file, device_index=18):
         while not stream_opened and retry_count < 3:
             try:
                 stream = p.open(
-                    format=pyaudio.paInt16,  # Always use 16-bit for compatibility
+                    format=paInt16,  # Always use 16-bit for compatibility
                     channels=target_channels,
                     rate=target_rate,
                     output=True,
@@ -173,12 +137,10 @@ def send_audio_to_teams_robust(wav_file, device_index=18):
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        p.terminate()
 
 if __name__ == "__main__":
     # Default to download.wav if no argument provided
     wav_file = sys.argv[1] if len(sys.argv) > 1 else "download.wav"
     
-    # Use device 18: CABLE Input (VB-Audio Virtual Cable) at 48kHz
-    send_audio_to_teams_robust(wav_file, device_index=18)
\ No newline at end of file
+    # Optional device index or name; defaults to the detected virtual cable
+    send_audio_to_teams_robust(wav_file, parse_device_arg(sys.argv[2] if len(sys.argv) > 2 else None))
\ No newline at end of file
@@ -0,0 +1,294 @@
+import time
+import numpy as np
+from typing import Iterable, Iterator, Optional
+
+# One sine cycle plus a guard sample, so interpolation at the last index needs no wrap
+WAVETABLE_SIZE = 4096
+SINE_TABLE = np.sin(2 * np.pi * np.arange(WAVETABLE_SIZE + 1) / WAVETABLE_SIZE).astype(np.float32)
+SINE_SLOPE = np.diff(SINE_TABLE)
+
+# Comfort noise repeats after this many frames (about 2.7 s at 48 kHz)
+NOISE_TABLE_SIZE = 1 << 17
+
+# Longest exact loop precomputed for an oscillator whose period is a whole number of frames
+MAX_LOOP_FRAMES = 1 << 16
+
+_noise_table: Optional[np.ndarray] = None
+
+
+def noise_table() -> np.ndarray:
+    """Unit-RMS, gently low-passed noise, computed once per process."""
+    global _noise_table
+    if _noise_table is None:
+        # Shaped in the frequency domain (first-order roll-off above ~2.4 kHz at 48 kHz),
+        # so the table is periodic and loops without a click
+        spectrum = np.fft.rfft(np.random.default_rng(0).standard_normal(NOISE_TABLE_SIZE))
+        spectrum /= np.sqrt(1.0 + np.square(np.arange(len(spectrum)) / (NOISE_TABLE_SIZE * 0.05)))
+        shaped = np.fft.irfft(spectrum, NOISE_TABLE_SIZE)
+        shaped -= shaped.mean()
+        _noise_table = (shaped / np.sqrt(np.mean(np.square(shaped)))).astype(np.float32)
+    return _noise_table
+
+
+def periodic_cycle(frequency: float, sample_rate: int) -> Optional[np.ndarray]:
+    """One exact period of a unit sine when it repeats after a whole number of frames, else None.
+
+    50 Hz repeats every 960 frames at 48 kHz and every 882 at 44.1 kHz.
+    """
+    if frequency <= 0:
+        return None
+    for cycles in range(1, 65):
+        frames = cycles * sample_rate / frequency
+        if frames > MAX_LOOP_FRAMES:
+            return None
+        if abs(frames - round(frames)) < 1e-9:
+            n = np.arange(int(round(frames)))
+            return np.sin(2 * np.pi * frequency * n / sample_rate).astype(np.float32)
+    return None
+
+
+def read_cyclic(table: np.ndarray, start: int, out: np.ndarray):
+    """Fills out from table starting at index start, wrapping around as often as needed."""
+    filled = 0
+    while filled < len(out):
+        offset = (start + filled) % len(table)
+        count = min(len(out) - filled, len(table) - offset)
+        out[filled:filled + count] = table[offset:offset + count]
+        filled += count
+
+
+class SignalGenerator:
+    """Block-wise float32 signal source with state carried across blocks.
+
+    render() returns frames from a buffer reused on the next call (copy them
+    to keep them); mix_into() adds the next frames to a caller's block in
+    place. Either way the working buffers are allocated once and only grow,
+    so steady-state blocks allocate nothing.
+    """
+
+    def __init__(self, level: float = 1.0, sample_rate: int = 48000, channels: int = 2):
+        self.level = level
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.position = 0
+        self._mono = np.zeros(0, dtype=np.float32)
+        self._out = np.zeros((0, channels), dtype=np.float32)
+
+    def _reserve(self, frames: int):
+        """Grows the working buffers to hold frames."""
+        if len(self._mono) < frames:
+            self._mono = np.empty(frames, dtype=np.float32)
+            self._out = np.empty((frames, self.channels), dtype=np.float32)
+
+    def _generate(self, out: np.ndarray):
+        """Fills out (mono float32) with the next len(out) samples, starting at self.position."""
+        raise NotImplementedError
+
+    def _next(self, frames: int) -> np.ndarray:
+        self._reserve(frames)
+        mono = self._mono[:frames]
+        self._generate(mono)
+        self.position += frames
+        return mono
+
+    def render(self, frames: int) -> np.ndarray:
+        """The next frames as (frames x channels) float32, valid until the next call."""
+        mono = self._next(frames)
+        out = self._out[:frames]
+        out[:] = mono[:, None]
+        return out
+
+    def mix_into(self, block: np.ndarray) -> np.ndarray:
+        """Adds the next len(block) frames to block (frames x channels float32) in place."""
+        block += self._next(len(block))[:, None]
+        return block
+
+    def reset(self):
+        """Restarts the signal from its beginning."""
+        self.position = 0
+
+
+class WavetableGenerator(SignalGenerator):
+    """Reads the shared sine wavetable at arbitrary phases with linear interpolation."""
+
+    def _reserve(self, frames: int):
+        if len(self._mono) < frames:
+            self._ramp = np.arange(frames, dtype=np.float64)
+            self._phase = np.empty(frames, dtype=np.float64)
+            self._index = np.empty(frames, dtype=np.intp)
+            self._slope = np.empty(frames, dtype=np.float32)
+        super()._reserve(frames)
+
+    def _lookup(self, phase: np.ndarray, out: np.ndarray):
+        """Writes level * sin at phase (in table units, already wrapped to [0, WAVETABLE_SIZE)) into out."""
+        index = self._index[:len(out)]
+        slope = self._slope[:len(out)]
+        np.copyto(index, phase, casting='unsafe')
+        phase -= index
+        np.take(SINE_TABLE, index, out=out)
+        np.take(SINE_SLOPE, index, out=slope)
+        np.multiply(slope, phase, out=slope, casting='unsafe')
+        out += slope
+        out *= self.level
+
+
+class WavetableOscillator(WavetableGenerator):
+    """Constant-frequency sine (e.g. the anti-gating pilot tone), phase-continuous across blocks.
+
+    Frequencies with a whole-frame period are copied from an exact
+    precomputed loop; any other frequency interpolates the sine table.
+    """
+
+    def __init__(self, frequency: float, level: float = 1.0, sample_rate: int = 48000, channels: int = 2):
+        super().__init__(level, sample_rate, channels)
+        self.frequency = frequency
+        self._increment = frequency * WAVETABLE_SIZE / sample_rate
+        self._start_phase = 0.0
+        self._loop = periodic_cycle(frequency, sample_rate)
+
+    def _generate(self, out: np.ndarray):
+        if self._loop is not None:
+            read_cyclic(self._loop, self.position, out)
+            out *= self.level
+            return
+
+        frames = len(out)
+        phase = self._phase[:frames]
+        np.multiply(self._ramp[:frames], self._increment, out=phase)
+        phase += self._start_phase
+        np.mod(phase, WAVETABLE_SIZE, out=phase)
+        self._start_phase = (self._start_phase + frames * self._increment) % WAVETABLE_SIZE
+        self._lookup(phase, out)
+
+    def reset(self):
+        super().reset()
+        self._start_phase = 0.0
+
+
+class Sweep(WavetableGenerator):
+    """Linear chirp from start to end frequency with linear fades (e.g. a wake-up burst); silent once done."""
+
+    def __init__(self, start_frequency: float, end_frequency: float, duration: float,
+                 level: float = 1.0, fade: float = 0.05, sample_rate: int = 48000, channels: int = 2):
+        super().__init__(level, sample_rate, channels)
+        self.start_frequency = start_frequency
+        self.end_frequency = end_frequency
+        self.duration = duration
+        self.fade = fade
+        self.frames = int(round(duration * sample_rate))
+
+    @property
+    def done(self) -> bool:
+        return self.position >= self.frames
+
+    def _reserve(self, frames: int):
+        if len(self._mono) < frames:
+            self._envelope = np.empty(frames, dtype=np.float64)
+        super()._reserve(frames)
+
+    def _generate(self, out: np.ndarray):
+        frames = len(out)
+        if self.done:
+            out[:] = 0.0
+            return
+
+        # Seconds since the start of the sweep for every sample of the block
+        t = self._phase[:frames]
+        np.add(self._ramp[:frames], self.position, out=t)
+        t /= self.sample_rate
+
+        # Fade in and out: min(t, duration - t) / fade, clipped to [0, 1]
+        envelope = self._envelope[:frames]
+        np.subtract(self.duration, t, out=envelope)
+        np.minimum(envelope, t, out=envelope)
+        if self.fade > 0:
+            envelope /= self.fade
+        np.clip(envelope, 0.0, 1.0, out=envelope)
+
+        # Phase of a linear chirp: f0 t + (f1 - f0) t^2 / (2 duration), in table units
+        rate = (self.end_frequency - self.start_frequency) / (2 * self.duration)
+        phase = t
+        phase *= rate * phase + self.start_frequency
+        phase *= WAVETABLE_SIZE
+        np.mod(phase, WAVETABLE_SIZE, out=phase)
+        self._lookup(phase, out)
+        np.multiply(out, envelope, out=out, casting='unsafe')
+
+
+class ComfortNoise(SignalGenerator):
+    """Low-level noise read cyclically from a precomputed table; level is the RMS amplitude."""
+
+    def __init__(self, level: float = 0.001, sample_rate: int = 48000, channels: int = 2):
+        super().__init__(level, sample_rate, channels)
+        self.table = noise_table()
+
+    def _generate(self, out: np.ndarray):
+        read_cyclic(self.table, self.position, out)
+        out *= self.level
+
+
+def mix_blocks(blocks: Iterable[np.ndarray], *generators: SignalGenerator,
+               gain: float = 1.0) -> Iterator[np.ndarray]:
+    """Adds the generators to each (frames x channels float32) block in place, then applies gain and clips."""
+    for block in blocks:
+        for generator in generators:
+            generator.mix_into(block)
+        if gain != 1.0:
+            block *= gain
+        np.clip(block, -1.0, 1.0, out=block)
+        yield block
+
+
+def render_blocks(generator: SignalGenerator, frames: int, block_frames: int = 1024) -> Iterator[np.ndarray]:
+    """Renders frames of the generator in block_frames pieces (the last one shorter), reusing one buffer."""
+    for start in range(0, frames, block_frames):
+        yield generator.render(min(block_frames, frames - start))
+
+
+if __name__ == "__main__":
+    # Self-check: block-wise rendering matches one-shot rendering (phase continuity) and exact sines
+    rng = np.random.default_rng(0)
+    rate = 48000
+    sizes = rng.integers(1, 3000, 200)
+
+    for name, make in (("pilot", lambda: WavetableOscillator(50.0, 0.005, rate)),
+                       ("tone", lambda: WavetableOscillator(57.3, 0.005, rate)),
+                       ("sweep", lambda: Sweep(200.0, 800.0, 0.5, 0.1, sample_rate=rate)),
+                       ("noise", lambda: ComfortNoise(0.001, rate))):
+        whole = make().render(int(sizes.sum())).copy()
+        generator = make()
+        pieces = np.concatenate([generator.render(int(n)).copy() for n in sizes])
+        print(f"{name:<6} block-wise == one-shot: max difference {np.max(np.abs(whole - pieces)):.2e}")
+
+    t = np.arange(rate * 10) / rate
+    for name, frequency in (("pilot", 50.0), ("tone", 57.3)):
+        exact = np.sin(2 * np.pi * frequency * t) * 0.005
+        tone = WavetableOscillator(frequency, 0.005, rate).render(len(t))[:, 0]
+        print(f"{name:<6} vs np.sin over 10 s: max error {np.max(np.abs(tone - exact)):.2e} "
+              f"(int16 step {1 / 32768:.2e})")
+
+    # Cost for a 10-minute message: the old whole-length float64 pilot vs mixing 1024-frame blocks
+    import tracemalloc
+    seconds, block_frames = 600, 1024
+    blocks = seconds * rate // block_frames
+    message = np.zeros((block_frames, 2), dtype=np.float32)
+
+    def legacy_pilot():
+        t = np.linspace(0, seconds, seconds * rate)
+        return np.sin(2 * np.pi * 50.0 * t) * 0.005
+
+    def block_pilot():
+        pilot = WavetableOscillator(50.0, 0.005, rate)
+        for _ in range(blocks):
+            pilot.mix_into(message)
+
+    for name, func in (("whole-length float64", legacy_pilot), (f"{block_frames}-frame blocks", block_pilot)):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"10 min pilot, {name:<20}: {elapsed * 1000:7.1f} ms ({elapsed / blocks * 1e6:5.1f} us per "
+              f"{block_frames} frames), peak memory {peak / 1e6:7.3f} MB")
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One in-flight call shared by its leader and any waiters."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait and receive the very same result object (or exception).
+    Nothing is remembered once the call completes; that is the cache's job.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.deduplicated = 0
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        # Keyed by (event loop, key): a task can only be awaited on the loop that runs it
+        self._inflight_async: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Runs fn for key, or waits for the identical call already running."""
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            if call is not None:
+                self.deduplicated += 1
+                leader = False
+            else:
+                call = self._inflight[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Asyncio variant of do(); a cancelled waiter does not cancel the shared call.
+
+        Calls are shared between coroutines on the same event loop only.
+        """
+        key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            self.calls += 1
+            task = self._inflight_async.get(key)
+            if task is not None:
+                self.deduplicated += 1
+            else:
+                task = asyncio.ensure_future(factory())
+                self._inflight_async[key] = task
+                task.add_done_callback(lambda _: self._forget_async(key, task))
+
+        return await asyncio.shield(task)
+
+    def _forget_async(self, key: Tuple[asyncio.AbstractEventLoop, Hashable], task: asyncio.Future):
+        with self._lock:
+            if self._inflight_async.get(key) is task:
+                del self._inflight_async[key]
+
+    def stats(self) -> dict:
+        """Returns call and deduplication counters."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'deduplicated': self.deduplicated,
+                'in_flight': len(self._inflight) + len(self._inflight_async),
+            }
+
+
+if __name__ == "__main__":
+    # Self-check: concurrent identical requests through GeminiTTS share one upstream call
+    from concurrent.futures import ThreadPoolExecutor
+    from fake_gemini import FakeGeminiClient
+    from gemini_tts import GeminiTTS
+
+    fake = FakeGeminiClient(first_byte_latency=0.2, chunk_interval=0.01)
+    tts = GeminiTTS(client=fake)
+    text = "Coalesced request check."
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: tts.generate_speech(text), range(8)))
+
+    print(f"Threads: 8 callers -> {fake.stats()['requests']} upstream request(s), "
+          f"{tts.inflight.stats()['deduplicated']} deduplicated")
+    print(f"All callers share one buffer: {all(r is results[0] for r in results)}")
+
+    async def burst():
+        return await asyncio.gather(*(tts.generate_speech_async(text) for _ in range(8)))
+
+    results = asyncio.run(burst())
+    print(f"Asyncio: {fake.stats()['requests']} upstream requests in total, "
+          f"{tts.inflight.stats()['deduplicated']} deduplicated")
+    print(f"All callers share one buffer: {all(r is results[0] for r in results)}")
+
+    # Two event loops on separate threads asking for the same key at once
+    flight = SingleFlight()
+
+    async def slow_value():
+        await asyncio.sleep(0.2)
+        return "value"
+
+    def run_loop(_):
+        return asyncio.run(flight.do_async("same key", slow_value))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        values = list(pool.map(run_loop, range(2)))
+    print(f"Separate event loops each complete: {values == ['value', 'value']}")
\ No newline at end of file
@@ -0,0 +1,129 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class _Job:
+    """One speculative render and its outcome."""
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SpeculativeSynthesizer:
+    """Debounced background pre-rendering of the message the operator is still typing.
+
+    schedule() is called on every input change; once the key has been stable
+    for `delay` seconds a worker renders it, superseding any older job.
+    take() then returns the speculative result when the key still matches.
+    """
+
+    def __init__(self, render: Callable[[Hashable], Any], delay: float = 0.6):
+        self.render = render
+        self.delay = delay
+
+        self.speculations = 0
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.saved_seconds = 0.0
+
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._job: Optional[_Job] = None
+
+    def schedule(self, key: Hashable):
+        """Restarts the debounce timer for key (no-op if key is already rendered or rendering)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._job is not None and self._job.key == key and self._job.error is None:
+                return
+
+            self._timer = threading.Timer(self.delay, self._start, args=(key,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        """Drops any pending or in-flight speculation."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._job is not None and not self._job.done.is_set():
+                self.discarded += 1
+            self._job = None
+
+    def _start(self, key: Hashable):
+        job = _Job(key)
+        with self._lock:
+            # An in-flight request cannot be aborted; its result is simply dropped
+            if self._job is not None and not self._job.done.is_set():
+                self.discarded += 1
+            self._job = job
+            self._timer = None
+            self.speculations += 1
+
+        worker = threading.Thread(target=self._run, args=(job,), daemon=True)
+        worker.start()
+
+    def _run(self, job: _Job):
+        try:
+            job.result = self.render(job.key)
+        except Exception as e:
+            job.error = e
+            print(f"Speculative synthesis failed: {e}")
+        finally:
+            job.finished = time.perf_counter()
+            job.done.set()
+
+    def take(self, key: Hashable, timeout: Optional[float] = None) -> Optional[Any]:
+        """Returns the speculative result for key, waiting if it is still rendering; None on a miss.
+
+        A render still in flight after `timeout` seconds (0 = do not wait)
+        counts as a miss so the caller can fall back to normal generation;
+        it keeps running and a later take() can still use it.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            job = self._job if self._job is not None and self._job.key == key else None
+
+        if job is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        requested = time.perf_counter()
+        finished = job.done.wait(timeout)
+
+        with self._lock:
+            if not finished or job.error is not None:
+                self.misses += 1
+                return None
+
+            # Render time that elapsed before the operator clicked
+            self.saved_seconds += min(requested, job.finished) - job.started
+            self.hits += 1
+            return job.result
+
+    def stats(self) -> dict:
+        """Returns how often speculation hit and how much latency it saved."""
+        with self._lock:
+            takes = self.hits + self.misses
+            return {
+                'speculations': self.speculations,
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+                'hit_rate': self.hits / takes if takes else 0.0,
+                'saved_seconds': self.saved_seconds,
+            }
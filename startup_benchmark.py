@@ -0,0 +1,87 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+# Modules whose import cost matters for GUI startup
+IMPORT_TARGETS = [
+    "tkinter",
+    "numpy",
+    "google.genai",
+    "pyaudio",
+    "gemini_tts",
+    "audio_router",
+    "ai_audio_gui",
+]
+
+# What the GUI imported before the backend moved off the startup path
+EAGER_IMPORTS = ["tkinter", "ai_audio_gui", "gemini_tts", "google.genai", "audio_router",
+                 "segmented_tts", "tts_cache", "streaming_pipeline"]
+
+
+def measure_import(modules: List[str], runs: int = 5) -> Optional[float]:
+    """Returns the median cold import time of modules in a fresh interpreter (None if unavailable)."""
+    code = (
+        "import time; started = time.perf_counter()\n"
+        + "".join(f"import {name}\n" for name in modules)
+        + "print(time.perf_counter() - started)"
+    )
+
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+
+    return statistics.median(timings)
+
+
+def measure_gui_startup(timeout: float = 60.0) -> Optional[dict]:
+    """Launches the GUI in probe mode and returns its window/backend ready times (None without a display)."""
+    env = dict(os.environ)
+    env["AI_AUDIO_STARTUP_PROBE"] = repr(time.time())
+
+    try:
+        result = subprocess.run([sys.executable, "ai_audio_gui.py"], capture_output=True, text=True,
+                                env=env, timeout=timeout,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.TimeoutExpired:
+        return None
+
+    milestones = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] in ("window_ready", "backend_ready", "backend_failed"):
+            milestones[parts[0]] = float(parts[1])
+
+    return milestones or None
+
+
+if __name__ == "__main__":
+    print("=== Import Cost (median cold import, fresh interpreter) ===")
+    for name in IMPORT_TARGETS:
+        elapsed = measure_import([name])
+        label = "unavailable" if elapsed is None else f"{elapsed * 1000:8.1f} ms"
+        print(f"{name:<16} {label}")
+
+    eager = measure_import(EAGER_IMPORTS)
+    window_path = measure_import(["tkinter", "ai_audio_gui"])
+    print()
+    if eager is not None:
+        print(f"Eager backend imports: {eager * 1000:8.1f} ms")
+    else:
+        print("Eager backend imports: unavailable (missing google-genai or pyaudio)")
+    if window_path is not None:
+        print(f"Window-first imports:  {window_path * 1000:8.1f} ms")
+
+    print("\n=== GUI Startup ===")
+    milestones = measure_gui_startup()
+    if milestones is None:
+        print("GUI probe did not report (no display available?)")
+    else:
+        for milestone, elapsed in milestones.items():
+            print(f"{milestone:<16} {elapsed * 1000:8.1f} ms after launch")
\ No newline at end of file
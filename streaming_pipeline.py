@@ -0,0 +1,115 @@
+import time
+import numpy as np
+from typing import Callable, Optional
+from metrics import current_trace, use_trace
+
+# Time-to-first-audio budget for the streaming path (seconds)
+TTFA_TARGET = 1.0
+
+# Longest wait after the last chunk for the router to report the first playout
+PLAYOUT_WAIT = 5.0
+
+
+class StreamingTTSPipeline:
+    """Pushes Gemini audio into an AudioRouter chunk by chunk while synthesis continues."""
+
+    def __init__(self, tts, router):
+        self.tts = tts
+        self.router = router
+        self.last_metrics = {}
+
+    def run(self, text: str, should_continue: Optional[Callable[[], bool]] = None) -> dict:
+        """Streams one message to the router and returns its latency metrics.
+
+        time_to_first_audio is when the router handed the first frames to the
+        device (its "first_write" mark), so it includes the buffering and
+        jitter prebuffer; time_to_first_enqueue is when they entered the buffer.
+        """
+        start = time.perf_counter()
+        time_to_first_enqueue = None
+        frames_sent = 0
+        chunks = 0
+
+        # The router marks playout on the trace current while audio is enqueued
+        trace = current_trace()
+        owned = trace is None
+        if owned:
+            trace = self.router.metrics.trace("stream")
+
+        with use_trace(trace):
+            for frames in self.tts.generate_frames_stream(text,
+                                                          sample_rate=self.router.sample_rate,
+                                                          channels=self.router.channels):
+                if should_continue is not None and not should_continue():
+                    break
+
+                self.router.send_frames(frames)
+
+                if time_to_first_enqueue is None:
+                    time_to_first_enqueue = time.perf_counter() - start
+                frames_sent += len(frames)
+                chunks += 1
+
+        elapsed = time.perf_counter() - start
+        first_write = self._wait_for_playout(trace) if frames_sent else None
+        if owned:
+            trace.finish()
+
+        self.last_metrics = {
+            'time_to_first_audio': None if first_write is None else trace.start + first_write - start,
+            'time_to_first_enqueue': time_to_first_enqueue,
+            'synthesis_time': elapsed,
+            'audio_duration': frames_sent / self.router.sample_rate,
+            'chunks': chunks,
+        }
+
+        return self.last_metrics
+
+    def _wait_for_playout(self, trace) -> Optional[float]:
+        """Waits for the router's first_write mark (trace offset); None if it never came."""
+        deadline = time.perf_counter() + PLAYOUT_WAIT
+        while True:
+            first_write = trace.since("first_write")
+            if first_write is not None or not self.router.is_running or time.perf_counter() >= deadline:
+                return first_write
+            time.sleep(self.router.chunk_size / self.router.sample_rate / 4)
+
+
+if __name__ == "__main__":
+    # Test harness: a fake chunked Gemini stream feeding a real AudioRouter on the memory sink
+    from audio_backend import RecordingBackend
+    from audio_router import AudioRouter
+    from fake_gemini import FakeGeminiClient
+    from gemini_tts import GeminiTTS
+
+    # 4 s of audio in 0.25 s chunks, first byte after 0.4 s
+    fake = FakeGeminiClient(first_byte_latency=0.4, chunk_interval=0.05, chunk_seconds=0.25,
+                            seconds_per_char=4.0 / len("Streaming harness message."))
+    tts = GeminiTTS(client=fake)
+    # Import the SDK config types up front so TTFA measures the pipeline, not the import
+    tts._speech_config()
+    backend = RecordingBackend()
+    # Blocking mode on a non-realtime sink records exactly the frames sent, without callback padding
+    router = AudioRouter(backend=backend, mode="blocking")
+    router.start()
+
+    metrics = StreamingTTSPipeline(tts, router).run("Streaming harness message.")
+    router.drain()
+    router.stop()
+    played = np.frombuffer(backend.recorded(), dtype=np.float32).reshape(-1, router.channels)
+
+    # Same stream through a real-time callback router: playout includes the jitter prebuffer
+    realtime_router = AudioRouter(backend=RecordingBackend(realtime=True))
+    realtime_router.start()
+    realtime = StreamingTTSPipeline(tts, realtime_router).run("Streaming harness message.")
+    realtime_router.drain()
+    realtime_router.stop()
+
+    ttfa = realtime['time_to_first_audio']
+    print(f"Time to first audio: {'never' if ttfa is None else f'{ttfa * 1000:.0f} ms'} "
+          f"(target {TTFA_TARGET * 1000:.0f} ms; enqueued after "
+          f"{realtime['time_to_first_enqueue'] * 1000:.0f} ms)")
+    print(f"Synthesis time:      {metrics['synthesis_time']:.2f} s for "
+          f"{metrics['audio_duration']:.2f} s of audio in {metrics['chunks']} chunks")
+    print(f"Router played:       {len(played)} frames, peak {np.max(np.abs(played)):.3f}")
+    print("PASS" if ttfa is not None and ttfa < TTFA_TARGET and len(played) == 4 * 48000 else "FAIL")
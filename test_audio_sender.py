@@ -1,26 +1,27 @@
-import pyaudio
-import wave
 import threading
 import time
 import numpy as np
 from typing import Optional
+from wav_codec import WavReader
+from audio_backend import AudioBackend, format_for_wav
+from device_registry import DeviceRegistry, get_registry
 
 class AudioSender:
     """Sends audio files through a specified audio output device."""
     
-    def __init__(self, device_name: Optional[str] = None):
-        self.pyaudio = pyaudio.PyAudio()
+    def __init__(self, device_name: Optional[str] = None,
+                 backend: Optional[AudioBackend] = None):
+        # Shared registry backend, chosen by AUDIO_BACKEND unless given (pyaudio, null, memory, file)
+        self.registry = DeviceRegistry(backend) if backend else get_registry()
+        self.backend = self.registry.backend
         self.device_index = self._find_device(device_name) if device_name else None
         self.is_playing = False
         self.playback_thread = None
     
     def _find_device(self, device_name: str) -> Optional[int]:
         """Finds the device index by name."""
-        for i in range(self.pyaudio.get_device_count()):
-            info = self.pyaudio.get_device_info_by_index(i)
-            if device_name.lower() in info['name'].lower():
-                return i
-        return None
+        device = self.registry.find(device_name, output_only=False)
+        return device.index if device else None
     
     def play_audio_file(self, filename: str, device_index: Optional[int] = None):
         """Plays an audio file through the specified device."""
@@ -28,28 +29,28 @@ class AudioSender:
             device_index = self.device_index
         
         try:
-            # Open the wave file
-            wf = wave.open(filename, 'rb')
+            # Map the wave file
+            wf = WavReader(filename)
             
             # Open output stream
-            stream = self.pyaudio.open(
-                format=self.pyaudio.get_format_from_width(wf.getsampwidth()),
-                channels=wf.getnchannels(),
-                rate=wf.getframerate(),
+            stream = self.backend.open(
+                format=format_for_wav(wf.format),
+                channels=wf.format.channels,
+                rate=wf.format.sample_rate,
                 output=True,
                 output_device_index=device_index
             )
             
-            # Read and play audio data
+            # Play audio data straight from the mapping
             chunk_size = 1024
-            data = wf.readframes(chunk_size)
             
             self.is_playing = True
             print(f"Playing {filename}...")
             
-            while data and self.is_playing:
+            for data in wf.blocks(chunk_size):
+                if not self.is_playing:
+                    break
                 stream.write(data)
-                data = wf.readframes(chunk_size)
             
             # Cleanup
             stream.stop_stream()
@@ -80,23 +81,15 @@ class AudioSender:
         print("\nAvailable Output Devices:")
         print("-" * 40)
         
-        for i in range(self.pyaudio.get_device_count()):
-            info = self.pyaudio.get_device_info_by_index(i)
-            if info['maxOutputChannels'] > 0:
-                print(f"{i}: {info['name']} ({info['maxOutputChannels']} channels)")
+        devices = self.registry.devices(output_only=True)
+        for device in devices:
+            print(f"{device.index}: {device.name} ({device.max_output_channels} channels)")
         
         # Highlight virtual devices
         print("\nRecommended Virtual Devices:")
-        virtual_keywords = ['cable', 'virtual', 'blackhole']
-        
-        for i in range(self.pyaudio.get_device_count()):
-            info = self.pyaudio.get_device_info_by_index(i)
-            if any(kw in info['name'].lower() for kw in virtual_keywords):
-                print(f"  → {i}: {info['name']}")
-    
-    def __del__(self):
-        """Cleanup PyAudio instance."""
-        self.pyaudio.terminate()
+        for device in devices:
+            if device.is_virtual_cable:
+                print(f"  → {device.index}: {device.name}")
 
 def main():
     """Main function to test audio sending."""
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Bump when the conversion pipeline changes so stale audio is not served
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = ".tts_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_HOT_MAX_BYTES = 64 * 1024 * 1024
+
+# Temp files older than this are leftovers of interrupted writes (younger ones
+# may belong to another process writing into the same directory)
+STALE_TEMP_SECONDS = 600
+
+
+class TTSCache:
+    """Content-addressed disk cache of converted TTS audio with LRU eviction and an in-memory hot tier."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 hot_max_bytes: int = DEFAULT_HOT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hot_max_bytes = hot_max_bytes
+
+        self.hits = 0
+        self.hot_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()   # key -> bytes, most recently used last
+        self._hot_bytes = 0
+        self._index = OrderedDict()  # key -> size on disk, most recently used last
+        self._disk_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def from_env(cls) -> Optional['TTSCache']:
+        """Builds the cache from TTS_CACHE_* environment variables (None if disabled)."""
+        if os.environ.get("TTS_CACHE_DISABLE", "").lower() in ("1", "true", "yes"):
+            return None
+
+        max_mb = int(os.environ.get("TTS_CACHE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024)))
+        return cls(os.environ.get("TTS_CACHE_DIR", DEFAULT_CACHE_DIR), max_mb * 1024 * 1024)
+
+    @staticmethod
+    def make_key(text: str, model: str, voice_name: str,
+                 sample_rate: int, channels: int, bit_depth: int) -> str:
+        """Hashes the synthesis parameters into a cache key."""
+        payload = json.dumps(
+            [CACHE_VERSION, text, model, voice_name, sample_rate, channels, bit_depth],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def _load_index(self):
+        """Rebuilds the LRU order from file modification times (touched on every hit).
+
+        Also sweeps stale temp files left behind by interrupted atomic writes.
+        """
+        entries = []
+        stale_before = time.time() - STALE_TEMP_SECONDS
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                if name.endswith(".tmp"):
+                    if stat.st_mtime < stale_before:
+                        os.unlink(path)
+                    continue
+            except OSError:
+                continue
+            if name.endswith(".wav"):
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._disk_bytes += size
+
+        self._evict_disk()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._hot or key in self._index
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns cached audio for key, or None on a miss."""
+        with self._lock:
+            data = self._hot.get(key)
+            if data is not None:
+                self._hot.move_to_end(key)
+                if key in self._index:
+                    self._index.move_to_end(key)
+                self.hits += 1
+                self.hot_hits += 1
+                return data
+
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+        # Read outside the lock so one slow disk read does not stall other lookups;
+        # atomic replaces mean the file is either complete or gone
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            data = None
+
+        with self._lock:
+            if data is None:
+                # File vanished underneath us (evicted or deleted); treat as a miss
+                if key in self._index:
+                    self._disk_bytes -= self._index.pop(key)
+                self.misses += 1
+                return None
+
+            # Only keep it hot if it was not evicted while we were reading
+            if key in self._index:
+                self._index.move_to_end(key)
+                self._remember(key, data)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        """Stores audio for key with an atomic write, evicting least recently used entries."""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Readers see either the old file or the complete new one
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if key in self._index:
+                self._disk_bytes -= self._index.pop(key)
+            self._index[key] = len(data)
+            self._disk_bytes += len(data)
+            self._remember(key, data)
+            self._evict_disk()
+
+    def _remember(self, key: str, data: bytes):
+        """Adds an entry to the hot tier, trimming it to its byte budget."""
+        if key in self._hot:
+            self._hot_bytes -= len(self._hot.pop(key))
+        if len(data) > self.hot_max_bytes:
+            return
+
+        self._hot[key] = data
+        self._hot_bytes += len(data)
+        while self._hot_bytes > self.hot_max_bytes:
+            _, evicted = self._hot.popitem(last=False)
+            self._hot_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        """Deletes least recently used files until the disk tier fits its budget."""
+        while self._disk_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._disk_bytes -= size
+            if key in self._hot:
+                self._hot_bytes -= len(self._hot.pop(key))
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def clear(self):
+        """Removes every cached entry."""
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.unlink(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._hot.clear()
+            self._disk_bytes = 0
+            self._hot_bytes = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters and current usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'hot_hits': self.hot_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._index),
+                'disk_bytes': self._disk_bytes,
+                'hot_entries': len(self._hot),
+                'hot_bytes': self._hot_bytes,
+            }
+
+
+if __name__ == "__main__":
+    # Self-check in a scratch directory: hit/miss, LRU eviction and an interrupted write
+    import shutil
+
+    def check(label: str, passed: bool):
+        print(f"{'PASS' if passed else 'FAIL'}  {label}")
+
+    directory = tempfile.mkdtemp(prefix="tts_cache_check_")
+    try:
+        cache = TTSCache(directory, max_bytes=3000, hot_max_bytes=0)
+        keys = [TTSCache.make_key(f"message {i}", "model", "voice", 48000, 2, 24) for i in range(4)]
+
+        check("miss on an empty cache", cache.get(keys[0]) is None)
+        cache.put(keys[0], b"a" * 1000)
+        check("hit after put (read from disk)", cache.get(keys[0]) == b"a" * 1000)
+
+        # keys[0] was just used, so keys[1] is least recently used when keys[3] overflows
+        cache.put(keys[1], b"b" * 1000)
+        cache.put(keys[2], b"c" * 1000)
+        cache.get(keys[0])
+        cache.put(keys[3], b"d" * 1000)
+        check("LRU eviction drops the least recently used entry",
+              keys[1] not in cache and keys[0] in cache and cache.stats()['evictions'] == 1)
+
+        # A crash between writing the temp file and renaming it leaves an orphan behind
+        orphan = os.path.join(directory, "interrupted.tmp")
+        with open(orphan, "wb") as f:
+            f.write(b"partial")
+        old = time.time() - STALE_TEMP_SECONDS - 1
+        os.utime(orphan, (old, old))
+        reopened = TTSCache(directory, max_bytes=3000)
+        check("interrupted write is swept at startup and never served",
+              not os.path.exists(orphan) and reopened.stats()['entries'] == 3)
+        check("entries survive a restart", reopened.get(keys[3]) == b"d" * 1000)
+    finally:
+        shutil.rmtree(directory)